@@ -1,31 +1,48 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 import logging
-from .routes.main_routes import main
-from .routes.auth import auth
-from .routes.image_routes import image_routes
-from .database import init_db
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from config import Config
+from .log_setup import configure_logging, start_request_sampling
+
 logger = logging.getLogger(__name__)
 
 def create_app():
+    # Importing the package stays side-effect free so manage.py commands and
+    # tooling can use app.* without a web app; the routes come in here.
+    configure_logging()
+    from .routes.main_routes import main
+    from .routes.auth import auth
+    from .routes.image_routes import image_routes
+    from .routes import images, leaderboard
+    from .services.events import STREAM_TOKEN_SCOPE
+    from .database import run_migrations
+    from .services.upload_validation import ValidatingRequest, UploadRejected, upload_rejected_response
+    from .services.json_provider import FastJSONProvider
+    from .services.compression import ResponseCompressor
+    from werkzeug.exceptions import RequestEntityTooLarge
+    from werkzeug.middleware.proxy_fix import ProxyFix
+
     try:
         logger.info("Creating Flask application")
         app = Flask(__name__)
+        # Validate uploaded files while the multipart body streams in
+        app.request_class = ValidatingRequest
+        # orjson-backed JSON that understands datetimes and ObjectIds
+        app.json = FastJSONProvider(app)
+        # Take the client address from X-Forwarded-For only behind known proxies
+        if Config.TRUSTED_PROXY_COUNT:
+            app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.TRUSTED_PROXY_COUNT,
+                                    x_proto=Config.TRUSTED_PROXY_COUNT)
         
         # Load configuration
-        app.config.from_object('config')
+        app.config.from_object(Config)
         app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
         app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key')
         app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
@@ -33,23 +50,40 @@ def create_app():
         
         # Initialize extensions
         CORS(app)
-        JWTManager(app)
+        jwt = JWTManager(app)
+
+        @jwt.token_verification_loader
+        def restrict_stream_tokens(jwt_header, jwt_data):
+            # Short-lived event stream tokens (they travel in URLs) open /events and nothing else
+            return jwt_data.get('scope') != STREAM_TOKEN_SCOPE or request.endpoint == 'images.stream_events'
         logger.debug("Extensions initialized")
         
-        # Initialize database
-        init_db()
-        logger.debug("Database initialized")
+        # Migrations normally run once per deployment via `python manage.py migrate`
+        if Config.MIGRATE_ON_STARTUP:
+            run_migrations()
+            logger.debug("Database migrations applied")
         
         # Register blueprints
         app.register_blueprint(main)
         app.register_blueprint(auth)
         app.register_blueprint(image_routes)
+        app.register_blueprint(images.bp, url_prefix='/api/images')
+        app.register_blueprint(leaderboard.bp, url_prefix='/api/leaderboard')
         logger.debug("Blueprints registered")
         
+        # Decide per request whether its DEBUG logs are sampled
+        app.before_request(start_request_sampling)
+        
+        # Compress large responses for clients that accept it
+        app.after_request(ResponseCompressor())
+
         # Error handlers
+        app.register_error_handler(UploadRejected, upload_rejected_response)
+        app.register_error_handler(RequestEntityTooLarge, upload_rejected_response)
+
         @app.errorhandler(404)
         def not_found_error(error):
-            logger.warning(f"404 error: {error}")
+            logger.warning("404 error: %s", error)
             return jsonify({
                 'success': False,
                 'error': 'Not found',
@@ -58,7 +92,7 @@ def create_app():
             
         @app.errorhandler(500)
         def internal_error(error):
-            logger.error(f"500 error: {error}")
+            logger.error("500 error: %s", error)
             return jsonify({
                 'success': False,
                 'error': 'Internal server error',
@@ -69,5 +103,5 @@ def create_app():
         return app
         
     except Exception as e:
-        logger.error(f"Error creating application: {str(e)}")
+        logger.error("Error creating application: %s", e)
         raise 
\ No newline at end of file
@@ -1,35 +1,102 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne, ReplaceOne
+from pymongo.errors import OperationFailure, ConnectionFailure
+from bson import ObjectId, json_util
 from datetime import datetime
+import atexit
+import threading
+import time
+import logging
 import os
 from dotenv import load_dotenv
+from config import Config
+from app.services.events import event_bus
 
 load_dotenv()
 
-# MongoDB connection string
-MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
+logger = logging.getLogger(__name__)
 
-# Create MongoDB client
-client = MongoClient(MONGODB_URI)
+# Reward write-behind settings
+REWARD_WRITE_BEHIND = os.getenv('REWARD_WRITE_BEHIND', 'false').lower() == 'true'
+REWARD_FLUSH_INTERVAL_MS = int(os.getenv('REWARD_FLUSH_INTERVAL_MS', '5'))
+REWARD_RETRY_MAX_MS = int(os.getenv('REWARD_RETRY_MAX_MS', '30000'))  # Backoff cap between failed flushes
+REWARD_MAX_ATTEMPTS = int(os.getenv('REWARD_MAX_ATTEMPTS', '5'))  # Before a reward that keeps failing is dead-lettered
+REWARD_MAX_WAIT_MS = int(os.getenv('REWARD_MAX_WAIT_MS', '300000'))  # Longest a reward waits out an unreachable server
+REWARD_MAX_PENDING = int(os.getenv('REWARD_MAX_PENDING', '10000'))  # Queued rewards before new ones spill to the dead-letter file
+REWARD_DEAD_LETTER_PATH = os.getenv('REWARD_DEAD_LETTER_PATH', 'reward_dead_letters.jsonl')
 
-# Get database
-db = client.mosquito_coin
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Return the process-wide MongoClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    Config.MONGODB_URI,
+                    maxPoolSize=Config.MONGO_MAX_POOL_SIZE,
+                    minPoolSize=Config.MONGO_MIN_POOL_SIZE,
+                    connectTimeoutMS=Config.MONGO_CONNECT_TIMEOUT_MS,
+                    serverSelectionTimeoutMS=Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                    socketTimeoutMS=Config.MONGO_SOCKET_TIMEOUT_MS,
+                    connect=False
+                )
+    return _client
+
+def get_db():
+    return get_client()[Config.MONGO_DB_NAME]
+
+class _LazyCollection:
+    """Collection handle that resolves the client on first use, not at import."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self.name], attr)
 
 # Collections
-users = db.users
-images = db.images
-transactions = db.transactions
-submissions = db.submissions
+users = _LazyCollection('users')
+images = _LazyCollection('images')
+transactions = _LazyCollection('transactions')
+submissions = _LazyCollection('submissions')
+migrations = _LazyCollection('migrations')
+balance_checkpoints = _LazyCollection('balance_checkpoints')
 
-def init_db():
-    """Initialize database with indexes and default data."""
-    # Create indexes
+SUBMISSION_PAGE_INDEX = [
+    ('user_id', 1), ('submitted_at', -1), ('_id', -1), ('image_path', 1), ('verified', 1)
+]
+SUBMISSION_PAGE_FIELDS = {'_id': 1, 'image_path': 1, 'verified': 1, 'submitted_at': 1}
+TRANSACTION_PAGE_INDEX = [
+    ('user_id', 1), ('timestamp', -1), ('_id', -1), ('type', 1), ('amount', 1), ('description', 1)
+]
+TRANSACTION_PAGE_FIELDS = {'_id': 1, 'type': 1, 'amount': 1, 'description': 1, 'timestamp': 1}
+
+def _drop_index(collection, name):
+    try:
+        collection.drop_index(name)
+    except OperationFailure:
+        pass  # Already gone
+
+def _migration_0001_base_indexes():
     users.create_index('username', unique=True)
     images.create_index('user_id')
-    transactions.create_index('user_id')
     transactions.create_index('timestamp')
-    submissions.create_index('user_id')
     submissions.create_index('submitted_at')
-    
+
+def _migration_0002_leaderboard_index():
+    users.create_index([('verified_count', -1)])
+
+def _migration_0003_history_page_indexes():
+    # Compound indexes serve per-user history pages; the trailing fields let
+    # the projected page queries be answered from the index alone.
+    submissions.create_index(SUBMISSION_PAGE_INDEX)
+    transactions.create_index(TRANSACTION_PAGE_INDEX)
+    _drop_index(submissions, 'user_id_1')
+    _drop_index(transactions, 'user_id_1')
+
+def _migration_0004_seed_admin():
     # Create default admin user if not exists
     if not users.find_one({'username': 'admin'}):
         users.insert_one({
@@ -38,9 +105,61 @@ def init_db():
             'role': 'admin',
             'coins': 0,
             'kills': 0,
+            'verified_count': 0,
             'created_at': datetime.utcnow()
         })
 
+def _migration_0005_ledger_indexes():
+    # Ledger tails are replayed in _id order after a user's checkpoint
+    transactions.create_index([('user_id', 1), ('_id', 1), ('amount', 1)])
+
+def _migration_0006_ledger_committed_at():
+    # Ledger tails are now replayed in commit order (committed_at, _id). Older
+    # entries were committed when their ObjectId was generated.
+    for entry in transactions.find({'committed_at': {'$exists': False}}, {'_id': 1}):
+        transactions.update_one({'_id': entry['_id']}, {'$set': {
+            'committed_at': entry['_id'].generation_time.replace(tzinfo=None)
+        }})
+    for checkpoint in balance_checkpoints.find({'last_committed_at': {'$exists': False}}):
+        last = transactions.find_one({'_id': checkpoint['last_transaction_id']}, {'committed_at': 1})
+        balance_checkpoints.update_one({'_id': checkpoint['_id']}, {'$set': {
+            'last_committed_at': last['committed_at'] if last else
+            checkpoint['last_transaction_id'].generation_time.replace(tzinfo=None)
+        }})
+    transactions.create_index([('user_id', 1), ('committed_at', 1), ('_id', 1), ('amount', 1)])
+    _drop_index(transactions, 'user_id_1__id_1_amount_1')
+
+# Ordered list of (id, step). Steps must be idempotent; append new ones, never reorder.
+MIGRATIONS = [
+    ('0001_base_indexes', _migration_0001_base_indexes),
+    ('0002_leaderboard_index', _migration_0002_leaderboard_index),
+    ('0003_history_page_indexes', _migration_0003_history_page_indexes),
+    ('0004_seed_admin', _migration_0004_seed_admin),
+    ('0005_ledger_indexes', _migration_0005_ledger_indexes),
+    ('0006_ledger_committed_at', _migration_0006_ledger_committed_at),
+]
+
+def run_migrations():
+    """Apply migrations not yet recorded in the migrations collection."""
+    applied = {doc['_id'] for doc in migrations.find({}, {'_id': 1})}
+    ran = []
+    for migration_id, step in MIGRATIONS:
+        if migration_id in applied:
+            continue
+        logger.info("Applying migration %s", migration_id)
+        step()
+        migrations.update_one(
+            {'_id': migration_id},
+            {'$set': {'applied_at': datetime.utcnow()}},
+            upsert=True
+        )
+        ran.append(migration_id)
+    return ran
+
+def init_db():
+    """Initialize database with indexes and default data."""
+    return run_migrations()
+
 def add_submission(user_id, image_path, verified=False):
     """Add a new image submission."""
     submission = {
@@ -50,52 +169,110 @@ def add_submission(user_id, image_path, verified=False):
         'submitted_at': datetime.utcnow()
     }
     submissions.insert_one(submission)
+    if verified:
+        users.update_one({'_id': user_id}, {'$inc': {'verified_count': 1}})
     return submission
 
-def get_user_submissions(user_id):
-    """Get all submissions for a user."""
-    return list(submissions.find(
-        {'user_id': user_id}
-    ).sort('submitted_at', -1))
+def encode_cursor(doc, time_field):
+    """Encode a page position as '<iso timestamp>,<object id>'."""
+    return f"{doc[time_field].isoformat()},{doc['_id']}"
+
+def decode_cursor(cursor):
+    """Decode a '<iso timestamp>,<object id>' page position."""
+    timestamp, object_id = cursor.split(',', 1)
+    return datetime.fromisoformat(timestamp), ObjectId(object_id)
+
+def _page_query(user_id, time_field, before):
+    query = {'user_id': user_id}
+    if before:
+        timestamp, object_id = before
+        query['$or'] = [
+            {time_field: {'$lt': timestamp}},
+            {time_field: timestamp, '_id': {'$lt': object_id}}
+        ]
+    return query
+
+def _find_page(collection, user_id, time_field, fields, limit, before):
+    return collection.find(
+        _page_query(user_id, time_field, before),
+        fields
+    ).sort([(time_field, -1), ('_id', -1)]).limit(limit)
+
+def get_user_submissions(user_id, limit=20, before=None):
+    """Get a page of a user's submissions, newest first.
+
+    before is a (submitted_at, _id) pair from decode_cursor; pass the last
+    item of the previous page to continue after it.
+    """
+    return list(_find_page(submissions, user_id, 'submitted_at', SUBMISSION_PAGE_FIELDS, limit, before))
+
+def is_covered_query(cursor):
+    """Check from the explain output that a query examined no documents."""
+    stats = cursor.explain().get('executionStats', {})
+    return stats.get('totalDocsExamined') == 0
+
+def check_page_query_plans(user_id):
+    """Report whether the submission and transaction page queries are covered."""
+    return {
+        'submissions': is_covered_query(
+            _find_page(submissions, user_id, 'submitted_at', SUBMISSION_PAGE_FIELDS, 20, None)
+        ),
+        'transactions': is_covered_query(
+            _find_page(transactions, user_id, 'timestamp', TRANSACTION_PAGE_FIELDS, 10, None)
+        )
+    }
 
 def get_leaderboard():
     """Get top users by verified submissions."""
+    # Served from the verified_count index maintained on users
+    top_users = users.find(
+        {'verified_count': {'$gt': 0}},
+        {'username': 1, 'verified_count': 1, '_id': 0}
+    ).sort('verified_count', -1).limit(10)
+    return [{
+        'username': user['username'],
+        'submission_count': user['verified_count']
+    } for user in top_users]
+
+def _count_verified_submissions():
+    """Aggregate verified submission counts per user from the submissions collection."""
     pipeline = [
-        {
-            '$match': {'verified': True}
-        },
-        {
-            '$group': {
-                '_id': '$user_id',
-                'submission_count': {'$sum': 1}
-            }
-        },
-        {
-            '$lookup': {
-                'from': 'users',
-                'localField': '_id',
-                'foreignField': '_id',
-                'as': 'user'
-            }
-        },
-        {
-            '$unwind': '$user'
-        },
-        {
-            '$project': {
-                'username': '$user.username',
-                'submission_count': 1,
-                '_id': 0
-            }
-        },
-        {
-            '$sort': {'submission_count': -1}
-        },
-        {
-            '$limit': 10
-        }
+        {'$match': {'verified': True}},
+        {'$group': {'_id': '$user_id', 'count': {'$sum': 1}}}
     ]
-    return list(submissions.aggregate(pipeline))
+    return {row['_id']: row['count'] for row in submissions.aggregate(pipeline)}
+
+def rebuild_leaderboard_stats():
+    """Recompute every user's verified_count from submissions (one-shot backfill).
+
+    Only users whose stored count is wrong are written, each straight to its
+    correct value in one unordered bulk write, so readers never see zeroed
+    counts and an interrupted run leaves every count either old or fixed.
+    Returns the number of users corrected.
+    """
+    mismatches = check_leaderboard_stats()
+    if mismatches:
+        users.bulk_write([
+            UpdateOne({'_id': mismatch['user_id']}, {'$set': {'verified_count': mismatch['expected']}}, upsert=False)
+            for mismatch in mismatches
+        ], ordered=False)
+    return len(mismatches)
+
+def check_leaderboard_stats():
+    """Return users whose stored verified_count disagrees with submissions."""
+    counts = _count_verified_submissions()
+    mismatches = []
+    for user in users.find({}, {'username': 1, 'verified_count': 1}):
+        expected = counts.get(user['_id'], 0)
+        stored = user.get('verified_count', 0)
+        if stored != expected:
+            mismatches.append({
+                'user_id': user['_id'],
+                'username': user.get('username'),
+                'stored': stored,
+                'expected': expected
+            })
+    return mismatches
 
 def get_user_by_username(username):
     """Get user by username."""
@@ -108,6 +285,7 @@ def create_user(username, password):
         'password': password,  # In production, hash the password
         'coins': 0,
         'kills': 0,
+        'verified_count': 0,
         'created_at': datetime.utcnow()
     }
     users.insert_one(user)
@@ -129,14 +307,13 @@ def create_transaction(user_id, type, amount, description):
         'description': description,
         'timestamp': datetime.utcnow()
     }
+    transaction['committed_at'] = transaction['timestamp']
     transactions.insert_one(transaction)
     return transaction
 
-def get_user_transactions(user_id, limit=10):
-    """Get user's recent transactions."""
-    return list(transactions.find(
-        {'user_id': user_id}
-    ).sort('timestamp', -1).limit(limit))
+def get_user_transactions(user_id, limit=10, before=None):
+    """Get a page of a user's transactions, newest first."""
+    return list(_find_page(transactions, user_id, 'timestamp', TRANSACTION_PAGE_FIELDS, limit, before))
 
 def save_image(user_id, image_url, verification_status='pending'):
     """Save image information."""
@@ -156,4 +333,312 @@ def update_image(image_id, **kwargs):
     images.update_one(
         {'_id': image_id},
         {'$set': kwargs}
-    ) 
\ No newline at end of file
+    ) 
+
+def _build_reward(user_id, image_url, coins, description):
+    now = datetime.utcnow()
+    image_id = ObjectId()
+    return {
+        'image': {
+            '_id': image_id,
+            'user_id': user_id,
+            'image_url': image_url,
+            'verification_status': 'verified',
+            'feedback': '',
+            'coins_awarded': coins,
+            'created_at': now
+        },
+        'transaction': {
+            '_id': ObjectId(),
+            'user_id': user_id,
+            'type': 'EARNED',
+            'amount': coins,
+            'description': description,
+            'timestamp': now
+        },
+        'submission': {
+            '_id': ObjectId(),
+            'user_id': user_id,
+            'image_id': image_id,
+            'image_path': image_url,
+            'verified': True,
+            'submitted_at': now
+        }
+    }
+
+# Ids of the last rewards credited to a user, kept on the user document
+CREDITED_REWARDS_KEPT = 100
+
+def _write_rewards(rewards, session=None):
+    """Write the image, submission, ledger and balance changes for a batch of rewards.
+
+    Safe to run again on a batch that was partly written (without
+    transactions a failure can land between the writes): images, submissions
+    and ledger entries are upserted by their preassigned _id, and each credit
+    (coins and verified_count) is guarded by the ledger id it records on the
+    user, so nothing is counted twice.
+    Ledger entries get committed_at when they are actually inserted, not when
+    the reward was built (see app.ledger).
+    """
+    committed_at = datetime.utcnow()
+    images.bulk_write(
+        [ReplaceOne({'_id': reward['image']['_id']}, reward['image'], upsert=True) for reward in rewards],
+        ordered=False,
+        session=session
+    )
+    submissions.bulk_write(
+        [UpdateOne({'_id': reward['submission']['_id']}, {'$setOnInsert': reward['submission']}, upsert=True)
+         for reward in rewards],
+        ordered=False,
+        session=session
+    )
+    transactions.bulk_write(
+        [UpdateOne({'_id': reward['transaction']['_id']}, {'$setOnInsert': dict(reward['transaction'], committed_at=committed_at)}, upsert=True)
+         for reward in rewards],
+        ordered=False,
+        session=session
+    )
+    users.bulk_write([
+        UpdateOne(
+            {'_id': reward['transaction']['user_id'], 'credited_rewards': {'$ne': reward['transaction']['_id']}},
+            {
+                '$inc': {'coins': reward['transaction']['amount'], 'verified_count': 1},
+                '$push': {'credited_rewards': {'$each': [reward['transaction']['_id']], '$slice': -CREDITED_REWARDS_KEPT}}
+            }
+        ) for reward in rewards
+    ], ordered=False, session=session)
+
+_transactions_supported = True
+
+def _write_atomically(write):
+    """Run write(session) in a transaction, falling back to plain batched writes on a standalone server."""
+    global _transactions_supported
+    if _transactions_supported:
+        try:
+            with get_client().start_session() as session:
+                session.with_transaction(lambda s: write(s))
+            return
+        except NotImplementedError:
+            _transactions_supported = False
+        except OperationFailure as e:
+            # IllegalOperation: transactions need a replica set or mongos
+            if e.code != 20:
+                raise
+            _transactions_supported = False
+        logger.warning("MongoDB transactions unavailable; writes are batched but not atomic")
+    write(None)
+
+def _commit_rewards(rewards):
+    """Commit rewards atomically where the server supports transactions, then notify the users."""
+    _write_atomically(lambda session: _write_rewards(rewards, session=session))
+    _publish_rewards(rewards)
+
+def _publish_rewards(rewards):
+    """Push a coins event per reward to its user's event streams."""
+    try:
+        user_ids = list({reward['transaction']['user_id'] for reward in rewards})
+        balances = {user['_id']: user.get('coins', 0) for user in users.find({'_id': {'$in': user_ids}}, {'coins': 1})}
+    except Exception as e:
+        # Notifications are best effort; the rewards are already committed
+        logger.error("Error reading balances for reward events: %s", e)
+        balances = {}
+    for reward in rewards:
+        user_id = reward['transaction']['user_id']
+        event_bus.publish(user_id, 'coins', {
+            'awarded': reward['transaction']['amount'],
+            'balance': balances.get(user_id),
+            'image_url': reward['image']['image_url']
+        })
+
+def _write_reverification(changes, session=None):
+    now = datetime.utcnow()
+    images.bulk_write([
+        UpdateOne({'_id': change['image_id']}, {'$set': {
+            'verification_status': change['status'],
+            'coins_awarded': change['coins'],
+            'feedback': change['feedback'],
+            'reverified_at': now
+        }}) for change in changes
+    ], ordered=False, session=session)
+    adjustments = [change for change in changes if change['delta']]
+    if not adjustments:
+        return
+    transactions.insert_many([{
+        'user_id': change['user_id'],
+        'type': 'ADJUSTED',
+        'amount': change['delta'],
+        'description': 'Re-verification',
+        'timestamp': now,
+        'committed_at': now
+    } for change in adjustments], session=session)
+    totals = {}
+    for change in adjustments:
+        totals[change['user_id']] = totals.get(change['user_id'], 0) + change['delta']
+    users.bulk_write(
+        [UpdateOne({'_id': user_id}, {'$inc': {'coins': amount}}) for user_id, amount in totals.items()],
+        ordered=False,
+        session=session
+    )
+
+def apply_reverification(changes):
+    """Apply re-verification verdicts in bulk.
+
+    Each change is {image_id, user_id, status, coins, feedback, delta}; the
+    image is updated and any coin delta is written to the ledger and the
+    user's balance in the same transaction.
+    """
+    if changes:
+        _write_atomically(lambda session: _write_reverification(changes, session=session))
+
+def commit_reward(user_id, image_url, coins, description):
+    """Save a verified image and its submission, ledger entry, coins and verified_count in one write."""
+    reward = _build_reward(user_id, image_url, coins, description)
+    if REWARD_WRITE_BEHIND:
+        get_reward_buffer().add(reward)
+    else:
+        _commit_rewards([reward])
+    return reward['image']
+
+class RewardWriteBuffer:
+    """Group-commits rewards from concurrent uploads every few milliseconds.
+
+    A failed flush is retried with capped exponential backoff. Retries are
+    idempotent (see _write_rewards). When the server is unreachable the whole
+    batch waits, for up to REWARD_MAX_WAIT_MS per reward. Any other failure
+    splits the batch so one bad reward can't block the rest; a reward still
+    failing after REWARD_MAX_ATTEMPTS is appended to the dead-letter file
+    instead of being retried forever. So is a new reward arriving while
+    REWARD_MAX_PENDING are already queued, keeping memory bounded during an
+    outage.
+    """
+
+    def __init__(self, interval_ms=REWARD_FLUSH_INTERVAL_MS, max_batch=500,
+                 max_attempts=REWARD_MAX_ATTEMPTS, retry_max_ms=REWARD_RETRY_MAX_MS,
+                 max_wait_ms=REWARD_MAX_WAIT_MS, max_pending=REWARD_MAX_PENDING,
+                 dead_letter_path=REWARD_DEAD_LETTER_PATH):
+        self.interval = interval_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.retry_max = retry_max_ms / 1000.0
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending = max_pending
+        self.dead_letter_path = dead_letter_path
+        self._pending = []  # [(reward, attempts, queued_at)]
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._thread = threading.Thread(target=self._run, name='reward-write-behind', daemon=True)
+        self._thread.start()
+
+    def add(self, reward):
+        with self._lock:
+            full = len(self._pending) >= self.max_pending
+            if not full:
+                self._pending.append((reward, 0, time.monotonic()))
+                if len(self._pending) >= self.max_batch:
+                    self._wakeup.set()
+        if full:
+            logger.warning("Reward queue full (%s pending); spilling to the dead-letter file", self.max_pending)
+            self._dead_letter(reward, 0)
+
+    def flush(self, final=False):
+        """Commit what is pending; with final, dead-letter whatever still fails."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                _commit_rewards([reward for reward, _, _ in batch])
+                failed = []
+            except ConnectionFailure as e:
+                logger.error("Error committing %s rewards (server unreachable): %s", len(batch), e)
+                failed = batch
+            except Exception as e:
+                logger.error("Error committing %s rewards: %s", len(batch), e)
+                if len(batch) > 1:
+                    failed = self._commit_one_by_one(batch)
+                else:
+                    reward, attempts, queued_at = batch[0]
+                    failed = [(reward, attempts + 1, queued_at)]
+
+            if not failed:
+                self._backoff = 0.0
+                return
+            retry = []
+            give_up_queued_before = time.monotonic() - self.max_wait
+            for reward, attempts, queued_at in failed:
+                if final or attempts >= self.max_attempts or queued_at <= give_up_queued_before:
+                    self._dead_letter(reward, attempts)
+                else:
+                    retry.append((reward, attempts, queued_at))
+            if retry:
+                self._backoff = min(max(self._backoff * 2, self.interval, 0.05), self.retry_max)
+                self._retry_at = time.monotonic() + self._backoff
+                with self._lock:
+                    self._pending[:0] = retry
+
+    def _commit_one_by_one(self, batch):
+        """Commit rewards singly to find the poison ones; returns the (reward, attempts, queued_at) still failing."""
+        failed = []
+        for index, (reward, attempts, queued_at) in enumerate(batch):
+            try:
+                _commit_rewards([reward])
+            except ConnectionFailure:
+                # Lost the server partway; everything left waits for the next attempt
+                return failed + batch[index:]
+            except Exception as e:
+                logger.error("Error committing reward %s: %s", reward['transaction']['_id'], e)
+                failed.append((reward, attempts + 1, queued_at))
+        return failed
+
+    def _dead_letter(self, reward, attempts):
+        logger.error(
+            "Giving up on reward %s for user %s after %s attempts; appended to %s",
+            reward['transaction']['_id'], reward['transaction']['user_id'], attempts, self.dead_letter_path
+        )
+        try:
+            with open(self.dead_letter_path, 'a') as f:
+                f.write(json_util.dumps(reward) + '\n')
+        except OSError as e:
+            logger.error("Error writing reward dead letter: %s", e)
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if time.monotonic() >= self._retry_at:
+                self.flush()
+
+    def stop(self):
+        """Stop the flusher and commit (or dead-letter) everything still pending."""
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join()
+        self.flush(final=True)
+
+_reward_buffer = None
+_reward_buffer_lock = threading.Lock()
+
+def get_reward_buffer():
+    """Return the process-wide write-behind buffer, starting it on first use."""
+    global _reward_buffer
+    with _reward_buffer_lock:
+        if _reward_buffer is None:
+            _reward_buffer = RewardWriteBuffer()
+            # Commit pending rewards on interpreter exit (gunicorn also calls
+            # stop_reward_buffer from worker_exit)
+            atexit.register(_reward_buffer.stop)
+        return _reward_buffer
+
+def stop_reward_buffer():
+    """Flush and stop the write-behind buffer if this process started one."""
+    with _reward_buffer_lock:
+        buffer = _reward_buffer
+    if buffer is not None:
+        buffer.stop()
@@ -0,0 +1,165 @@
+from datetime import datetime, timedelta
+import threading
+import logging
+from config import Config
+from app.database import transactions, users, balance_checkpoints
+
+logger = logging.getLogger(__name__)
+
+# The transactions collection is the append-only ledger: each entry's signed
+# amount is added to the user's balance. Entries are ordered by when they were
+# committed, (committed_at, _id); the ObjectId alone records when a reward was
+# built, which can be long before a write-behind retry or dead-letter replay
+# lands it. A checkpoint stores the balance up to and including its last
+# (committed_at, _id), so reads only replay the tail after it.
+
+
+def _after(user_id, checkpoint):
+    """Query for a user's ledger entries committed after the checkpoint."""
+    query = {'user_id': user_id}
+    if checkpoint:
+        query['$or'] = [
+            {'committed_at': {'$gt': checkpoint['last_committed_at']}},
+            {'committed_at': checkpoint['last_committed_at'], '_id': {'$gt': checkpoint['last_transaction_id']}}
+        ]
+    return query
+
+
+def _tail(user_id, checkpoint, cutoff=None):
+    """Sum ledger entries after the checkpoint (and committed up to cutoff if given)."""
+    query = _after(user_id, checkpoint)
+    if cutoff is not None:
+        query['committed_at'] = {'$lte': cutoff}
+
+    total, last, count = 0, None, 0
+    entries = transactions.find(query, {'_id': 1, 'committed_at': 1, 'amount': 1})
+    for entry in entries.sort([('committed_at', 1), ('_id', 1)]):
+        total += entry['amount']
+        last = entry
+        count += 1
+    return total, last, count
+
+
+def get_balance(user_id):
+    """Return the ledger balance: checkpoint plus the entries recorded since."""
+    checkpoint = balance_checkpoints.find_one({'_id': user_id})
+    tail_total, _, tail_count = _tail(user_id, checkpoint)
+    if tail_count >= Config.LEDGER_CHECKPOINT_INTERVAL:
+        checkpoint_balance(user_id)
+    return (checkpoint['balance'] if checkpoint else 0) + tail_total
+
+
+def checkpoint_balance(user_id):
+    """Fold settled ledger entries into the user's checkpoint.
+
+    Entries committed in the last LEDGER_SETTLE_SECONDS are left in the tail
+    so a write still in flight from another worker, stamped with an earlier
+    committed_at, can't be skipped by the checkpoint. The window must cover
+    the longest write (socket timeout, transaction lifetime), not retries:
+    each retry stamps the entry afresh.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=Config.LEDGER_SETTLE_SECONDS)
+    checkpoint = balance_checkpoints.find_one({'_id': user_id})
+    tail_total, last, tail_count = _tail(user_id, checkpoint, cutoff)
+    if not tail_count:
+        return checkpoint
+
+    checkpoint = {
+        '_id': user_id,
+        'balance': (checkpoint['balance'] if checkpoint else 0) + tail_total,
+        'last_transaction_id': last['_id'],
+        'last_committed_at': last['committed_at'],
+        'updated_at': datetime.utcnow()
+    }
+    balance_checkpoints.replace_one({'_id': user_id}, checkpoint, upsert=True)
+    return checkpoint
+
+
+def audit_balance(user_id):
+    """Compare the ledger balance with the stored users.coins value."""
+    ledger_balance = get_balance(user_id)
+    user = users.find_one({'_id': user_id}, {'coins': 1}) or {}
+    stored_balance = user.get('coins', 0)
+    return {
+        'user_id': user_id,
+        'ledger_balance': ledger_balance,
+        'stored_balance': stored_balance,
+        'drift': stored_balance - ledger_balance
+    }
+
+
+def reconcile_balances(batch_size=500):
+    """Find users whose users.coins disagrees with their ledger balance.
+
+    Users are processed in batches: one query loads the batch's checkpoints and
+    one aggregation sums every tail in the batch. Writes racing with the scan
+    can show up as transient drift, so re-audit a user before correcting it.
+    """
+    drifts = []
+    last_user_id = None
+    while True:
+        query = {'_id': {'$gt': last_user_id}} if last_user_id is not None else {}
+        batch = list(users.find(query, {'coins': 1}).sort('_id', 1).limit(batch_size))
+        if not batch:
+            return drifts
+        last_user_id = batch[-1]['_id']
+
+        user_ids = [user['_id'] for user in batch]
+        checkpoints = {
+            checkpoint['_id']: checkpoint
+            for checkpoint in balance_checkpoints.find({'_id': {'$in': user_ids}})
+        }
+        tail_filters = [_after(user_id, checkpoint) for user_id, checkpoint in checkpoints.items()]
+        unchecked = [user_id for user_id in user_ids if user_id not in checkpoints]
+        if unchecked:
+            tail_filters.append({'user_id': {'$in': unchecked}})
+        tails = {
+            row['_id']: row['total']
+            for row in transactions.aggregate([
+                {'$match': {'$or': tail_filters}},
+                {'$group': {'_id': '$user_id', 'total': {'$sum': '$amount'}}}
+            ])
+        }
+
+        for user in batch:
+            checkpoint = checkpoints.get(user['_id'])
+            ledger_balance = (checkpoint['balance'] if checkpoint else 0) + tails.get(user['_id'], 0)
+            stored_balance = user.get('coins', 0)
+            if stored_balance != ledger_balance:
+                drifts.append({
+                    'user_id': user['_id'],
+                    'ledger_balance': ledger_balance,
+                    'stored_balance': stored_balance,
+                    'drift': stored_balance - ledger_balance
+                })
+
+
+class LedgerReconciler:
+    """Runs reconcile_balances periodically on a background thread."""
+
+    def __init__(self, interval_seconds=None):
+        self.interval = interval_seconds or Config.LEDGER_RECONCILE_INTERVAL
+        self.last_drifts = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='ledger-reconciler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.last_drifts = reconcile_balances()
+                if self.last_drifts:
+                    logger.warning("Ledger drift detected for %s users", len(self.last_drifts))
+            except Exception as e:
+                logger.error("Error reconciling ledger: %s", e)
+            self._stop.wait(self.interval)
+
+    def join(self):
+        self._thread.join()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
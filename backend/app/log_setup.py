@@ -0,0 +1,107 @@
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from datetime import datetime, timezone
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from config import Config
+
+# Whether DEBUG records of the current request are kept (None outside a request)
+_debug_sampled = ContextVar('debug_sampled', default=None)
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Render records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class LazyQueueHandler(QueueHandler):
+    """Queue records without formatting them; the listener thread formats.
+
+    The stock QueueHandler.prepare merges args into msg on the calling thread,
+    which is exactly the work we want off the request path.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class DebugSampler(logging.Filter):
+    """Keep DEBUG records only for a sampled fraction of requests."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        sampled = _debug_sampled.get()
+        if sampled is None:
+            return random.random() < self.rate
+        return sampled
+
+
+def start_request_sampling():
+    """Decide once per request whether its DEBUG records are kept."""
+    _debug_sampled.set(random.random() < Config.LOG_DEBUG_SAMPLE_RATE)
+
+
+def _build_output_handler():
+    handler = logging.StreamHandler(sys.stdout)
+    if Config.LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    return handler
+
+
+def _start_listener(queue_handler):
+    global _listener
+    queue_handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(queue_handler.queue, _build_output_handler(), respect_handler_level=False)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def configure_logging():
+    """Route all logging through a queue drained by a background writer thread.
+
+    Safe to call more than once; only the first call installs handlers. Forked
+    children (gunicorn workers) get a fresh queue and writer thread, since
+    threads don't survive fork.
+    """
+    root = logging.getLogger()
+    if any(isinstance(handler, LazyQueueHandler) for handler in root.handlers):
+        return
+
+    queue_handler = LazyQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(DebugSampler(Config.LOG_DEBUG_SAMPLE_RATE))
+    root.handlers = [queue_handler]
+    root.setLevel(Config.LOG_LEVEL)
+
+    _start_listener(queue_handler)
+    atexit.register(_stop_listener)
+    os.register_at_fork(after_in_child=lambda: _start_listener(queue_handler))
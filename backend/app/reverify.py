@@ -0,0 +1,286 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import itertools
+import json
+import os
+import time
+import logging
+from bson import ObjectId
+import numpy as np
+from PIL import Image
+from config import Config
+from app.database import images, apply_reverification
+from app.services.image_verification import fetch_image_bytes, classify_batch
+from app.services.input_buffers import InputBufferPool
+from app.services.uploader import object_url
+
+logger = logging.getLogger(__name__)
+
+COINS_PER_VERIFIED_IMAGE = 10
+# Verdicts safe to overwrite; pending images are still owned by the live verification queue
+FINAL_STATUSES = ('verified', 'rejected')
+
+
+class MongoImageSource:
+    """Images in the MongoDB images collection (/upload and direct uploads)."""
+
+    name = 'images'
+    parse_id = ObjectId
+
+    def find(self, after_id):
+        query = {'_id': {'$gt': after_id}} if after_id else {}
+        return images.find(
+            query, {'_id': 1, 'user_id': 1, 'image_url': 1, 's3_key': 1, 'verification_status': 1, 'coins_awarded': 1}
+        ).sort('_id', 1).batch_size(256)
+
+    def apply(self, changes):
+        apply_reverification(changes)
+
+
+class SubmissionSource:
+    """Submissions recorded by storage_service (/api/submit), whose files live under uploads/.
+
+    A submission is kept only when verified, so its coins give its status.
+    """
+
+    name = 'submissions'
+    parse_id = int
+
+    def __init__(self, service):
+        self.service = service
+
+    def find(self, after_id):
+        for submission in self.service.iter_submissions(after_id):
+            yield {
+                '_id': submission['id'],
+                'user_id': submission['username'],
+                'image_url': submission['image_path'],
+                'verification_status': 'verified' if submission['coins'] else 'rejected',
+                'coins_awarded': submission['coins']
+            }
+
+    def apply(self, changes):
+        self.service.apply_reverification(changes)
+
+
+def default_sources():
+    from app.services.storage import storage_service
+    return [MongoImageSource(), SubmissionSource(storage_service)]
+
+
+def _image_source(doc):
+    """Describe where a stored image lives for fetch_image_bytes (bucket key or URL)."""
+    source = {'image_url': doc['image_url'], 's3_key': doc.get('s3_key')}
+    bucket_prefix = object_url(Config.AWS_BUCKET_NAME, '')
+    if not source['s3_key'] and doc['image_url'].startswith(bucket_prefix):
+        source['s3_key'] = doc['image_url'][len(bucket_prefix):]
+    return source
+
+
+def load_image(doc):
+    """Fetch and decode one stored image into 224x224 pixels plus quality statistics."""
+    url = doc['image_url']
+    if url.startswith(('http://', 'https://')):
+        data = fetch_image_bytes(_image_source(doc))
+    else:
+        with open(url, 'rb') as f:
+            data = f.read()
+    img = Image.open(BytesIO(data))
+    img.draft('RGB', (448, 448))  # JPEGs decode at reduced scale; plenty for 224x224 input
+    img = img.convert('RGB')
+    pixels = np.asarray(img)
+    return np.asarray(img.resize((224, 224))), float(pixels.mean()), float(pixels.std())
+
+
+def verdict(found, confidence, brightness, contrast):
+    """Same rules as verify_image: an insect, in a bright and sharp enough picture."""
+    if not found:
+        return 'rejected', 'Could not detect an insect.'
+    if brightness < 20 or contrast < 10:
+        return 'rejected', 'Image is too dark or blurry.'
+    return 'verified', f'Insect detected on re-verification ({confidence:.2%}).'
+
+
+class Checkpoint:
+    """Progress marker kept next to the output file.
+
+    Records the source and last _id written and the output's byte length at
+    that point, so a resumed run truncates any half-written tail and continues
+    with the next _id of that source. last_id is kept as a string for the
+    source to parse.
+    """
+
+    def __init__(self, output_path):
+        self.path = f"{output_path}.checkpoint"
+        self.source = None
+        self.last_id = None
+        self.offset = 0
+        self.processed = 0
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                state = json.load(f)
+            self.source = state.get('source', MongoImageSource.name)  # Older checkpoints only covered images
+            self.last_id = state['last_id'] or None
+            self.offset = state['offset']
+            self.processed = state['processed']
+
+    def save(self, source, last_id, offset, processed):
+        self.source, self.last_id, self.offset, self.processed = source, str(last_id), offset, processed
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'source': source, 'last_id': str(last_id), 'offset': offset, 'processed': processed}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _documents(sources, checkpoint):
+    """(source, doc) pairs from every source in order, resuming after the checkpoint."""
+    names = [source.name for source in sources]
+    start = names.index(checkpoint.source) if checkpoint.source in names else 0
+    for source in sources[start:]:
+        after_id = None
+        if source.name == checkpoint.source and checkpoint.last_id:
+            after_id = source.parse_id(checkpoint.last_id)
+        for doc in source.find(after_id):
+            yield source, doc
+
+
+def _batches(documents, size):
+    """Batches of up to size docs, each from a single source."""
+    batch, batch_source = [], None
+    for source, doc in documents:
+        if batch and (source is not batch_source or len(batch) == size):
+            yield batch_source, batch
+            batch = []
+        batch_source = source
+        batch.append(doc)
+    if batch:
+        yield batch_source, batch
+
+
+def _score(source, docs, futures, pool):
+    """Wait for a batch's decodes and score them with one forward pass."""
+    results, inputs = [], []
+    for doc, future in zip(docs, futures):
+        result = {
+            'source': source.name,
+            'image_id': str(doc['_id']),
+            'user_id': str(doc['user_id']),
+            'image_url': doc['image_url'],
+            'previous_status': doc.get('verification_status'),
+            'previous_coins': doc.get('coins_awarded') or 0
+        }
+        try:
+            result['_input'] = future.result()
+            inputs.append(result)
+        except Exception as e:
+            result.update(status='error', error=str(e))
+        results.append(result)
+
+    if inputs:
+        with pool.batch() as batch:
+            for result in inputs:
+                batch.add_pixels(result['_input'][0])
+            scores = classify_batch(batch.view())
+        for result, (found, confidence) in zip(inputs, scores):
+            _, brightness, contrast = result.pop('_input')
+            status, feedback = verdict(found, confidence, brightness, contrast)
+            result.update(status=status, confidence=confidence, feedback=feedback,
+                          brightness=brightness, contrast=contrast)
+    return results
+
+
+def _changes(docs, results):
+    changes = []
+    for doc, result in zip(docs, results):
+        if result['status'] == 'error' or result['status'] == result['previous_status']:
+            continue
+        if result['previous_status'] not in FINAL_STATUSES:
+            continue  # Let the verification queue finish; rewriting now could award twice
+        coins = COINS_PER_VERIFIED_IMAGE if result['status'] == 'verified' else 0
+        changes.append({
+            'image_id': doc['_id'],
+            'user_id': doc['user_id'],
+            'status': result['status'],
+            'coins': coins,
+            'feedback': result['feedback'],
+            'delta': coins - result['previous_coins']
+        })
+    return changes
+
+
+def reverify_images(output_path, batch_size=64, readers=16, apply=False, limit=None, restart=False, sources=None):
+    """Re-score every stored image with the current model, writing one JSON line per image.
+
+    Covers the MongoDB images collection and then storage_service's
+    submissions (default_sources), each streamed in _id order while a pool of
+    reader threads fetches and decodes the next batch during inference on the
+    current one. Progress is checkpointed after every batch; rerunning resumes
+    after the last batch written. With apply, changed verdicts on images that
+    already have a final status are written back (status, coins, ledger entry
+    and balance) one bulk write per batch; pending images are only reported.
+    """
+    sources = sources if sources is not None else default_sources()
+    checkpoint = Checkpoint(output_path)
+    if checkpoint.last_id and not os.path.exists(output_path):
+        logger.warning("Output %s is missing; ignoring its checkpoint", output_path)
+        restart = True
+    if restart:
+        checkpoint.clear()
+        checkpoint = Checkpoint(output_path)
+
+    documents = _documents(sources, checkpoint)
+    if limit:
+        documents = itertools.islice(documents, limit)
+
+    mode = 'r+' if checkpoint.last_id else 'w'
+    input_pool = InputBufferPool(batch_size, scaling='mobilenet')
+    processed, changed = checkpoint.processed, 0
+    resumed_at = processed
+    started = time.perf_counter()
+
+    with open(output_path, mode) as output, ThreadPoolExecutor(max_workers=readers, thread_name_prefix='reverify-reader') as pool:
+        # Drop lines written after the last checkpoint by an interrupted run
+        output.truncate(checkpoint.offset)
+        output.seek(checkpoint.offset)
+
+        def finish(source, docs, futures):
+            nonlocal processed, changed
+            results = _score(source, docs, futures, input_pool)
+            for result in results:
+                output.write(json.dumps(result) + '\n')
+            output.flush()
+            os.fsync(output.fileno())
+            if apply:
+                changes = _changes(docs, results)
+                source.apply(changes)
+                changed += len(changes)
+            processed += len(docs)
+            checkpoint.save(source.name, docs[-1]['_id'], output.tell(), processed)
+            rate = (processed - resumed_at) / max(time.perf_counter() - started, 1e-9)
+            logger.info("Re-verified %s images (%.0f/s)", processed, rate)
+
+        pending = None
+        for source, docs in _batches(documents, batch_size):
+            # Start decoding this batch before running inference on the previous one
+            futures = [pool.submit(load_image, doc) for doc in docs]
+            if pending:
+                finish(*pending)
+            pending = (source, docs, futures)
+        if pending:
+            finish(*pending)
+
+    elapsed = time.perf_counter() - started
+    return {'processed': processed, 'changed': changed, 'seconds': elapsed}
+
+
+def write_parquet(jsonl_path, parquet_path):
+    """Convert the JSONL results to Parquet (requires pyarrow)."""
+    import pyarrow.json
+    import pyarrow.parquet
+    pyarrow.parquet.write_table(pyarrow.json.read_json(jsonl_path), parquet_path)
@@ -3,8 +3,6 @@ from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identi
 from app.storage import storage
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 # Create blueprint with correct name
@@ -50,7 +48,7 @@ def login():
         })
         
     except Exception as e:
-        logger.error(f"Login error: {str(e)}")
+        logger.error("Login error: %s", e)
         return jsonify({
             'success': False,
             'error': 'Login failed',
@@ -69,7 +67,7 @@ def get_profile():
         })
         
     except Exception as e:
-        logger.error(f"Profile error: {str(e)}")
+        logger.error("Profile error: %s", e)
         return jsonify({
             'success': False,
             'error': 'Failed to get profile',
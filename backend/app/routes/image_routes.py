@@ -1,29 +1,31 @@
 from flask import Blueprint, request, jsonify, current_app
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 import os
 from datetime import datetime
 from app.services.image_verification import verify_image
 from app.storage import storage
-from app.database import save_image, update_image, create_transaction, update_user_coins
+from app.database import commit_reward
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..services.storage import storage_service
+from ..services.quota import enforce_submission_quota
+from ..services.uploader import get_uploader
+from ..services.derivatives import generate_derivatives, remote_thumbnail_urls, with_thumbnails
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 # Create blueprint with correct name
 image_routes = Blueprint('image_routes', __name__)
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-UPLOAD_FOLDER = 'uploads'
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 @image_routes.route('/upload', methods=['POST'])
 # @jwt_required()  # Temporarily disabled for testing
+@enforce_submission_quota
 def upload_image():
     try:
         current_app.logger.info("Received upload request")
@@ -38,7 +40,7 @@ def upload_image():
             }), 400
             
         file = request.files['image']
-        current_app.logger.info(f"Received file: {file.filename}")
+        current_app.logger.info("Received file: %s", file.filename)
         
         if file.filename == '':
             current_app.logger.error("Empty filename")
@@ -50,7 +52,7 @@ def upload_image():
             }), 400
             
         if not allowed_file(file.filename):
-            current_app.logger.error(f"Invalid file type: {file.filename}")
+            current_app.logger.error("Invalid file type: %s", file.filename)
             return jsonify({
                 'success': False,
                 'error': 'Invalid file type',
@@ -59,55 +61,54 @@ def upload_image():
             }), 400
             
         filename = secure_filename(file.filename)
-        current_app.logger.info(f"Secured filename: {filename}")
+        current_app.logger.info("Secured filename: %s", filename)
         
-        # Create uploads directory if it doesn't exist
-        if not os.path.exists(UPLOAD_FOLDER):
-            os.makedirs(UPLOAD_FOLDER)
-            
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        current_app.logger.info(f"Saving file to: {filepath}")
-        
-        file.save(filepath)
+        # Store by content hash so concurrent uploads with the same name don't collide
+        filepath = storage_service.blob_store.put(file, filename.rsplit('.', 1)[1])
+        current_app.logger.info("Saved file to: %s", filepath)
         
         # Verify the image
         current_app.logger.info("Starting image verification")
         result = verify_image(filepath)
-        current_app.logger.info(f"Verification result: {result}")
+        image = result.pop('image', None)
+        current_app.logger.info("Verification result: %s", result)
         
         if result['success']:
+            # Resized copies go to S3 next to the original, made from the already-decoded image
+            try:
+                derivatives = generate_derivatives(image or filepath, filepath)
+            except Exception as e:
+                current_app.logger.error("Error generating derivatives: %s", e)
+                derivatives = {}
+            
             # Upload to S3
-            s3_url = storage.upload_file(filepath)
-            current_app.logger.info(f"Uploaded to S3: {s3_url}")
+            s3_url = storage.upload_file(filepath, derivatives)
+            current_app.logger.info("Uploaded to S3: %s", s3_url)
             
             # Use test user for development
             current_user = "test_user"
             
-            # Save image to database
-            image = save_image(current_user, s3_url)
-            
-            # Create transaction
-            create_transaction(
+            # Save image, ledger entry and coin award in one write
+            commit_reward(
                 current_user,
-                'EARNED',
+                s3_url,
                 result['coins_earned'],
                 'Mosquito kill verified'
             )
             
-            # Update user's coins
-            update_user_coins(current_user, result['coins_earned'])
-            
-            # Clean up local file
-            os.remove(filepath)
+            # Clean up local files (derivatives go with the last reference)
+            storage_service.release_image(filepath)
             
             return jsonify({
                 'success': True,
                 'message': result['message'],
-                'coins_earned': result['coins_earned']
+                'coins_earned': result['coins_earned'],
+                'image_url': s3_url,
+                'thumbnails': remote_thumbnail_urls(s3_url) if derivatives else None
             })
         else:
             # Clean up local file
-            os.remove(filepath)
+            storage_service.release_image(filepath)
             
             return jsonify({
                 'success': False,
@@ -116,8 +117,11 @@ def upload_image():
                 'code': result.get('code', 'VERIFICATION_FAILED')
             }), 400
             
+    except HTTPException:
+        # Upload rejected while streaming; rendered by the app error handlers
+        raise
     except Exception as e:
-        current_app.logger.error(f"Error processing upload: {str(e)}")
+        current_app.logger.error("Error processing upload: %s", e)
         return jsonify({
             'success': False,
             'error': str(e),
@@ -131,13 +135,21 @@ def get_user_images(username):
         user_profile = storage_service.get_user_profile(username)
         return jsonify({
             'success': True,
-            'images': user_profile['submissions']
+            'images': with_thumbnails(user_profile['submissions'], storage_service.upload_folder)
         })
     except Exception as e:
-        logger.error(f"Error getting user images: {str(e)}")
+        logger.error("Error getting user images: %s", e)
         return jsonify({
             'success': False,
             'error': 'Failed to get user images',
             'message': 'Failed to get user images',
             'code': 'RETRIEVE_ERROR'
-        }), 500 
\ No newline at end of file
+        }), 500 
+
+@image_routes.route('/api/uploader/stats', methods=['GET'])
+@jwt_required()
+def get_uploader_stats():
+    return jsonify({
+        'success': True,
+        'stats': get_uploader().stats()
+    })
\ No newline at end of file
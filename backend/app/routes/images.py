@@ -1,18 +1,21 @@
 import os
-from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.utils import secure_filename
-import boto3
+import threading
+import uuid
+from datetime import timedelta
+from flask import Blueprint, request, jsonify, current_app, Response
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, get_jwt_request_location, create_access_token
+from botocore.exceptions import ClientError
+from config import Config
 from app.storage import storage
-from app.services.image_verification import verify_mosquito_image
+from app.services.image_verification import queue_verification
+from app.services.uploader import get_uploader, get_s3_client, object_url, UploadQueueFull
+from app.services.events import (event_bus, event_stream, acquire_stream_slot, release_stream_slot,
+                                 STREAM_TOKEN_SCOPE)
 
 bp = Blueprint('images', __name__)
 
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=current_app.config['AWS_ACCESS_KEY_ID'],
-    aws_secret_access_key=current_app.config['AWS_SECRET_ACCESS_KEY']
-)
+# Serializes /complete's lookup-then-create so one object key registers once
+_complete_lock = threading.Lock()
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
@@ -32,30 +35,146 @@ def upload_image():
     if not allowed_file(file.filename):
         return jsonify({'error': 'File type not allowed'}), 400
     
-    filename = secure_filename(file.filename)
+    extension = file.filename.rsplit('.', 1)[1].lower()
     user_id = get_jwt_identity()
     
-    # Upload to S3
-    s3_key = f'users/{user_id}/{filename}'
-    s3_client.upload_fileobj(
-        file,
-        current_app.config['AWS_BUCKET_NAME'],
-        s3_key,
-        ExtraArgs={'ACL': 'public-read'}
-    )
+    # Stage for background upload to S3, under a fresh name like /presign's so
+    # two uploads of the same filename don't overwrite each other
+    s3_key = f'users/{user_id}/{uuid.uuid4().hex}.{extension}'
+    try:
+        image_url = get_uploader().enqueue_fileobj(file, s3_key, {'ACL': 'public-read'})
+    except UploadQueueFull:
+        return jsonify({'error': 'Upload service busy, please retry'}), 503
     
     # Create database entry
-    image_url = f"https://{current_app.config['AWS_BUCKET_NAME']}.s3.amazonaws.com/{s3_key}"
     mosquito_image = storage.create_image(user_id, image_url)
+    storage.update_image(mosquito_image['id'], s3_key=s3_key)
     
     # Start async verification
-    verify_mosquito_image.delay(mosquito_image['id'])
+    queue_verification(mosquito_image['id'])
     
     return jsonify({
         'message': 'Image uploaded successfully',
         'image': mosquito_image
     }), 201
 
+@bp.route('/presign', methods=['POST'])
+@jwt_required()
+def presign_upload():
+    """Issue a presigned POST so the client uploads straight to S3."""
+    data = request.get_json() or {}
+    content_type = data.get('content_type')
+    extension = Config.DIRECT_UPLOAD_CONTENT_TYPES.get(content_type)
+    if not extension:
+        return jsonify({'error': 'File type not allowed'}), 400
+    size = data.get('size')
+    if size is not None:
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid size'}), 400
+        if not 0 < size <= Config.MAX_CONTENT_LENGTH:
+            return jsonify({'error': 'File too large'}), 400
+
+    user_id = get_jwt_identity()
+    s3_key = f'users/{user_id}/{uuid.uuid4().hex}.{extension}'
+    presigned = get_s3_client().generate_presigned_post(
+        Bucket=Config.AWS_BUCKET_NAME,
+        Key=s3_key,
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, Config.MAX_CONTENT_LENGTH]
+        ],
+        ExpiresIn=Config.PRESIGNED_URL_EXPIRES
+    )
+    return jsonify({
+        'key': s3_key,
+        'url': presigned['url'],
+        'fields': presigned['fields'],
+        'expires_in': Config.PRESIGNED_URL_EXPIRES
+    }), 201
+
+@bp.route('/complete', methods=['POST'])
+@jwt_required()
+def complete_upload():
+    """Register a direct upload and queue its verification.
+
+    Idempotent per object key: a retried call returns the image registered
+    the first time instead of creating (and verifying) another.
+    """
+    data = request.get_json() or {}
+    s3_key = data.get('key', '')
+    user_id = get_jwt_identity()
+    if not isinstance(s3_key, str) or not s3_key.startswith(f'users/{user_id}/'):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    try:
+        head = get_s3_client().head_object(Bucket=Config.AWS_BUCKET_NAME, Key=s3_key)
+    except ClientError:
+        return jsonify({'error': 'Upload not found'}), 404
+    if head['ContentLength'] > Config.MAX_CONTENT_LENGTH:
+        return jsonify({'error': 'File too large'}), 400
+
+    with _complete_lock:
+        existing = storage.get_image_by_s3_key(s3_key)
+        if existing:
+            return jsonify({'message': 'Image already registered', 'image': existing}), 200
+        mosquito_image = storage.create_image(user_id, object_url(Config.AWS_BUCKET_NAME, s3_key))
+        storage.update_image(mosquito_image['id'], s3_key=s3_key)
+    queue_verification(mosquito_image['id'])
+
+    return jsonify({
+        'message': 'Image uploaded successfully',
+        'image': mosquito_image
+    }), 201
+
+@bp.route('/events/token', methods=['POST'])
+@jwt_required()
+def issue_stream_token():
+    """Issue a short-lived token for the /events URL (EventSource can't set headers)."""
+    token = create_access_token(
+        identity=get_jwt_identity(),
+        additional_claims={'scope': STREAM_TOKEN_SCOPE},
+        expires_delta=timedelta(seconds=Config.SSE_TOKEN_SECONDS)
+    )
+    return jsonify({'token': token, 'expires_in': Config.SSE_TOKEN_SECONDS}), 201
+
+@bp.route('/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_events():
+    """Push status changes, coin awards and rank moves for the current user (SSE)."""
+    # URLs end up in logs and history, so only stream tokens are accepted there
+    if get_jwt_request_location() == 'query_string' and get_jwt().get('scope') != STREAM_TOKEN_SCOPE:
+        return jsonify({'error': 'Use a stream token from /events/token in the URL'}), 401
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+
+    if not acquire_stream_slot():
+        response = jsonify({'error': 'Too many open event streams, please retry'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(max(1, Config.SSE_RETRY_MS // 1000))
+        return response
+    try:
+        subscription = event_bus.subscribe(get_jwt_identity(), last_event_id)
+    except Exception:
+        release_stream_slot()
+        raise
+
+    def close():
+        # Also runs when the client goes before the stream starts
+        event_bus.unsubscribe(subscription)
+        release_stream_slot()
+
+    response = Response(event_stream(subscription), mimetype='text/event-stream')
+    response.call_on_close(close)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let nginx hold events back
+    return response
+
 @bp.route('/my-uploads', methods=['GET'])
 @jwt_required()
 def get_user_uploads():
@@ -1,27 +1,48 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.storage import storage
+from app.services.leaderboard_cache import leaderboard_cache, snapshot_response
 
 bp = Blueprint('leaderboard', __name__)
 
-@bp.route('/global', methods=['GET'])
-def get_global_leaderboard():
+def _build_leaderboard():
     users = storage.get_leaderboard(limit=100)
-    return jsonify([{
+    return [{
         'username': user['username'],
         'coins': user['coins'],
         'rank': rank + 1
-    } for rank, user in enumerate(users)])
+    } for rank, user in enumerate(users)]
 
-@bp.route('/weekly', methods=['GET'])
-def get_weekly_leaderboard():
-    # For testing, we'll just return the global leaderboard
-    users = storage.get_leaderboard(limit=100)
-    return jsonify([{
+@bp.route('/global', methods=['GET'])
+def get_global_leaderboard():
+    snapshot = leaderboard_cache.get('global', storage.version, _build_leaderboard)
+    return snapshot_response(snapshot)
+
+def _build_window_leaderboard(window):
+    users = storage.get_window_leaderboard(window, limit=100)
+    return [{
         'username': user['username'],
         'coins': user['coins'],
         'rank': rank + 1
-    } for rank, user in enumerate(users)])
+    } for rank, user in enumerate(users)]
+
+def _window_response(window):
+    # The window slides with time as well as with awards, so key on both
+    version = (storage.version, storage.windows.epoch(window))
+    snapshot = leaderboard_cache.get(window, version, lambda: _build_window_leaderboard(window))
+    return snapshot_response(snapshot)
+
+@bp.route('/daily', methods=['GET'])
+def get_daily_leaderboard():
+    return _window_response('daily')
+
+@bp.route('/weekly', methods=['GET'])
+def get_weekly_leaderboard():
+    return _window_response('weekly')
+
+@bp.route('/monthly', methods=['GET'])
+def get_monthly_leaderboard():
+    return _window_response('monthly')
 
 @bp.route('/user-rank', methods=['GET'])
 @jwt_required()
@@ -31,13 +52,19 @@ def get_user_rank():
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    # Get the user's rank
-    users = storage.get_leaderboard()
-    rank = next((rank + 1 for rank, u in enumerate(users) if u['id'] == user_id), 0)
+    window = request.args.get('window')
+    if window:
+        if window not in storage.windows.windows:
+            return jsonify({'error': 'Unknown window'}), 400
+        rank = storage.windows.rank(window, user_id)
+    else:
+        # Get the user's rank from the cached rank map
+        ranks = leaderboard_cache.get('ranks', storage.version, storage.get_user_ranks, serialize=False)['data']
+        rank = ranks.get(user_id, 0)
     
     return jsonify({
         'username': user['username'],
         'coins': user['coins'],
         'rank': rank,
         'total_users': len(storage.users)
-    }) 
\ No newline at end of file
+    })
\ No newline at end of file
@@ -1,17 +1,27 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, abort, send_from_directory
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 import os
-from ..services.verification import verify_image
+from ..services.verification import verify_image, verify_batch
 from ..services.storage import storage_service
+from ..services.quota import enforce_submission_quota, charge_submission_quota, refund_submission_quota
+from ..services.upload_validation import request_size_limit
+from ..services.leaderboard_cache import leaderboard_cache, snapshot_response
+from ..services.windowed_leaderboard import WINDOWS, active_buckets
+from ..services.derivatives import (
+    generate_derivatives, is_derivative, thumbnail_urls, with_thumbnails, MEDIA_CACHE_CONTROL
+)
+from config import Config
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 main = Blueprint('main', __name__)
 
+LEADERBOARD_MAX_LIMIT = 100
+
 @main.route('/api/submit', methods=['POST'])
+@enforce_submission_quota
 def submit_image():
     try:
         logger.debug("Received image submission request")
@@ -36,7 +46,7 @@ def submit_image():
             }), 400
             
         if not storage_service.allowed_file(file.filename):
-            logger.error(f"Invalid file type: {file.filename}")
+            logger.error("Invalid file type: %s", file.filename)
             return jsonify({
                 'success': False,
                 'error': 'Invalid file type',
@@ -58,9 +68,9 @@ def submit_image():
         # Save the image
         try:
             filepath = storage_service.save_image(file, file.filename)
-            logger.info(f"Image saved successfully: {filepath}")
+            logger.info("Image saved successfully: %s", filepath)
         except Exception as e:
-            logger.error(f"Error saving image: {str(e)}")
+            logger.error("Error saving image: %s", e)
             return jsonify({
                 'success': False,
                 'error': str(e),
@@ -71,9 +81,9 @@ def submit_image():
         # Verify the image
         try:
             verification_result = verify_image(filepath, username)
-            logger.info(f"Image verification result: {verification_result}")
+            logger.info("Image verification result: %s", verification_result)
         except Exception as e:
-            logger.error(f"Error verifying image: {str(e)}")
+            logger.error("Error verifying image: %s", e)
             return jsonify({
                 'success': False,
                 'error': 'Error verifying image',
@@ -84,10 +94,10 @@ def submit_image():
         if not verification_result['success']:
             # Delete the file if verification failed
             try:
-                os.remove(filepath)
-                logger.info(f"Deleted unverified image: {filepath}")
+                storage_service.release_image(filepath)
+                logger.info("Released unverified image: %s", filepath)
             except Exception as e:
-                logger.error(f"Error deleting unverified image: {str(e)}")
+                logger.error("Error deleting unverified image: %s", e)
                 
             return jsonify({
                 'success': False,
@@ -96,6 +106,12 @@ def submit_image():
                 'code': verification_result['code']
             }), 400
             
+        # Resized copies for the profile and submission views
+        try:
+            generate_derivatives(filepath, filepath)
+        except Exception as e:
+            logger.error("Error generating derivatives for %s: %s", filepath, e)
+            
         # Add submission to storage
         submission = storage_service.add_submission(
             username=username,
@@ -106,11 +122,115 @@ def submit_image():
         return jsonify({
             'success': True,
             'message': 'Image submitted successfully',
-            'submission': submission
+            'submission': dict(submission, thumbnails=thumbnail_urls(filepath, storage_service.upload_folder))
         })
         
+    except HTTPException:
+        # Upload rejected while streaming; rendered by the app error handlers
+        raise
     except Exception as e:
-        logger.error(f"Unexpected error in submit_image: {str(e)}")
+        logger.error("Unexpected error in submit_image: %s", e)
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'An unexpected error occurred',
+            'code': 'UNKNOWN_ERROR'
+        }), 500
+
+@main.route('/api/submit/batch', methods=['POST'])
+@request_size_limit(Config.MAX_BATCH_CONTENT_LENGTH)
+@enforce_submission_quota
+def submit_batch():
+    """Submit several images at once: one decode pool, one forward pass, one storage write."""
+    try:
+        files = [file for file in request.files.getlist('images') if file.filename]
+        if not files:
+            logger.error("No image files in batch request")
+            return jsonify({
+                'success': False,
+                'error': 'No image files provided',
+                'message': 'Please select at least one image file',
+                'code': 'NO_IMAGE'
+            }), 400
+        if len(files) > Config.MAX_BATCH_SUBMISSIONS:
+            return jsonify({
+                'success': False,
+                'error': 'Too many images',
+                'message': f'Submit at most {Config.MAX_BATCH_SUBMISSIONS} images at once',
+                'code': 'BATCH_TOO_LARGE'
+            }), 400
+            
+        username = request.form.get('username')
+        if not username:
+            logger.error("No username provided")
+            return jsonify({
+                'success': False,
+                'error': 'Username is required',
+                'message': 'Please provide a username',
+                'code': 'NO_USERNAME'
+            }), 400
+            
+        # The quota decorator charged one submission; charge the rest of the batch
+        if len(files) > 1:
+            rejected = charge_submission_quota(len(files) - 1)
+            if rejected is not None:
+                return rejected
+            
+        results = [None] * len(files)
+        saved = []  # (index, filepath)
+        for index, file in enumerate(files):
+            if not storage_service.allowed_file(file.filename):
+                results[index] = {
+                    'success': False,
+                    'message': f'Invalid file type. Allowed types are: {", ".join(storage_service.allowed_extensions)}',
+                    'code': 'INVALID_TYPE'
+                }
+                continue
+            try:
+                saved.append((index, storage_service.save_image(file, file.filename)))
+            except Exception as e:
+                logger.error("Error saving image: %s", e)
+                results[index] = {'success': False, 'message': str(e), 'code': 'SAVE_ERROR'}
+                
+        verification_results = verify_batch([filepath for _, filepath in saved], username)
+        accepted = []
+        for (index, filepath), result in zip(saved, verification_results):
+            results[index] = result
+            if not result['success']:
+                storage_service.release_image(filepath)
+                continue
+            try:
+                generate_derivatives(filepath, filepath)
+            except Exception as e:
+                logger.error("Error generating derivatives for %s: %s", filepath, e)
+            accepted.append((index, filepath, result['coins']))
+        # Only accepted images count against the quota (the decorator's charge
+        # is refunded by the decorator if the whole request fails)
+        refund_submission_quota(len(files) - len(accepted))
+            
+        # All accepted images and their coins are committed together
+        submissions = storage_service.add_submissions(
+            [(username, filepath, coins) for _, filepath, coins in accepted]
+        ) if accepted else []
+        for (index, _, _), submission in zip(accepted, submissions):
+            results[index]['submission'] = dict(
+                submission, thumbnails=thumbnail_urls(submission['image_path'], storage_service.upload_folder)
+            )
+        for file, result in zip(files, results):
+            result['filename'] = file.filename
+            
+        return jsonify({
+            'success': True,
+            'message': f'{len(submissions)} of {len(files)} images accepted',
+            'coins_earned': sum(submission['coins'] for submission in submissions),
+            'results': results
+        })
+        
+    except HTTPException:
+        # Upload rejected while streaming; rendered by the app error handlers
+        raise
+    except Exception as e:
+        logger.error("Unexpected error in submit_batch: %s", e)
         return jsonify({
             'success': False,
             'error': str(e),
@@ -131,15 +251,15 @@ def get_submissions():
             }), 400
             
         user_profile = storage_service.get_user_profile(username)
-        logger.info(f"Retrieved submissions for user: {username}")
+        logger.info("Retrieved submissions for user: %s", username)
         
         return jsonify({
             'success': True,
-            'submissions': user_profile['submissions']
+            'submissions': with_thumbnails(user_profile['submissions'], storage_service.upload_folder)
         })
         
     except Exception as e:
-        logger.error(f"Error getting submissions: {str(e)}")
+        logger.error("Error getting submissions: %s", e)
         return jsonify({
             'success': False,
             'error': 'Error retrieving submissions',
@@ -150,18 +270,63 @@ def get_submissions():
 def leaderboard():
     try:
         limit = int(request.args.get('limit', 10))
-        leaderboard_data = storage_service.get_leaderboard(limit)
-        logger.info(f"Retrieved leaderboard with limit: {limit}")
-        
+    except ValueError:
         return jsonify({
-            'success': True,
-            'leaderboard': leaderboard_data
-        })
+            'success': False,
+            'error': 'limit must be an integer',
+            'code': 'INVALID_LIMIT'
+        }), 400
+    # Bounded so the snapshot cache holds at most one entry per limit value
+    limit = max(1, min(limit, LEADERBOARD_MAX_LIMIT))
+    window = request.args.get('window')
+    if window and window not in WINDOWS:
+        return jsonify({
+            'success': False,
+            'error': f'window must be one of: {", ".join(WINDOWS)}',
+            'code': 'INVALID_WINDOW'
+        }), 400
+    try:
+        if window:
+            # The window slides with time as well as with awards, so key on both
+            snapshot = leaderboard_cache.get(
+                f"api:{window}:{limit}",
+                (storage_service.version, active_buckets(window)[0]),
+                lambda: {
+                    'success': True,
+                    'window': window,
+                    'leaderboard': storage_service.get_window_leaderboard(window, limit)
+                }
+            )
+        else:
+            snapshot = leaderboard_cache.get(
+                f"api:{limit}",
+                storage_service.version,
+                lambda: {
+                    'success': True,
+                    'leaderboard': storage_service.get_leaderboard(limit)
+                }
+            )
+        logger.info("Retrieved %s leaderboard with limit: %s", window or 'all-time', limit)
+        
+        return snapshot_response(snapshot)
         
     except Exception as e:
-        logger.error(f"Error getting leaderboard: {str(e)}")
+        logger.error("Error getting leaderboard: %s", e)
         return jsonify({
             'success': False,
             'error': 'Error retrieving leaderboard',
             'code': 'LEADERBOARD_ERROR'
-        }), 500 
\ No newline at end of file
+        }), 500
+
+@main.route('/media/<path:filename>', methods=['GET'])
+def serve_media(filename):
+    # Only derivatives are public; originals stay private
+    if not is_derivative(filename):
+        abort(404)
+    response = send_from_directory(
+        os.path.abspath(storage_service.upload_folder),
+        filename,
+        max_age=Config.MEDIA_MAX_AGE
+    )
+    response.headers['Cache-Control'] = MEDIA_CACHE_CONTROL
+    return response
@@ -3,9 +3,14 @@ from app.database import (
     get_leaderboard,
     get_user_transactions,
     create_transaction,
-    get_user_by_username
+    get_user_by_username,
+    encode_cursor,
+    decode_cursor
 )
 from flask_jwt_extended import jwt_required, get_jwt_identity
+import logging
+
+logger = logging.getLogger(__name__)
 
 user_bp = Blueprint('user', __name__)
 
@@ -15,7 +20,7 @@ def get_leaderboard_data():
         leaderboard = get_leaderboard()
         return jsonify(leaderboard)
     except Exception as e:
-        print(f"Error fetching leaderboard: {str(e)}")
+        logger.error("Error fetching leaderboard: %s", e)
         return jsonify({"error": "Failed to fetch leaderboard data"}), 500
 
 @user_bp.route('/api/transactions', methods=['GET'])
@@ -23,10 +28,22 @@ def get_leaderboard_data():
 def get_transactions():
     try:
         current_user = get_jwt_identity()
-        transactions = get_user_transactions(current_user)
-        return jsonify(transactions)
+        try:
+            limit = max(1, min(int(request.args.get('limit', 10)), 100))
+        except ValueError:
+            return jsonify({"error": "Invalid limit"}), 400
+        before = request.args.get('before')
+        try:
+            before = decode_cursor(before) if before else None
+        except Exception:
+            return jsonify({"error": "Invalid cursor"}), 400
+        transactions = get_user_transactions(current_user, limit=limit, before=before)
+        response = jsonify([{**t, '_id': str(t['_id'])} for t in transactions])
+        if len(transactions) == limit:
+            response.headers['X-Next-Cursor'] = encode_cursor(transactions[-1], 'timestamp')
+        return response
     except Exception as e:
-        print(f"Error fetching transactions: {str(e)}")
+        logger.error("Error fetching transactions: %s", e)
         return jsonify({"error": "Failed to fetch transaction data"}), 500
 
 @user_bp.route('/api/balance', methods=['GET'])
@@ -42,5 +59,5 @@ def get_balance():
             })
         return jsonify({"error": "User not found"}), 404
     except Exception as e:
-        print(f"Error fetching balance: {str(e)}")
+        logger.error("Error fetching balance: %s", e)
         return jsonify({"error": "Failed to fetch balance"}), 500 
\ No newline at end of file
@@ -0,0 +1,186 @@
+from contextlib import contextmanager
+import glob
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import logging
+from .derivatives import derivative_path, is_derivative, DERIVATIVE_FORMATS
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+INDEX_NAME = 'blobs.db'
+EXTENSION_ALIASES = {'jpeg': 'jpg'}
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class BlobStore:
+    """Content-addressed file store laid out as <root>/<ab>/<cd>/<sha256>.<ext>.
+
+    Identical bytes are stored once. A SQLite table next to the blobs counts
+    references, and a blob (with any derivatives named <sha256>_*) is deleted
+    only when its last reference is released. Writes land in <root>/tmp and
+    are renamed into place, so readers never see a partial file.
+
+    A second table records which stored contents have been claimed by an
+    accepted submission, so every worker sharing the store agrees on what
+    is a duplicate.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            "digest TEXT PRIMARY KEY, ext TEXT NOT NULL, refcount INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        self._connection().execute("CREATE TABLE IF NOT EXISTS claims (digest TEXT PRIMARY KEY) WITHOUT ROWID")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, INDEX_NAME), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def path_for(self, digest, ext):
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.{ext}")
+
+    def put(self, fileobj, ext):
+        """Store the bytes of a readable stream and return the blob's path."""
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            return self._commit(tmp_path, digest.hexdigest(), ext)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def adopt(self, path, ext):
+        """Move an existing file into the store, dropping it if the bytes are already stored."""
+        blob_path = self._commit(path, hash_file(path), ext)
+        if os.path.exists(path):
+            os.remove(path)
+        return blob_path
+
+    def _commit(self, source, digest, ext):
+        ext = ext.lower()
+        ext = EXTENSION_ALIASES.get(ext, ext)
+        # The reference and the rename happen under one write lock so a
+        # concurrent release can't delete the blob between them
+        with self._transaction() as conn:
+            row = conn.execute("SELECT ext FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if row:
+                ext = row[0]
+                conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE digest = ?", (digest,))
+            else:
+                conn.execute("INSERT INTO blobs (digest, ext, refcount) VALUES (?, ?, 1)", (digest, ext))
+            path = self.path_for(digest, ext)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(source, path)
+                _fsync_dir(os.path.dirname(path))
+        return path
+
+    def release(self, path):
+        """Drop one reference to a blob; returns True if the blob was deleted."""
+        digest = os.path.splitext(os.path.basename(path))[0]
+        with self._transaction() as conn:
+            row = conn.execute("SELECT refcount FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                logger.warning("Release of unknown blob %s", path)
+                return False
+            if row[0] > 1:
+                conn.execute("UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?", (digest,))
+                return False
+            conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            conn.execute("DELETE FROM claims WHERE digest = ?", (digest,))
+            for stored in [path] + glob.glob(os.path.join(os.path.dirname(path), f"{digest}_*")):
+                try:
+                    os.remove(stored)
+                except FileNotFoundError:
+                    pass
+        return True
+
+    def claim(self, digests):
+        """Claim contents for accepted submissions; returns the digests nobody had claimed yet."""
+        with self._transaction() as conn:
+            return [
+                digest for digest in digests
+                if conn.execute("INSERT OR IGNORE INTO claims (digest) VALUES (?)", (digest,)).rowcount
+            ]
+
+    def unclaim(self, digests):
+        """Give up claims, e.g. for images that failed verification."""
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM claims WHERE digest = ?", [(digest,) for digest in digests])
+
+    def refcount(self, path):
+        digest = os.path.splitext(os.path.basename(path))[0]
+        row = self._connection().execute("SELECT refcount FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return row[0] if row else 0
+
+
+def migrate_flat_uploads(store, dry_run=False):
+    """Move originals from the old flat uploads/ layout into the store.
+
+    Each old file becomes one reference; derivatives generated for it are
+    renamed along with it. Returns {old_path: new_path}.
+    """
+    moved = {}
+    for name in sorted(os.listdir(store.root)):
+        old_path = os.path.join(store.root, name)
+        if not os.path.isfile(old_path) or name.startswith(INDEX_NAME) or is_derivative(name) or '.' not in name:
+            continue
+        ext = name.rsplit('.', 1)[1]
+        if dry_run:
+            moved[old_path] = store.path_for(hash_file(old_path), EXTENSION_ALIASES.get(ext.lower(), ext.lower()))
+            continue
+        new_path = store.adopt(old_path, ext)
+        for width in Config.DERIVATIVE_WIDTHS:
+            for derivative_ext in DERIVATIVE_FORMATS:
+                old_derivative = derivative_path(old_path, width, derivative_ext)
+                if os.path.exists(old_derivative):
+                    os.replace(old_derivative, derivative_path(new_path, width, derivative_ext))
+        moved[old_path] = new_path
+        logger.debug("Moved %s to %s", old_path, new_path)
+    return moved
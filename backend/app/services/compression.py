@@ -0,0 +1,82 @@
+from collections import OrderedDict
+import gzip
+import threading
+import logging
+from flask import request
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/plain', 'text/html', 'text/css', 'application/javascript'}
+
+
+class ResponseCompressor:
+    """after_request hook compressing large responses with brotli or gzip.
+
+    The encoding is negotiated from Accept-Encoding, preferring brotli. Bodies
+    with a strong ETag (cached leaderboard snapshots) are compressed once per
+    encoding and reused; the compressed response gets a weak ETag so
+    If-None-Match revalidation keeps working.
+    """
+
+    def __init__(self, min_bytes=None, cache_size=256):
+        self.min_bytes = Config.COMPRESS_MIN_BYTES if min_bytes is None else min_bytes
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (etag, encoding) -> compressed body
+        self._lock = threading.Lock()
+
+    def choose_encoding(self, accept_encodings):
+        best, best_quality = None, 0
+        for encoding in (('br', 'gzip') if brotli is not None else ('gzip',)):
+            quality = accept_encodings[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=Config.BROTLI_QUALITY)
+        return gzip.compress(body, compresslevel=Config.GZIP_LEVEL, mtime=0)
+
+    def _cached_compress(self, etag, body, encoding):
+        key = (etag, encoding)
+        with self._lock:
+            compressed = self._cache.get(key)
+            if compressed is not None:
+                self._cache.move_to_end(key)
+                return compressed
+        compressed = self.compress(body, encoding)
+        with self._lock:
+            self._cache[key] = compressed
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return compressed
+
+    def __call__(self, response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        body = response.get_data()
+        if len(body) < self.min_bytes:
+            return response
+        encoding = self.choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            compressed = self._cached_compress(etag, body, encoding)
+            response.set_etag(etag, weak=True)
+        else:
+            compressed = self.compress(body, encoding)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,110 @@
+from functools import lru_cache
+import os
+import re
+import logging
+from flask import url_for
+from PIL import Image, ImageOps
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# ext -> (Pillow format, save options)
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+DERIVATIVE_CONTENT_TYPES = {'webp': 'image/webp', 'jpg': 'image/jpeg'}
+DERIVATIVE_NAME = re.compile(r'_w\d+\.(webp|jpg)$')
+
+# Derivative names are derived from their original's name, which never gets
+# new content, so caches can keep them forever
+MEDIA_CACHE_CONTROL = f'public, max-age={Config.MEDIA_MAX_AGE}, immutable'
+
+
+def derivative_path(original, width, ext):
+    """Name of a derivative next to its original; works for paths, S3 keys and URLs."""
+    return f"{os.path.splitext(original)[0]}_w{width}.{ext}"
+
+
+def is_derivative(name):
+    return DERIVATIVE_NAME.search(name) is not None
+
+
+def _decode(source):
+    if isinstance(source, Image.Image):
+        return source
+    image = Image.open(source)
+    # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when the largest derivative allows it
+    largest = max(Config.DERIVATIVE_WIDTHS)
+    image.draft('RGB', (largest, largest))
+    return image
+
+
+def _save_atomic(image, path, image_format, options):
+    tmp_path = f"{path}.tmp"
+    image.save(tmp_path, image_format, **options)
+    os.replace(tmp_path, path)
+
+
+def generate_derivatives(source, original_path, widths=None):
+    """Write WebP and JPEG copies of an image at fixed widths next to original_path.
+
+    source is an already-decoded PIL image or a path to decode. Widths are
+    produced largest first, each resized from the previous one, and images
+    narrower than a width are never upscaled. Returns {width: {ext: path}}.
+    """
+    image = ImageOps.exif_transpose(_decode(source))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    derivatives = {}
+    for width in sorted(widths or Config.DERIVATIVE_WIDTHS, reverse=True):
+        if width < image.width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS, reducing_gap=2.0)
+        paths = {}
+        for ext, (image_format, options) in DERIVATIVE_FORMATS.items():
+            path = derivative_path(original_path, width, ext)
+            _save_atomic(image, path, image_format, options)
+            paths[ext] = path
+        derivatives[width] = paths
+    logger.debug("Generated %s derivatives for %s", len(derivatives), original_path)
+    return derivatives
+
+
+@lru_cache(maxsize=65536)
+def _has_derivatives(original_path):
+    # Settled before a submission is recorded, and kept while it references
+    # the blob, so one stat per path per process is enough
+    return os.path.exists(derivative_path(original_path, min(Config.DERIVATIVE_WIDTHS), 'webp'))
+
+
+def thumbnail_urls(original_path, upload_folder):
+    """Media URLs for the derivatives of a locally stored original, or None if it has none."""
+    widths = Config.DERIVATIVE_WIDTHS
+    if not original_path or not _has_derivatives(original_path):
+        return None
+    relative = os.path.relpath(original_path, upload_folder)
+    return {
+        str(width): {
+            ext: url_for('main.serve_media', filename=derivative_path(relative, width, ext))
+            for ext in DERIVATIVE_FORMATS
+        }
+        for width in widths
+    }
+
+
+def remote_thumbnail_urls(original_url):
+    """Derivative URLs of an original uploaded to S3, which sit beside it in the bucket."""
+    return {
+        str(width): {ext: derivative_path(original_url, width, ext) for ext in DERIVATIVE_FORMATS}
+        for width in Config.DERIVATIVE_WIDTHS
+    }
+
+
+def with_thumbnails(submissions, upload_folder):
+    """Copy submission dicts, adding the URLs of their derivatives."""
+    return [
+        dict(submission, thumbnails=thumbnail_urls(submission.get('image_path'), upload_folder))
+        for submission in submissions
+    ]
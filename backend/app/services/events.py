@@ -0,0 +1,251 @@
+from collections import deque
+import itertools
+import os
+import queue
+import sqlite3
+import threading
+import time
+import logging
+from config import Config
+from .json_provider import dumps_bytes
+
+logger = logging.getLogger(__name__)
+
+# Returned by Subscription.get once a slow client's buffer has overflowed
+OVERFLOW = object()
+
+# JWT claim marking the short-lived tokens accepted in the /events URL
+STREAM_TOKEN_SCOPE = 'events'
+
+
+class MemoryEventBroker:
+    """Events for this process only; keeps the last few per user for resume."""
+
+    def __init__(self, replay_size=None):
+        self.replay_size = replay_size or Config.SSE_REPLAY_SIZE
+        self.deliver = None  # Set by EventBus
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._recent = {}  # user_id -> deque of events
+
+    def start(self):
+        pass
+
+    def publish(self, user_id, event_type, data):
+        with self._lock:
+            event = {'id': next(self._ids), 'user_id': user_id, 'type': event_type, 'data': dumps_bytes(data).decode('utf-8')}
+            self._recent.setdefault(user_id, deque(maxlen=self.replay_size)).append(event)
+            # Delivered under the lock so subscribers see ids in order
+            self.deliver(event)
+
+    def replay(self, user_id, after_id):
+        with self._lock:
+            return [event for event in self._recent.get(user_id, ()) if event['id'] > after_id]
+
+
+class SQLiteEventBroker:
+    """Broker stand-in shared by every worker on the box through a SQLite file.
+
+    Publishers append rows; SQLite's autoincrement ids give one global order.
+    Each worker polls for new rows on a background thread and fans them out
+    to its local subscribers. Rows older than SSE_REPLAY_SECONDS are trimmed.
+    """
+
+    def __init__(self, path, poll_interval_ms=None):
+        self.path = path
+        self.poll_interval = (poll_interval_ms or Config.EVENT_POLL_INTERVAL_MS) / 1000.0
+        self.deliver = None  # Set by EventBus
+        self._local = threading.local()
+        self._thread = None
+        self._thread_pid = None
+        self._start_lock = threading.Lock()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, type TEXT NOT NULL, "
+            "data TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._connection().execute("CREATE INDEX IF NOT EXISTS idx_events_user_id ON events (user_id, id)")
+        # SQLite connections must not cross a fork; workers open their own
+        os.register_at_fork(after_in_child=self._reset_connections)
+
+    def _reset_connections(self):
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        """Start this process's poller (again after a fork, since threads don't survive it)."""
+        with self._start_lock:
+            if self._thread_pid == os.getpid():
+                return
+            last_id = self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+            self._thread = threading.Thread(target=self._poll, args=(last_id,), name='event-poller', daemon=True)
+            self._thread.start()
+            self._thread_pid = os.getpid()
+
+    def publish(self, user_id, event_type, data):
+        self._connection().execute(
+            "INSERT INTO events (user_id, type, data, created) VALUES (?, ?, ?, ?)",
+            (user_id, event_type, dumps_bytes(data).decode('utf-8'), time.time())
+        )
+
+    def replay(self, user_id, after_id):
+        rows = self._connection().execute(
+            "SELECT id, user_id, type, data FROM events WHERE user_id = ? AND id > ? ORDER BY id",
+            (user_id, after_id)
+        ).fetchall()
+        return [{'id': row[0], 'user_id': row[1], 'type': row[2], 'data': row[3]} for row in rows]
+
+    def _poll(self, last_id):
+        conn = self._connection()
+        polls = 0
+        while True:
+            rows = []
+            try:
+                rows = conn.execute(
+                    "SELECT id, user_id, type, data FROM events WHERE id > ? ORDER BY id LIMIT 500", (last_id,)
+                ).fetchall()
+                for row in rows:
+                    self.deliver({'id': row[0], 'user_id': row[1], 'type': row[2], 'data': row[3]})
+                    last_id = row[0]
+                polls += 1
+                if polls % 300 == 0:
+                    conn.execute("DELETE FROM events WHERE created < ?", (time.time() - Config.SSE_REPLAY_SECONDS,))
+            except sqlite3.Error as e:
+                logger.error("Error polling events: %s", e)
+            if not rows:
+                time.sleep(self.poll_interval)
+
+
+class Subscription:
+    """One SSE connection's bounded buffer of events for a user.
+
+    Events are queued in id order and never twice. When the client can't keep
+    up and the buffer fills, the subscription is marked overflowed: the stream
+    ends and the client reconnects with Last-Event-ID to replay what it missed.
+    """
+
+    def __init__(self, user_id, max_buffer):
+        self.user_id = user_id
+        self.last_id = 0
+        self.overflowed = False
+        self.replaying = True
+        self.pending = []  # Live events that arrive while the replay is read
+        self._queue = queue.Queue(maxsize=max_buffer)
+
+    def offer(self, event):
+        if self.replaying:
+            self.pending.append(event)
+            return
+        if self.overflowed or event['id'] <= self.last_id:
+            return
+        try:
+            self._queue.put_nowait(event)
+            self.last_id = event['id']
+        except queue.Full:
+            self.overflowed = True
+            logger.warning("Event buffer full for user %s; closing stream", self.user_id)
+
+    def get(self, timeout):
+        """Next event, None after timeout with nothing to send, or OVERFLOW."""
+        try:
+            return self._queue.get(timeout=0 if self.overflowed else timeout)
+        except queue.Empty:
+            return OVERFLOW if self.overflowed else None
+
+
+class EventBus:
+    """Per-user pub/sub for pushing verification, coin and rank updates."""
+
+    def __init__(self, broker, max_buffer=None):
+        self.broker = broker
+        self.broker.deliver = self._deliver
+        self.max_buffer = max_buffer or Config.SSE_BUFFER_SIZE
+        self._lock = threading.Lock()
+        self._subscribers = {}  # user_id -> set of Subscription
+
+    def publish(self, user_id, event_type, data):
+        try:
+            self.broker.publish(str(user_id), event_type, data)
+        except Exception as e:
+            # Notifications are best effort; never fail the write that caused them
+            logger.error("Error publishing %s event: %s", event_type, e)
+
+    def subscribe(self, user_id, last_event_id=None):
+        self.broker.start()
+        subscription = Subscription(str(user_id), self.max_buffer)
+        with self._lock:
+            self._subscribers.setdefault(subscription.user_id, set()).add(subscription)
+        # Read the replay outside the lock; live events meanwhile wait in pending
+        missed = self.broker.replay(subscription.user_id, last_event_id) if last_event_id is not None else []
+        with self._lock:
+            subscription.replaying = False
+            for event in sorted(missed + subscription.pending, key=lambda event: event['id']):
+                subscription.offer(event)
+            subscription.pending = []
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def _deliver(self, event):
+        with self._lock:
+            for subscription in self._subscribers.get(event['user_id'], ()):
+                subscription.offer(event)
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {event['data']}\n\n"
+
+
+def event_stream(subscription, heartbeat_seconds=None):
+    """Yield SSE frames for a subscription, with comment heartbeats while idle."""
+    heartbeat_seconds = heartbeat_seconds or Config.SSE_HEARTBEAT_SECONDS
+    try:
+        yield f"retry: {Config.SSE_RETRY_MS}\n\n"
+        while True:
+            event = subscription.get(heartbeat_seconds)
+            if event is OVERFLOW:
+                return
+            if event is None:
+                yield ": heartbeat\n\n"
+                continue
+            yield format_event(event)
+    finally:
+        event_bus.unsubscribe(subscription)
+
+
+# Bounds the streams one process holds open, so SSE can't take every request thread
+_stream_slots = threading.BoundedSemaphore(Config.SSE_MAX_STREAMS) if Config.SSE_MAX_STREAMS else None
+
+
+def acquire_stream_slot():
+    """Reserve a stream slot without waiting; False when the process is at SSE_MAX_STREAMS."""
+    return _stream_slots is None or _stream_slots.acquire(blocking=False)
+
+
+def release_stream_slot():
+    if _stream_slots is not None:
+        _stream_slots.release()
+
+
+def _create_broker():
+    if Config.EVENT_BROKER_PATH:
+        return SQLiteEventBroker(Config.EVENT_BROKER_PATH)
+    return MemoryEventBroker()
+
+
+# Create a singleton instance
+event_bus = EventBus(_create_broker())
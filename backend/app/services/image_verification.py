@@ -1,15 +1,27 @@
 import os
-from PIL import Image
+from PIL import Image, ImageFilter
 import numpy as np
 import requests
-from io import BytesIO
 from app.storage import storage
+from app.services.uploader import get_s3_client
+from app.services.input_buffers import InputBufferPool
+from app.services.model_artifacts import get_artifacts
+from app.services.model_registry import model_registry
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from config import Config
 from datetime import datetime
-import tensorflow as tf
+import tempfile
+import threading
+import time
 from pathlib import Path
+import logging
 
-# Load the pre-trained model
-model = tf.keras.applications.MobileNetV2(weights='imagenet', include_top=True)
+logger = logging.getLogger(__name__)
+
+def get_model():
+    """The shared MobileNetV2, loaded from the verified local bundle on first use (no downloads)."""
+    return model_registry.get('mobilenet_v2')
 
 # Store image hashes in memory
 image_hashes = {}
@@ -37,34 +49,142 @@ def is_similar_image(current_hash, threshold=5):
                     return True
     return False
 
-def preprocess_image(image):
-    """Preprocess the image for the model."""
-    try:
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Resize image to 224x224 (MobileNetV2 input size)
-        image = image.resize((224, 224))
-        
-        # Convert to numpy array and preprocess
-        img_array = tf.keras.preprocessing.image.img_to_array(image)
-        img_array = tf.keras.applications.mobilenet_v2.preprocess_input(img_array)
-        img_array = np.expand_dims(img_array, axis=0)
+# Reused float32 input buffers, one slot per image in a forward pass
+input_pool = InputBufferPool(max(1, Config.TILE_BATCH_SIZE), scaling='mobilenet')
+
+# Expanded list of insect-related classes and similar objects
+INSECT_RELATED_CLASSES = {
+    'mosquito', 'insect', 'bug', 'fly', 'beetle', 'arthropod', 
+    'invertebrate', 'spider', 'ant', 'bee', 'wasp', 'moth', 
+    'butterfly', 'dragonfly', 'cricket', 'grasshopper',
+    # Add more general terms that might indicate a small insect
+    'dot', 'spot', 'mark', 'speck', 'point', 'dark_spot',
+    'creature', 'animal', 'small', 'tiny', 'black', 'wing',
+    # Add some similar looking objects
+    'nail', 'pin', 'tack'
+}
+
+def detect_insect(decoded_predictions):
+    """Return (found, confidence) for insect-related classes among the top predictions."""
+    # Check for any insect-related predictions with a lower confidence threshold
+    found_potential_insect = False
+    max_confidence = 0.0
+    
+    for pred in decoded_predictions:
+        class_name = pred[1].lower().replace('_', ' ')
+        confidence = pred[2]
         
-        return img_array
-    except Exception as e:
-        print(f"Error preprocessing image: {str(e)}")
-        return None
+        # Check if any part of the class name matches our insect classes
+        # or if it's a small dark object (potential insect)
+        for word in class_name.split():
+            if word in INSECT_RELATED_CLASSES:
+                found_potential_insect = True
+                max_confidence = max(max_confidence, confidence)
+                break
+    return found_potential_insect, float(max_confidence)
+
+def classify_batch(batch):
+    """Run one forward pass over preprocessed images; returns (found, confidence) per image."""
+    # predict_on_batch takes the buffer as one batch, without predict's dataset pipeline
+    predictions = get_model().predict_on_batch(batch)
+    decoded = get_artifacts().decode_predictions(predictions, top=10)
+    return [detect_insect(top) for top in decoded]
+
+def saliency_boxes(image, scales=None, max_tiles=None):
+    """Pick up to max_tiles square regions with the most local contrast.
+
+    Works on a small grayscale copy: the difference from a box blur lights up
+    small dark objects on plain backgrounds, and an integral image makes each
+    window's score O(1). Windows at every scale (a fraction of the short side)
+    are ranked and overlapping ones dropped. Boxes are in original pixels.
+    """
+    scales = scales or Config.TILE_SCALES
+    max_tiles = Config.MAX_TILES if max_tiles is None else max_tiles
+    small = image.convert('L')
+    small.thumbnail((Config.SALIENCY_SIZE, Config.SALIENCY_SIZE))
+    gray = np.asarray(small, dtype=np.float32)
+    saliency = np.abs(gray - np.asarray(small.filter(ImageFilter.BoxBlur(4)), dtype=np.float32))
+    integral = np.pad(saliency.cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+    height, width = saliency.shape
+
+    candidates = []
+    for scale in scales:
+        side = max(8, int(min(width, height) * scale))
+        stride = max(1, side // 2)
+        for top in range(0, height - side + 1, stride):
+            for left in range(0, width - side + 1, stride):
+                total = (integral[top + side, left + side] - integral[top, left + side]
+                         - integral[top + side, left] + integral[top, left])
+                candidates.append((total / (side * side), left, top, side))
+    candidates.sort(reverse=True)
+
+    picked = []
+    for score, left, top, side in candidates:
+        if len(picked) == max_tiles:
+            break
+        # Skip windows mostly covering one already picked
+        if any(_overlap(left, top, side, other) > 0.5 for other in picked):
+            continue
+        picked.append((left, top, side))
+
+    # thumbnail() rounds each side separately, so scale the axes separately
+    # and clamp: boxes past the edge make Image.resize(box=...) raise
+    x_ratio, y_ratio = image.width / width, image.height / height
+    return [
+        (min(int(left * x_ratio), image.width), min(int(top * y_ratio), image.height),
+         min(int((left + side) * x_ratio), image.width), min(int((top + side) * y_ratio), image.height))
+        for left, top, side in picked
+    ]
+
+def _overlap(left, top, side, other):
+    """Fraction of the smaller of two square windows covered by their intersection."""
+    other_left, other_top, other_side = other
+    dx = min(left + side, other_left + other_side) - max(left, other_left)
+    dy = min(top + side, other_top + other_side) - max(top, other_top)
+    if dx <= 0 or dy <= 0:
+        return 0.0
+    return dx * dy / min(side, other_side) ** 2
+
+def verify_tiled(image):
+    """Score the whole frame plus salient crops, stopping at the first confident batch.
+
+    The frame and up to MAX_TILES crops are classified TILE_BATCH_SIZE at a
+    time, so the worst case is a fixed number of forward passes. Returns the
+    best insect tile and every tile scored.
+    """
+    image = image.convert('RGB')
+    boxes = [(0, 0, image.width, image.height)] + saliency_boxes(image)
+    tiles, best = [], None
+    for start in range(0, len(boxes), Config.TILE_BATCH_SIZE):
+        chunk = boxes[start:start + Config.TILE_BATCH_SIZE]
+        with input_pool.batch() as batch:
+            for box in chunk:
+                batch.add(image, box)
+            scores = classify_batch(batch.view())
+        for box, (found, confidence) in zip(chunk, scores):
+            tile = {'box': list(box), 'found': found, 'confidence': confidence}
+            tiles.append(tile)
+            if found and (best is None or confidence > best['confidence']):
+                best = tile
+        if best and best['confidence'] >= Config.TILE_CONFIDENCE_THRESHOLD:
+            break
+    logger.debug("Tiled verification scored %s of %s tiles", len(tiles), len(boxes))
+    return {
+        'found': best is not None,
+        'confidence': best['confidence'] if best else 0.0,
+        'box': best['box'] if best else None,
+        'tiles': tiles
+    }
 
 def verify_image(image_path):
     """Verify if the image contains a mosquito."""
     try:
-        # Open and preprocess the image
-        img = Image.open(image_path)
-        img_array = preprocess_image(img)
-        
-        if img_array is None:
+        # Open and decode the image
+        try:
+            img = Image.open(image_path)
+            img.load()
+        except Exception as e:
+            logger.error("Error decoding image: %s", e)
             return {
                 'success': False,
                 'message': 'Invalid or corrupted image'
@@ -80,41 +200,22 @@ def verify_image(image_path):
                 'message': 'This appears to be the same mosquito from a different angle. Please submit a new mosquito image.'
             }
         
-        # Get predictions from the model
-        predictions = model.predict(img_array)
-        decoded_predictions = tf.keras.applications.mobilenet_v2.decode_predictions(predictions, top=10)[0]
-        
-        # Print predictions for debugging
-        print("Model predictions:", decoded_predictions)
-        
-        # Expanded list of insect-related classes and similar objects
-        insect_related_classes = [
-            'mosquito', 'insect', 'bug', 'fly', 'beetle', 'arthropod', 
-            'invertebrate', 'spider', 'ant', 'bee', 'wasp', 'moth', 
-            'butterfly', 'dragonfly', 'cricket', 'grasshopper',
-            # Add more general terms that might indicate a small insect
-            'dot', 'spot', 'mark', 'speck', 'point', 'dark_spot',
-            'creature', 'animal', 'small', 'tiny', 'black', 'wing',
-            # Add some similar looking objects
-            'nail', 'pin', 'tack', 'dot', 'spot', 'mark'
-        ]
-        
-        # Check for any insect-related predictions with a lower confidence threshold
-        found_potential_insect = False
-        max_confidence = 0.0
-        
-        for pred in decoded_predictions:
-            class_name = pred[1].lower().replace('_', ' ')
-            confidence = pred[2]
+        tiled = None
+        if Config.VERIFICATION_MODE == 'tiled':
+            # Look for small insects in salient crops as well as the whole frame
+            tiled = verify_tiled(img)
+            found_potential_insect, max_confidence = tiled['found'], tiled['confidence']
+        else:
+            # Get predictions from the model, preprocessing straight into a pooled buffer
+            with input_pool.batch() as batch:
+                batch.add(img)
+                predictions = get_model().predict_on_batch(batch.view())
+            decoded_predictions = get_artifacts().decode_predictions(predictions, top=10)[0]
+            
+            # Log predictions for debugging (sampled, formatted off the request thread)
+            logger.debug("Model predictions: %s", decoded_predictions)
             
-            # Check if any part of the class name matches our insect classes
-            # or if it's a small dark object (potential insect)
-            words = class_name.split()
-            for word in words:
-                if word in insect_related_classes:
-                    found_potential_insect = True
-                    max_confidence = max(max_confidence, confidence)
-                    break
+            found_potential_insect, max_confidence = detect_insect(decoded_predictions)
         
         # If we found any potential insect or small object
         if found_potential_insect:
@@ -134,12 +235,17 @@ def verify_image(image_path):
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             image_hashes[f"{timestamp}_{Path(image_path).name}"] = img_hash
             
-            return {
+            result = {
                 'success': True,
                 'message': 'Insect detected and verified! Coins awarded.',
                 'coins_earned': 10,
-                'confidence': max_confidence
+                'confidence': max_confidence,
+                'image': img  # Decoded once; reused for derivatives
             }
+            if tiled:
+                result['box'] = tiled['box']
+                result['tiles'] = tiled['tiles']
+            return result
         
         # If no insect detected, check image quality
         img_array = np.array(img)
@@ -163,12 +269,54 @@ def verify_image(image_path):
             }
             
     except Exception as e:
-        print(f"Error verifying image: {str(e)}")
+        logger.error("Error verifying image: %s", e)
         return {
             'success': False,
             'message': f'Error processing image: {str(e)}'
         }
 
+def _iter_image_chunks(image, chunk_size=64 * 1024):
+    """Stream the stored image: straight from the bucket when the key is known, else over HTTP."""
+    if image.get('s3_key'):
+        for attempt in range(5):
+            try:
+                body = get_s3_client().get_object(Bucket=Config.AWS_BUCKET_NAME, Key=image['s3_key'])['Body']
+                return body.iter_chunks(chunk_size)
+            except ClientError as e:
+                # The background uploader may not have pushed the object yet
+                if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404') or attempt == 4:
+                    raise
+                time.sleep(0.5 * 2 ** attempt)
+    response = requests.get(image['image_url'], stream=True, timeout=30)
+    response.raise_for_status()
+    return response.iter_content(chunk_size)
+
+def fetch_image_bytes(image):
+    """Read a stored image into memory, refusing anything over the upload limit."""
+    chunks, size = [], 0
+    for chunk in _iter_image_chunks(image):
+        size += len(chunk)
+        if size > Config.MAX_CONTENT_LENGTH:
+            raise ValueError('Stored image exceeds the maximum upload size')
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+def _fetch_to_tempfile(image):
+    """Copy the stored image into a temporary file, refusing anything over the upload limit."""
+    suffix = os.path.splitext(image.get('s3_key') or image['image_url'])[1]
+    size = 0
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        try:
+            for chunk in _iter_image_chunks(image):
+                size += len(chunk)
+                if size > Config.MAX_CONTENT_LENGTH:
+                    raise ValueError('Stored image exceeds the maximum upload size')
+                f.write(chunk)
+        except Exception:
+            os.remove(f.name)
+            raise
+    return f.name
+
 def verify_mosquito_image(image_id):
     """Verify a mosquito image from storage."""
     image = storage.get_image(image_id)
@@ -176,12 +324,13 @@ def verify_mosquito_image(image_id):
         return
     
     try:
-        # Download image from S3
-        response = requests.get(image['image_url'])
-        img = Image.open(BytesIO(response.content))
-        
-        # Verify the image
-        result = verify_image(img)
+        # Stream the image from S3 into a temporary file
+        image_path = _fetch_to_tempfile(image)
+        try:
+            # Verify the image
+            result = verify_image(image_path)
+        finally:
+            os.remove(image_path)
         
         if result['success']:
             storage.update_image(
@@ -202,9 +351,23 @@ def verify_mosquito_image(image_id):
             )
             
     except Exception as e:
-        print(f"Error in verify_mosquito_image: {str(e)}")
+        logger.error("Error in verify_mosquito_image: %s", e)
         storage.update_image(
             image_id,
             verification_status='rejected',
             feedback=f'Error processing image: {str(e)}'
-        ) 
\ No newline at end of file
+        )
+
+_verification_executor = None
+_verification_executor_lock = threading.Lock()
+
+def queue_verification(image_id):
+    """Run verify_mosquito_image in the background verification pool."""
+    global _verification_executor
+    with _verification_executor_lock:
+        if _verification_executor is None:
+            _verification_executor = ThreadPoolExecutor(
+                max_workers=Config.VERIFICATION_WORKERS,
+                thread_name_prefix='verification'
+            )
+    return _verification_executor.submit(verify_mosquito_image, image_id)
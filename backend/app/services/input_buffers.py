@@ -0,0 +1,80 @@
+from contextlib import contextmanager
+import threading
+import numpy as np
+
+# In-place scalings matching the models' preprocessing
+SCALINGS = {
+    'mobilenet': (1 / 127.5, -1.0),  # mobilenet_v2.preprocess_input: [-1, 1]
+    'unit': (1 / 255.0, 0.0),  # [0, 1]
+}
+
+
+class InputBatch:
+    """One preallocated (slots, height, width, 3) float32 model input.
+
+    Images are resized straight into the next free slot and scaled in place;
+    view() is the filled, contiguous prefix handed to the model as-is.
+    """
+
+    def __init__(self, slots, size, scaling):
+        self.width, self.height = size
+        self.array = np.empty((slots, self.height, self.width, 3), dtype=np.float32)
+        self.scale, self.offset = SCALINGS[scaling]
+        self.size = 0
+
+    def add(self, image, box=None):
+        """Write a PIL image (or its box region) into the next slot; returns the slot index."""
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        if box is not None or image.size != (self.width, self.height):
+            # Resizing from the box avoids copying the crop first
+            image = image.resize((self.width, self.height), box=box)
+        return self.add_pixels(np.asarray(image))
+
+    def add_pixels(self, pixels):
+        """Write an already resized (height, width, 3) uint8 array into the next slot."""
+        if self.size == len(self.array):
+            raise ValueError(f"Input batch is full ({len(self.array)} slots)")
+        slot = self.array[self.size]
+        # uint8 pixels are cast into the float32 slot, then scaled in place
+        np.copyto(slot, pixels, casting='unsafe')
+        slot *= self.scale
+        if self.offset:
+            slot += self.offset
+        self.size += 1
+        return self.size - 1
+
+    def view(self):
+        return self.array[:self.size]
+
+
+class InputBufferPool:
+    """Free list of InputBatch buffers reused across requests.
+
+    A buffer is allocated only when every existing one is in use, so the pool
+    grows to the peak number of concurrent inferences and then stops
+    allocating.
+    """
+
+    def __init__(self, slots, size=(224, 224), scaling='mobilenet'):
+        self.slots = slots
+        self.size = size
+        self.scaling = scaling
+        self.allocated = 0
+        self._free = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def batch(self):
+        with self._lock:
+            buffer = self._free.pop() if self._free else None
+            if buffer is None:
+                self.allocated += 1
+        if buffer is None:
+            buffer = InputBatch(self.slots, self.size, self.scaling)
+        buffer.size = 0
+        try:
+            yield buffer
+        finally:
+            with self._lock:
+                self._free.append(buffer)
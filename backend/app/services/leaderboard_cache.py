@@ -0,0 +1,71 @@
+import threading
+import hashlib
+import logging
+from flask import Response, request
+from .json_provider import dumps_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderboardCache:
+    """Caches leaderboard snapshots keyed by a storage mutation version.
+
+    A snapshot is rebuilt at most once per version: concurrent misses for the
+    same key wait for the thread already computing it instead of sorting the
+    user set again. Snapshots hold the payload plus its pre-serialized JSON
+    body and ETag so polling clients can be answered with 304 Not Modified.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots = {}  # key -> snapshot dict
+        self._inflight = {}  # key -> threading.Event for the running computation
+
+    def get(self, key, version, build, serialize=True):
+        """Return the snapshot for key at version, calling build() on a miss."""
+        while True:
+            with self._lock:
+                snapshot = self._snapshots.get(key)
+                if snapshot is not None and snapshot['version'] == version:
+                    return snapshot
+                event = self._inflight.get(key)
+                leader = event is None
+                if leader:
+                    event = threading.Event()
+                    self._inflight[key] = event
+
+            if not leader:
+                # Another thread is computing this key; reuse its result
+                event.wait()
+                continue
+
+            try:
+                data = build()
+                snapshot = {'version': version, 'data': data, 'body': None, 'etag': None}
+                if serialize:
+                    snapshot['body'] = dumps_bytes(data)
+                    snapshot['etag'] = hashlib.md5(snapshot['body']).hexdigest()
+                with self._lock:
+                    self._snapshots[key] = snapshot
+                logger.debug("Rebuilt leaderboard snapshot %s at version %s", key, version)
+                return snapshot
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                event.set()
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+
+def snapshot_response(snapshot):
+    """Build a JSON response from a snapshot, answering 304 when the ETag matches."""
+    response = Response(snapshot['body'], mimetype='application/json')
+    response.set_etag(snapshot['etag'])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+# Create a singleton instance
+leaderboard_cache = LeaderboardCache()
@@ -0,0 +1,201 @@
+from datetime import datetime
+import json
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+from config import Config
+from .blob_store import hash_file
+import logging
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+CURRENT = 'CURRENT'  # Names the version the app loads when MODEL_ARTIFACTS_VERSION is unset
+CLASS_INDEX = 'imagenet_class_index.json'
+CLASS_INDEX_URL = 'https://storage.googleapis.com/download.tensorflow.org/data/imagenet_class_index.json'
+
+
+class ArtifactError(Exception):
+    """The model artifact bundle is missing, incomplete or corrupted."""
+
+
+def _write_model(model, directory, name):
+    """Write a model as architecture JSON plus one flat weights file.
+
+    Loading is then a model_from_json and a single read whose slices go
+    straight to set_weights, instead of h5py walking every layer group.
+    """
+    architecture, weights_file = f"{name}.json", f"{name}.weights.bin"
+    with open(os.path.join(directory, architecture), 'w') as f:
+        f.write(model.to_json())
+    tensors, offset = [], 0
+    with open(os.path.join(directory, weights_file), 'wb') as f:
+        for weight in model.get_weights():
+            weight = np.ascontiguousarray(weight)
+            f.write(weight.tobytes())
+            tensors.append({'dtype': weight.dtype.str, 'shape': list(weight.shape), 'offset': offset})
+            offset += weight.nbytes
+    return {'architecture': architecture, 'weights': weights_file, 'tensors': tensors}
+
+
+def build_bundle(output_dir, version=None, mobilenet_weights=None, class_index=None, mosquito_model=None):
+    """Bundle every model the app loads into output_dir/<version> and make it CURRENT.
+
+    MobileNetV2 weights and the ImageNet class index come from the given local
+    files, or are downloaded when omitted. The mosquito model is included when
+    its .h5 file exists. Returns the new version directory.
+    """
+    import tensorflow as tf
+
+    version = version or datetime.utcnow().strftime('%Y%m%d%H%M%S')
+    target = os.path.join(output_dir, version)
+    if os.path.exists(target):
+        raise ArtifactError(f"Artifact version {version} already exists at {target}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    staging = tempfile.mkdtemp(prefix=f".{version}-", dir=output_dir)
+    try:
+        models = {}
+        mobilenet = tf.keras.applications.MobileNetV2(weights=mobilenet_weights or 'imagenet', include_top=True)
+        models['mobilenet_v2'] = _write_model(mobilenet, staging, 'mobilenet_v2')
+
+        if mosquito_model and os.path.exists(mosquito_model):
+            models['mosquito'] = _write_model(tf.keras.models.load_model(mosquito_model), staging, 'mosquito')
+        else:
+            logger.warning("No mosquito model at %s; the bundle will use simple verification", mosquito_model)
+
+        class_index = class_index or tf.keras.utils.get_file(CLASS_INDEX, CLASS_INDEX_URL, cache_subdir='models')
+        shutil.copyfile(class_index, os.path.join(staging, CLASS_INDEX))
+
+        files = sorted(name for name in os.listdir(staging))
+        manifest = {
+            'version': version,
+            'created_at': datetime.utcnow().isoformat(),
+            'tensorflow': tf.__version__,
+            'models': models,
+            'class_index': CLASS_INDEX,
+            'files': {name: hash_file(os.path.join(staging, name)) for name in files}
+        }
+        with open(os.path.join(staging, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Switch CURRENT atomically so running workers never see a half-written name
+    pointer = os.path.join(output_dir, f".{CURRENT}.tmp")
+    with open(pointer, 'w') as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(output_dir, CURRENT))
+    logger.info("Prepared model artifacts %s in %s", version, target)
+    return target
+
+
+class ModelArtifacts:
+    """A verified artifact bundle; every model and lookup table comes from here.
+
+    Opening the bundle checks every file against the manifest's SHA-256 and
+    raises ArtifactError on any mismatch, so a corrupted or partial copy stops
+    the process at startup instead of serving wrong verdicts.
+
+    Weights are memory-mapped read-only rather than read into private
+    buffers. Opened in the gunicorn master (see gunicorn.conf.py), every
+    worker inherits the verified bundle and reads the same page-cache pages.
+    This needs only numpy, so it is fork-safe. TensorFlow still copies the
+    values into each worker's own variables.
+    """
+
+    def __init__(self, root, version=None):
+        if not version:
+            try:
+                with open(os.path.join(root, CURRENT)) as f:
+                    version = f.read().strip()
+            except FileNotFoundError:
+                raise ArtifactError(
+                    f"No model artifacts in {root}; run 'python manage.py prepare-artifacts' first"
+                ) from None
+        self.path = os.path.join(root, version)
+        try:
+            with open(os.path.join(self.path, MANIFEST)) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ArtifactError(f"Unreadable manifest for model artifacts {version}: {e}") from None
+        self.version = version
+        self._class_index = None
+        self._weights = {}
+        self._weights_lock = threading.Lock()
+        self._verify()
+
+    def _verify(self):
+        for name, expected in self.manifest['files'].items():
+            path = os.path.join(self.path, name)
+            if not os.path.exists(path):
+                raise ArtifactError(f"Model artifact {name} is missing from {self.path}")
+            if hash_file(path) != expected:
+                raise ArtifactError(f"Checksum mismatch for model artifact {name} in {self.path}")
+
+    def has_model(self, name):
+        return name in self.manifest['models']
+
+    def weights(self, name):
+        """Read-only arrays over the memory-mapped weights file of a bundled model."""
+        with self._weights_lock:
+            if name not in self._weights:
+                entry = self.manifest['models'][name]
+                data = np.memmap(os.path.join(self.path, entry['weights']), dtype=np.uint8, mode='r')
+                self._weights[name] = [
+                    np.frombuffer(data, np.dtype(tensor['dtype']), int(np.prod(tensor['shape'])),
+                                  tensor['offset']).reshape(tensor['shape'])
+                    for tensor in entry['tensors']
+                ]
+            return self._weights[name]
+
+    def map_weights(self):
+        """Map every bundled model's weights now (in the master, before workers fork)."""
+        for name in self.manifest['models']:
+            self.weights(name)
+
+    def load_model(self, name):
+        """Build a bundled model from its architecture and flat weights; None if not bundled."""
+        import tensorflow as tf
+
+        entry = self.manifest['models'].get(name)
+        if entry is None:
+            return None
+        with open(os.path.join(self.path, entry['architecture'])) as f:
+            model = tf.keras.models.model_from_json(f.read())
+        model.set_weights(self.weights(name))
+        return model
+
+    @property
+    def class_index(self):
+        if self._class_index is None:
+            with open(os.path.join(self.path, self.manifest['class_index'])) as f:
+                self._class_index = {int(k): tuple(v) for k, v in json.load(f).items()}
+        return self._class_index
+
+    def decode_predictions(self, predictions, top=5):
+        """Same output as mobilenet_v2.decode_predictions, from the bundled class index."""
+        results = []
+        for scores in predictions:
+            best = np.argsort(scores)[-top:][::-1]
+            results.append([(*self.class_index[i], scores[i]) for i in best])
+        return results
+
+
+_artifacts = None
+_artifacts_lock = threading.Lock()
+
+
+def get_artifacts():
+    """The process-wide verified bundle (Config.MODEL_ARTIFACTS_DIR, pinned or CURRENT version)."""
+    global _artifacts
+    with _artifacts_lock:
+        if _artifacts is None:
+            _artifacts = ModelArtifacts(Config.MODEL_ARTIFACTS_DIR, Config.MODEL_ARTIFACTS_VERSION)
+            logger.info("Using model artifacts %s", _artifacts.version)
+        return _artifacts
+
@@ -0,0 +1,74 @@
+import os
+import threading
+from config import Config
+from .model_artifacts import get_artifacts
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def thread_budget(workers=None, cores=None):
+    """TensorFlow (intra_op, inter_op) thread counts for one worker process.
+
+    By default the box's cores are split across WEB_WORKERS so the workers'
+    op pools don't oversubscribe the CPU; 0 leaves a pool at TensorFlow's
+    default (every core).
+    """
+    workers = max(1, workers or Config.WEB_WORKERS)
+    cores = cores or os.cpu_count() or 1
+    intra = Config.TF_INTRA_OP_THREADS
+    if intra < 0:
+        intra = max(1, cores // workers)
+    inter = Config.TF_INTER_OP_THREADS
+    if inter < 0:
+        inter = 2 if intra >= 4 else 1
+    return intra, inter
+
+
+class ModelRegistry:
+    """Loads each bundled model at most once per process and shares the handle.
+
+    The first load also applies the TensorFlow thread budget, which has to
+    happen before TensorFlow runs its first op.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+        self._threads_configured = False
+
+    def _configure_threads(self):
+        import tensorflow as tf
+
+        intra, inter = thread_budget()
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(intra)
+            tf.config.threading.set_inter_op_parallelism_threads(inter)
+            logger.info("TensorFlow threads: intra_op=%s inter_op=%s", intra, inter)
+        except RuntimeError as e:
+            # TensorFlow was already initialized by something else; keep its pools
+            logger.warning("Could not set TensorFlow threads: %s", e)
+        self._threads_configured = True
+
+    def get(self, name):
+        """The shared model for name, or None if the artifact bundle doesn't have it."""
+        with self._lock:
+            if name not in self._models:
+                if not self._threads_configured:
+                    self._configure_threads()
+                self._models[name] = get_artifacts().load_model(name)
+                logger.info("Loaded model %s", name)
+            return self._models[name]
+
+    def warm_up(self):
+        """Load every model in the bundle now rather than on the first request."""
+        for name in get_artifacts().manifest['models']:
+            self.get(name)
+
+    def loaded(self):
+        with self._lock:
+            return [name for name, model in self._models.items() if model is not None]
+
+
+# Create a singleton instance
+model_registry = ModelRegistry()
@@ -0,0 +1,225 @@
+from contextlib import contextmanager
+from functools import wraps
+import math
+import sqlite3
+import threading
+import time
+import logging
+from flask import jsonify, make_response, request
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+class MemoryQuotaStore:
+    """Per-process counters: key -> {window: count}, keeping two windows per key."""
+
+    def __init__(self, purge_every=10000):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._ops = 0
+        self._purge_every = purge_every
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            yield self
+
+    def get(self, key, window):
+        return self._counts.get(key, {}).get(window, 0)
+
+    def incr(self, key, window, amount=1):
+        windows = self._counts.setdefault(key, {})
+        windows[window] = windows.get(window, 0) + amount
+        for old in [w for w in windows if w < window - 1]:
+            del windows[old]
+        self._ops += 1
+        if self._ops % self._purge_every == 0:
+            # Drop keys that have been idle for more than a full window
+            for stale in [k for k, w in self._counts.items() if max(w) < window - 1]:
+                del self._counts[stale]
+
+
+class SQLiteQuotaStore:
+    """Counters in a SQLite file so every worker on the box shares one quota."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quota_counts ("
+                "key TEXT NOT NULL, window INTEGER NOT NULL, count INTEGER NOT NULL, "
+                "PRIMARY KEY (key, window)) WITHOUT ROWID"
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield self
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get(self, key, window):
+        row = self._connection().execute(
+            "SELECT count FROM quota_counts WHERE key = ? AND window = ?", (key, window)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def incr(self, key, window, amount=1):
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO quota_counts (key, window, count) VALUES (?, ?, ?) "
+            "ON CONFLICT(key, window) DO UPDATE SET count = count + excluded.count",
+            (key, window, amount)
+        )
+        conn.execute("DELETE FROM quota_counts WHERE key = ? AND window < ?", (key, window - 1))
+
+
+class SlidingWindowLimiter:
+    """O(1) sliding-window limiter.
+
+    The count over the last window_seconds is estimated from the current and
+    previous fixed windows, weighting the previous one by how much of it still
+    overlaps the sliding window.
+    """
+
+    def __init__(self, window_seconds, store):
+        self.window_seconds = window_seconds
+        self.store = store
+
+    def acquire(self, limits, now=None, cost=1):
+        """Admit cost requests against every (key, limit) pair, or none of them.
+
+        Returns (allowed, retry_after_seconds).
+        """
+        now = time.time() if now is None else now
+        window = int(now // self.window_seconds)
+        elapsed = now - window * self.window_seconds
+        weight = 1 - elapsed / self.window_seconds
+
+        with self.store.transaction() as tx:
+            retry_after = 0
+            for key, limit in limits:
+                previous = tx.get(key, window - 1)
+                current = tx.get(key, window)
+                if previous * weight + current + cost > limit:
+                    retry_after = max(retry_after, self._retry_after(previous, current, limit - cost + 1, elapsed))
+            if retry_after:
+                return False, retry_after
+            for key, _ in limits:
+                tx.incr(key, window, cost)
+            return True, 0
+
+    def release(self, limits, now=None, cost=1):
+        """Give back cost requests admitted earlier in this window (never below zero)."""
+        now = time.time() if now is None else now
+        window = int(now // self.window_seconds)
+        with self.store.transaction() as tx:
+            for key, _ in limits:
+                amount = min(cost, tx.get(key, window))
+                if amount:
+                    tx.incr(key, window, -amount)
+
+    def _retry_after(self, previous, current, limit, elapsed):
+        size = self.window_seconds
+        if current + 1 > limit:
+            # Wait for this window to end, then for its count to decay enough
+            wait = (size - elapsed) + size * (max(0.0, 1 - (limit - 1) / current) if current else 1.0)
+        else:
+            wait = size * (1 - (limit - 1 - current) / previous) - elapsed
+        return max(1, math.ceil(wait))
+
+
+def _create_store():
+    if Config.QUOTA_STORE_PATH:
+        return SQLiteQuotaStore(Config.QUOTA_STORE_PATH)
+    return MemoryQuotaStore()
+
+
+# Create a singleton instance
+submission_limiter = SlidingWindowLimiter(DAY_SECONDS, _create_store())
+
+
+def _request_username():
+    """The account a submission is credited to: the JWT identity, else the form's username.
+
+    Unauthenticated submissions credit the submitted username, so they are
+    counted against it too. Headers are never trusted.
+    """
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+        if identity:
+            return str(identity)
+    except Exception:
+        pass
+    return request.form.get('username') or None
+
+
+def _quota_limits():
+    limits = [(f"ip:{request.remote_addr}", Config.MAX_SUBMISSIONS_PER_DAY_PER_IP)]
+    username = _request_username()
+    if username:
+        limits.append((f"user:{username}", Config.MAX_SUBMISSIONS_PER_DAY))
+    return limits, username
+
+
+def charge_submission_quota(cost):
+    """Charge cost submissions against the caller's quota; returns a 429 response or None."""
+    limits, username = _quota_limits()
+    allowed, retry_after = submission_limiter.acquire(limits, cost=cost)
+    if allowed:
+        return None
+    logger.warning("Submission quota exceeded for %s", username or request.remote_addr)
+    response = jsonify({
+        'success': False,
+        'error': 'Daily submission limit reached',
+        'message': 'You have reached your daily submission limit. Please try again later.',
+        'code': 'RATE_LIMITED'
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def refund_submission_quota(cost):
+    """Return cost submissions to the caller's quota, e.g. for files a batch rejected."""
+    if cost > 0:
+        limits, _ = _quota_limits()
+        submission_limiter.release(limits, cost=cost)
+
+
+def enforce_submission_quota(view):
+    """Reject submissions over the per-user/per-IP daily quota with 429.
+
+    Only accepted submissions count: the charge is given back when the view
+    answers with an error (invalid file, failed verification, ...), the same
+    way a batch refunds the files it rejected.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        rejected = charge_submission_quota(1)
+        if rejected is not None:
+            return rejected
+        response = make_response(view(*args, **kwargs))
+        if response.status_code >= 400:
+            refund_submission_quota(1)
+        return response
+    return wrapper
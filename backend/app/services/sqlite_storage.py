@@ -0,0 +1,256 @@
+from datetime import datetime
+import threading
+import sqlite3
+import os
+import logging
+from config import Config
+from .storage import StorageService
+from .windowed_leaderboard import WINDOWS, active_buckets
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        balance INTEGER NOT NULL DEFAULT 0,
+        kills INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS submissions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        image_path TEXT NOT NULL,
+        coins INTEGER NOT NULL,
+        date TEXT NOT NULL
+    )""",
+    # Covering index for a user's submission history
+    "CREATE INDEX IF NOT EXISTS idx_submissions_username_id "
+    "ON submissions (username, id, image_path, coins, date)",
+    # Covering index for the leaderboard and rank lookups
+    "CREATE INDEX IF NOT EXISTS idx_users_balance_kills "
+    "ON users (balance DESC, kills DESC, username)",
+    # One shared mutation counter, bumped inside every ranking-changing write
+    """CREATE TABLE IF NOT EXISTS storage_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )""",
+    "INSERT OR IGNORE INTO storage_version (id, version) VALUES (1, 0)",
+    # Coins per user per time bucket for the daily/weekly/monthly leaderboards;
+    # the primary key serves the range scan over a window's live buckets
+    """CREATE TABLE IF NOT EXISTS window_awards (
+        window_name TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        username TEXT NOT NULL,
+        coins INTEGER NOT NULL,
+        PRIMARY KEY (window_name, bucket, username)
+    ) WITHOUT ROWID""",
+]
+
+# Statements are kept as constants so sqlite3's per-connection statement
+# cache reuses the prepared statement on every call.
+INSERT_SUBMISSION = "INSERT INTO submissions (username, image_path, coins, date) VALUES (?, ?, ?, ?)"
+UPSERT_USER = (
+    "INSERT INTO users (username, balance, kills) VALUES (?, ?, ?) "
+    "ON CONFLICT(username) DO UPDATE SET balance = balance + excluded.balance, kills = kills + excluded.kills"
+)
+SELECT_USER = "SELECT balance, kills FROM users WHERE username = ?"
+SELECT_USER_SUBMISSIONS = (
+    "SELECT id, username, image_path, coins, date FROM submissions WHERE username = ? ORDER BY id"
+)
+# Users ahead in SELECT_LEADERBOARD's order, so tied users get sequential ranks
+SELECT_RANK = (
+    "SELECT COUNT(*) + 1 FROM users WHERE balance > ? OR (balance = ? AND kills > ?) "
+    "OR (balance = ? AND kills = ? AND username < ?)"
+)
+SELECT_SUBMISSIONS_AFTER = (
+    "SELECT id, username, image_path, coins, date FROM submissions WHERE id > ? ORDER BY id"
+)
+UPDATE_SUBMISSION_COINS = "UPDATE submissions SET coins = ? WHERE id = ?"
+ADJUST_USER = "UPDATE users SET balance = balance + ?, kills = kills + ? WHERE username = ?"
+UPDATE_IMAGE_PATH = "UPDATE submissions SET image_path = ? WHERE image_path = ?"
+BUMP_VERSION = "UPDATE storage_version SET version = version + 1 WHERE id = 1"
+SELECT_VERSION = "SELECT version FROM storage_version WHERE id = 1"
+UPSERT_WINDOW_AWARD = (
+    "INSERT INTO window_awards (window_name, bucket, username, coins) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(window_name, bucket, username) DO UPDATE SET coins = coins + excluded.coins"
+)
+PRUNE_WINDOW_AWARDS = "DELETE FROM window_awards WHERE window_name = ? AND bucket < ?"
+SELECT_WINDOW_LEADERBOARD = (
+    "SELECT username, SUM(coins) AS total FROM window_awards WHERE window_name = ? AND bucket >= ? "
+    "GROUP BY username ORDER BY total DESC, username LIMIT ?"
+)
+SELECT_WINDOW_TOTAL = (
+    "SELECT SUM(coins) FROM window_awards WHERE window_name = ? AND bucket >= ? AND username = ?"
+)
+SELECT_WINDOW_RANK = (
+    "SELECT COUNT(*) + 1 FROM (SELECT SUM(coins) AS total FROM window_awards "
+    "WHERE window_name = ? AND bucket >= ? GROUP BY username HAVING total > ?)"
+)
+SELECT_LEADERBOARD = (
+    "SELECT username, balance, kills FROM users ORDER BY balance DESC, kills DESC, username LIMIT ?"
+)
+
+
+class SQLiteStorageService(StorageService):
+    """StorageService backed by a SQLite database in WAL mode.
+
+    Each thread gets its own connection; writers are serialized by SQLite
+    itself, so no Python-level lock is held around queries.
+    """
+
+    def __init__(self, db_path=None):
+        super().__init__()
+        self.db_path = db_path or Config.SQLITE_PATH
+        self._local = threading.local()
+        conn = self._get_connection()
+        with conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+        logger.info("SQLite storage ready: %s", self.db_path)
+
+    @property
+    def version(self):
+        """The shared storage_version row.
+
+        It is bumped in the same transaction as each write, so every thread
+        and worker process reads one comparable counter, and a cached
+        snapshot can't outlive another worker's commit.
+        """
+        return self._get_connection().execute(SELECT_VERSION).fetchone()[0]
+
+    def _get_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, cached_statements=64)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    def add_submission(self, username, image_path, coins):
+        return self.add_submissions([(username, image_path, coins)])[0]
+
+    def add_submissions(self, entries):
+        """Insert several (username, image_path, coins) entries in one transaction."""
+        conn = self._get_connection()
+        date = datetime.now().isoformat()
+        submissions = []
+        previous_ranks = {username: self._standing(conn, username)[1] for username, _, _ in entries}
+        with conn:
+            for username, image_path, coins in entries:
+                cursor = conn.execute(INSERT_SUBMISSION, (username, image_path, coins, date))
+                submissions.append({
+                    'id': cursor.lastrowid,
+                    'username': username,
+                    'image_path': image_path,
+                    'coins': coins,
+                    'date': date
+                })
+            totals = {}
+            for submission in submissions:
+                balance, kills = totals.get(submission['username'], (0, 0))
+                totals[submission['username']] = (balance + submission['coins'], kills + 1)
+            conn.executemany(
+                UPSERT_USER,
+                [(username, balance, kills) for username, (balance, kills) in totals.items()]
+            )
+            self._record_window_awards(conn, totals)
+            conn.execute(BUMP_VERSION)
+        self._publish_awards([
+            (username, awarded) + self._standing(conn, username) + (previous_ranks[username],)
+            for username, (awarded, _) in totals.items()
+        ])
+        return submissions
+
+    def _standing(self, conn, username):
+        """(balance, 1-based rank) of a user, or (None, None) if they have no row yet."""
+        row = conn.execute(SELECT_USER, (username,)).fetchone()
+        if row is None:
+            return None, None
+        balance, kills = row
+        return balance, self._rank(conn, username, balance, kills)
+
+    def _rank(self, conn, username, balance, kills):
+        return conn.execute(SELECT_RANK, (balance, balance, kills, balance, kills, username)).fetchone()[0]
+
+    def _record_window_awards(self, conn, totals):
+        """Add coins to the current bucket of every window, dropping expired buckets."""
+        awards = []
+        for window in WINDOWS:
+            newest, oldest = active_buckets(window)
+            conn.execute(PRUNE_WINDOW_AWARDS, (window, oldest))
+            awards.extend(
+                (window, newest, username, balance) for username, (balance, _) in totals.items() if balance
+            )
+        conn.executemany(UPSERT_WINDOW_AWARD, awards)
+
+    def get_window_leaderboard(self, window, limit=10):
+        _, oldest = active_buckets(window)
+        rows = self._get_connection().execute(SELECT_WINDOW_LEADERBOARD, (window, oldest, limit)).fetchall()
+        return [{
+            'id': idx + 1,
+            'username': row['username'],
+            'coins': row['total']
+        } for idx, row in enumerate(rows)]
+
+    def get_window_rank(self, window, username):
+        _, oldest = active_buckets(window)
+        conn = self._get_connection()
+        total = conn.execute(SELECT_WINDOW_TOTAL, (window, oldest, username)).fetchone()[0]
+        if not total:
+            return 0
+        return conn.execute(SELECT_WINDOW_RANK, (window, oldest, total)).fetchone()[0]
+
+    def iter_submissions(self, after_id=None):
+        cursor = self._get_connection().execute(SELECT_SUBMISSIONS_AFTER, (after_id or 0,))
+        return (dict(row) for row in cursor)
+
+    def apply_reverification(self, changes):
+        if not changes:
+            return
+        conn = self._get_connection()
+        with conn:
+            conn.executemany(UPDATE_SUBMISSION_COINS, [(change['coins'], change['image_id']) for change in changes])
+            conn.executemany(ADJUST_USER, [
+                (change['delta'], 1 if change['status'] == 'verified' else -1, change['user_id'])
+                for change in changes
+            ])
+            conn.execute(BUMP_VERSION)
+
+    def rewrite_image_paths(self, moved):
+        conn = self._get_connection()
+        with conn:
+            conn.executemany(UPDATE_IMAGE_PATH, [(new, old) for old, new in moved.items()])
+
+    def get_user_profile(self, username):
+        """A user's standing; unknown users get an empty profile (reads never write)."""
+        conn = self._get_connection()
+        row = conn.execute(SELECT_USER, (username,)).fetchone()
+        balance, kills = row if row else (0, 0)
+        rank = self._rank(conn, username, balance, kills)
+        submissions = [dict(row) for row in conn.execute(SELECT_USER_SUBMISSIONS, (username,))]
+        return {
+            'username': username,
+            'balance': balance,
+            'submissions': submissions,
+            'totalKills': kills,
+            'rank': rank
+        }
+
+    def get_leaderboard(self, limit=10):
+        conn = self._get_connection()
+        rows = conn.execute(SELECT_LEADERBOARD, (limit,)).fetchall()
+        return [{
+            'id': idx + 1,
+            'username': row['username'],
+            'coins': row['balance'],
+            'kills': row['kills']
+        } for idx, row in enumerate(rows)]
+
+    def close(self):
+        """Close the calling thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -3,9 +3,11 @@ import threading
 import os
 import logging
 from werkzeug.utils import secure_filename
+from config import Config
+from .windowed_leaderboard import WindowedLeaderboards
+from .blob_store import BlobStore
+from .events import event_bus
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 class StorageService:
@@ -14,6 +16,8 @@ class StorageService:
         self.users = {}  # Store user data
         self.submissions = []  # Store all submissions
         self.next_submission_id = 1
+        self._version = 0  # Bumped on every mutation that can change rankings
+        self.windows = WindowedLeaderboards()  # Daily/weekly/monthly coin totals
         self.upload_folder = os.getenv('UPLOAD_FOLDER', 'uploads')
         self.allowed_extensions = {'png', 'jpg', 'jpeg'}
         self.max_file_size = 5 * 1024 * 1024  # 5MB
@@ -21,39 +25,80 @@ class StorageService:
         # Create upload folder if it doesn't exist
         if not os.path.exists(self.upload_folder):
             os.makedirs(self.upload_folder)
-            logger.info(f"Created upload folder: {self.upload_folder}")
+            logger.info("Created upload folder: %s", self.upload_folder)
+        # Images are stored by content hash, so identical uploads share one file
+        self.blob_store = BlobStore(self.upload_folder)
+
+    @property
+    def version(self):
+        """Mutation counter used to key cached leaderboard snapshots."""
+        return self._version
 
     def add_submission(self, username, image_path, coins):
+        return self.add_submissions([(username, image_path, coins)])[0]
+
+    def add_submissions(self, entries):
+        """Record several (username, image_path, coins) entries under one lock acquisition."""
         with self._lock:
-            submission = {
-                'id': self.next_submission_id,
-                'username': username,
-                'image_path': image_path,
-                'coins': coins,
-                'date': datetime.now().isoformat()
+            date = datetime.now().isoformat()
+            submissions = []
+            previous_ranks = {
+                username: self.users[username]['rank'] if username in self.users else None
+                for username, _, _ in entries
             }
-            self.submissions.append(submission)
-            self.next_submission_id += 1
-
-            # Create or update user profile
-            if username not in self.users:
-                self.users[username] = {
+            for username, image_path, coins in entries:
+                submission = {
+                    'id': self.next_submission_id,
                     'username': username,
-                    'balance': 0,
-                    'submissions': [],
-                    'totalKills': 0,
-                    'rank': len(self.users) + 1
+                    'image_path': image_path,
+                    'coins': coins,
+                    'date': date
                 }
+                self.submissions.append(submission)
+                self.next_submission_id += 1
+
+                # Create or update user profile
+                if username not in self.users:
+                    self.users[username] = {
+                        'username': username,
+                        'balance': 0,
+                        'submissions': [],
+                        'totalKills': 0,
+                        'rank': len(self.users) + 1
+                    }
 
-            user = self.users[username]
-            user['balance'] += coins
-            user['totalKills'] += 1
-            user['submissions'].append(submission)
+                user = self.users[username]
+                user['balance'] += coins
+                user['totalKills'] += 1
+                user['submissions'].append(submission)
+                self.windows.record_award(username, coins)
+                submissions.append(submission)
 
             # Update ranks for all users
             self._update_ranks()
+            self._version += 1
+            awarded = {}
+            for submission in submissions:
+                awarded[submission['username']] = awarded.get(submission['username'], 0) + submission['coins']
+            awards = [
+                (username, coins, self.users[username]['balance'], self.users[username]['rank'],
+                 previous_ranks[username])
+                for username, coins in awarded.items()
+            ]
 
-            return submission
+        self._publish_awards(awards)
+        return submissions
+
+    def _publish_awards(self, awards):
+        """Tell each awarded user about their coins and rank move.
+
+        awards holds (username, awarded, balance, rank, previous_rank). Only the
+        awarded users get events; others see their new rank on the next fetch.
+        """
+        for username, awarded, balance, rank, previous_rank in awards:
+            event_bus.publish(username, 'coins', {'awarded': awarded, 'balance': balance})
+            if rank != previous_rank:
+                event_bus.publish(username, 'rank', {'rank': rank, 'previous_rank': previous_rank})
 
     def get_user_profile(self, username):
         with self._lock:
@@ -65,6 +110,7 @@ class StorageService:
                     'totalKills': 0,
                     'rank': len(self.users) + 1
                 }
+                self._version += 1
             return self.users[username]
 
     def get_leaderboard(self, limit=10):
@@ -86,6 +132,18 @@ class StorageService:
             
             return leaderboard
 
+    def get_window_leaderboard(self, window, limit=10):
+        """Top users by coins earned in the daily/weekly/monthly window."""
+        return [{
+            'id': idx + 1,
+            'username': username,
+            'coins': coins
+        } for idx, (username, coins) in enumerate(self.windows.top(window, limit))]
+
+    def get_window_rank(self, window, username):
+        """1-based rank in the window, or 0 if the user earned nothing in it."""
+        return self.windows.rank(window, username)
+
     def _update_ranks(self):
         # Sort users by balance and update their ranks
         sorted_users = sorted(
@@ -105,14 +163,14 @@ class StorageService:
     def save_image(self, file, filename):
         """Save the uploaded image file."""
         try:
-            logger.debug(f"Attempting to save file: {filename}")
+            logger.debug("Attempting to save file: %s", filename)
             
             if not file:
                 logger.error("No file provided")
                 raise ValueError("No file provided")
             
             if not self.allowed_file(filename):
-                logger.error(f"Invalid file type: {filename}")
+                logger.error("Invalid file type: %s", filename)
                 raise ValueError(f"Invalid file type. Allowed types are: {', '.join(self.allowed_extensions)}")
             
             # Check file size
@@ -121,27 +179,65 @@ class StorageService:
             file.seek(0)
             
             if size > self.max_file_size:
-                logger.error(f"File too large: {size} bytes")
+                logger.error("File too large: %s bytes", size)
                 raise ValueError(f"File too large. Maximum size is {self.max_file_size/1024/1024}MB")
             
-            # Secure the filename
-            secure_name = secure_filename(filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            final_filename = f"{timestamp}_{secure_name}"
-            
-            # Save the file
-            filepath = os.path.join(self.upload_folder, final_filename)
-            file.save(filepath)
-            logger.info(f"File saved successfully: {filepath}")
+            # Save the file under its content hash
+            extension = secure_filename(filename).rsplit('.', 1)[1]
+            filepath = self.blob_store.put(file, extension)
+            logger.info("File saved successfully: %s", filepath)
             
             return filepath
             
         except Exception as e:
-            logger.error(f"Error saving file: {str(e)}")
+            logger.error("Error saving file: %s", e)
             raise
 
+    def release_image(self, filepath):
+        """Drop a reference to a saved image; the file goes once nothing uses it."""
+        return self.blob_store.release(filepath)
+
+    def iter_submissions(self, after_id=None):
+        """Submissions with id above after_id, in id order (for re-verification)."""
+        with self._lock:
+            submissions = [dict(submission) for submission in self.submissions
+                           if after_id is None or submission['id'] > after_id]
+        return iter(submissions)
+
+    def apply_reverification(self, changes):
+        """Apply re-verification verdicts to submissions.
+
+        Each change is {image_id, user_id, status, coins, delta} with the
+        submission id and username; the submission's coins are replaced and
+        the delta (and a kill, either way) applied to the user.
+        """
+        if not changes:
+            return
+        with self._lock:
+            by_id = {submission['id']: submission for submission in self.submissions}
+            for change in changes:
+                by_id[change['image_id']]['coins'] = change['coins']
+                user = self.users[change['user_id']]
+                user['balance'] += change['delta']
+                user['totalKills'] += 1 if change['status'] == 'verified' else -1
+            self._update_ranks()
+            self._version += 1
+
+    def rewrite_image_paths(self, moved):
+        """Point submissions at new image paths after a storage layout migration."""
+        with self._lock:
+            for submission in self.submissions:
+                submission['image_path'] = moved.get(submission['image_path'], submission['image_path'])
+
+def create_storage_service():
+    """Create the storage backend selected by STORAGE_BACKEND ('memory' or 'sqlite')."""
+    if Config.STORAGE_BACKEND == 'sqlite':
+        from .sqlite_storage import SQLiteStorageService
+        return SQLiteStorageService()
+    return StorageService()
+
 # Create a singleton instance
-storage_service = StorageService()
+storage_service = create_storage_service()
 
 # Export the save_image function
 def save_image(file, filename):
@@ -0,0 +1,182 @@
+from tempfile import SpooledTemporaryFile
+import struct
+import logging
+from flask import Request, current_app, jsonify
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SIGNATURES = {
+    b'\xff\xd8\xff': 'jpeg',
+    b'\x89PNG\r\n\x1a\n': 'png',
+    b'GIF87a': 'gif',
+    b'GIF89a': 'gif',
+}
+SIGNATURE_BYTES = max(len(signature) for signature in SIGNATURES)
+
+# SOFn markers carry the frame size; C4 (DHT), C8 (JPG) and CC (DAC) don't
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+JPEG_STANDALONE_MARKERS = {0x01} | set(range(0xD0, 0xD9))
+
+
+class UploadRejected(BadRequest):
+    """Raised while the upload is still streaming in, aborting the request."""
+
+    def __init__(self, message, code='INVALID_IMAGE'):
+        super().__init__(message)
+        self.error_code = code
+
+
+def sniff_format(header):
+    for signature, image_format in SIGNATURES.items():
+        if header.startswith(signature):
+            return image_format
+    return None
+
+
+def _jpeg_dimensions(data):
+    """Walk JPEG segments up to the first SOF marker; None if more bytes are needed."""
+    offset = 2
+    while True:
+        if offset + 4 > len(data):
+            return None
+        if data[offset] != 0xFF:
+            raise UploadRejected('Corrupted JPEG header')
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1  # Fill byte
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            offset += 2
+            continue
+        length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+        if marker in JPEG_SOF_MARKERS:
+            if offset + 9 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+            return width, height
+        if marker == 0xDA:
+            raise UploadRejected('JPEG has no frame header')
+        offset += 2 + length
+
+
+def read_dimensions(image_format, data):
+    """Return (width, height) from the image header, or None if more bytes are needed."""
+    if image_format == 'png':
+        if len(data) < 24:
+            return None
+        if data[12:16] != b'IHDR':
+            raise UploadRejected('Corrupted PNG header')
+        return struct.unpack('>II', data[16:24])
+    if image_format == 'gif':
+        if len(data) < 10:
+            return None
+        return struct.unpack('<HH', data[6:10])
+    return _jpeg_dimensions(data)
+
+
+class ValidatingUploadStream:
+    """Spool for one uploaded file that validates bytes as they arrive.
+
+    The signature is checked on the first chunk, dimensions as soon as the
+    header is complete, and the byte count on every write, so a bad upload is
+    rejected after reading only its first few kilobytes. finish() rejects a
+    file that ended before its signature or dimensions could be read.
+    """
+
+    def __init__(self, max_bytes, max_pixels, max_header_bytes):
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.max_header_bytes = max_header_bytes
+        self.size = 0
+        self.image_format = None
+        self.dimensions = None
+        self._header = b''
+        self._file = SpooledTemporaryFile(max_size=500 * 1024, mode='rb+')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise RequestEntityTooLarge(f"File too large. Maximum size is {self.max_bytes / 1024 / 1024}MB")
+        if self.dimensions is None:
+            self._inspect(data)
+        return self._file.write(data)
+
+    def _inspect(self, data):
+        self._header += data
+        if self.image_format is None:
+            if len(self._header) < SIGNATURE_BYTES:
+                return
+            self.image_format = sniff_format(self._header)
+            if self.image_format is None:
+                raise UploadRejected('File is not a JPEG, PNG or GIF image', 'INVALID_TYPE')
+
+        self.dimensions = read_dimensions(self.image_format, self._header)
+        if self.dimensions is None:
+            if len(self._header) > self.max_header_bytes:
+                raise UploadRejected('Could not read image dimensions')
+            return
+
+        width, height = self.dimensions
+        if not width or not height or width * height > self.max_pixels:
+            raise UploadRejected(f"Image dimensions {width}x{height} are not allowed", 'IMAGE_TOO_LARGE')
+        self._header = b''
+
+    def finish(self):
+        """Called at the end of the part; a short file never got its header checked."""
+        if self.image_format is None:
+            raise UploadRejected('File is not a JPEG, PNG or GIF image', 'INVALID_TYPE')
+        if self.dimensions is None:
+            raise UploadRejected('Could not read image dimensions')
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+def request_size_limit(max_bytes):
+    """Give a view its own whole-request size limit instead of MAX_CONTENT_LENGTH.
+
+    Each file part is still held to MAX_CONTENT_LENGTH by ValidatingUploadStream.
+    """
+    def decorator(view):
+        view.max_content_length = max_bytes
+        return view
+    return decorator
+
+
+class ValidatingRequest(Request):
+    """Request class whose multipart file parts are validated while streaming."""
+
+    def _load_form_data(self):
+        super()._load_form_data()
+        for _, file in self.files.items(multi=True):
+            # An empty part without a filename is an unselected file input; routes report it
+            if isinstance(file.stream, ValidatingUploadStream) and (file.filename or file.stream.size):
+                file.stream.finish()
+
+    @property
+    def max_content_length(self):
+        view = current_app.view_functions.get(self.endpoint) if current_app and self.endpoint else None
+        limit = getattr(view, 'max_content_length', None)
+        return limit if limit is not None else super().max_content_length
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return ValidatingUploadStream(
+            max_bytes=Config.MAX_CONTENT_LENGTH,
+            max_pixels=Config.MAX_IMAGE_PIXELS,
+            max_header_bytes=Config.MAX_IMAGE_HEADER_BYTES
+        )
+
+
+def upload_rejected_response(error):
+    logger.warning("Upload rejected: %s", error.description)
+    return jsonify({
+        'success': False,
+        'error': error.description,
+        'message': error.description,
+        'code': getattr(error, 'error_code', 'FILE_TOO_LARGE')
+    }), error.code
@@ -0,0 +1,281 @@
+from collections import deque
+import json
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+import uuid
+import logging
+import boto3
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import BotoCoreError, ClientError
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Return the process-wide S3 client with a connection pool sized for the uploader."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = boto3.client(
+                    's3',
+                    aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY,
+                    region_name=Config.AWS_REGION,
+                    endpoint_url=Config.S3_ENDPOINT_URL or None,
+                    config=BotoConfig(
+                        max_pool_connections=Config.UPLOAD_WORKERS * Config.MULTIPART_CONCURRENCY,
+                        retries={'max_attempts': 3, 'mode': 'standard'}
+                    )
+                )
+    return _client
+
+
+def object_url(bucket, key):
+    if Config.S3_ENDPOINT_URL:
+        return f"{Config.S3_ENDPOINT_URL.rstrip('/')}/{bucket}/{key}"
+    return f"https://{bucket}.s3.amazonaws.com/{key}"
+
+
+def _process_alive(pid):
+    if pid == os.getpid():
+        return False  # A claim under our own pid predates this process (pid reuse)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _is_permanent(error):
+    """Errors that retrying can't fix: a missing staged file or a 4xx other than throttling/timeout."""
+    if isinstance(error, FileNotFoundError):
+        return True
+    if isinstance(error, S3UploadFailedError):
+        error = error.__context__  # upload_file wraps the ClientError
+    if isinstance(error, ClientError):
+        status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+        return 400 <= status < 500 and status not in (408, 429)
+    return False
+
+
+class UploadQueueFull(Exception):
+    """Raised when the background queue can't take more uploads."""
+
+
+class BackgroundUploader:
+    """Uploads staged files to S3 from a pool of background threads.
+
+    enqueue_file/enqueue_fileobj copy the bytes into a local staging
+    directory (fsynced, with a sidecar describing the destination) and return
+    the final URL at once; worker threads push staged files (multipart above
+    MULTIPART_THRESHOLD_MB) and retry transient failures with exponential
+    backoff.
+
+    The staging directory may be shared by several worker processes. A file
+    is uploaded only by whoever claims it by renaming its sidecar to
+    <name>.inflight.<pid>. On start, unclaimed files and files claimed by a
+    process that has since died are re-queued. Files that fail permanently,
+    or run out of retries, are moved to the dead-letter directory.
+    """
+
+    def __init__(self, bucket=None, staging_dir=None, workers=None, queue_size=None, max_retries=None,
+                 dead_letter_dir=None):
+        self.bucket = bucket or Config.AWS_BUCKET_NAME
+        self.staging_dir = staging_dir or Config.UPLOAD_STAGING_DIR
+        if dead_letter_dir is None:
+            dead_letter_dir = (os.path.join(staging_dir, 'dead') if staging_dir
+                               else Config.UPLOAD_DEAD_LETTER_DIR)
+        self.dead_letter_dir = dead_letter_dir
+        self.workers = workers or Config.UPLOAD_WORKERS
+        self.max_retries = Config.UPLOAD_MAX_RETRIES if max_retries is None else max_retries
+        self.transfer_config = TransferConfig(
+            multipart_threshold=Config.MULTIPART_THRESHOLD_MB * 1024 * 1024,
+            multipart_chunksize=Config.MULTIPART_CHUNK_MB * 1024 * 1024,
+            max_concurrency=Config.MULTIPART_CONCURRENCY
+        )
+        self._queue = queue.Queue(maxsize=queue_size or Config.UPLOAD_QUEUE_SIZE)
+        self._latencies = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self.uploaded = 0
+        self.failed = 0
+        self._threads = []
+        os.makedirs(self.staging_dir, exist_ok=True)
+        os.makedirs(self.dead_letter_dir, exist_ok=True)
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"s3-uploader-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._recover()
+        return self
+
+    def _recover(self):
+        """Re-queue staged files that no live process is uploading."""
+        for name in sorted(os.listdir(self.staging_dir)):
+            path = os.path.join(self.staging_dir, name)
+            if name.endswith('.json'):
+                self._queue.put(path[:-len('.json')])
+            elif '.inflight.' in name:
+                staged, _, pid = path.rpartition('.inflight.')
+                if _process_alive(int(pid)):
+                    continue
+                try:
+                    # Release the dead owner's claim; whoever renames it first re-queues it
+                    os.rename(path, f"{staged}.json")
+                except FileNotFoundError:
+                    continue
+                self._queue.put(staged)
+
+    def _stage(self, key, write, extra_args):
+        staged = os.path.join(self.staging_dir, uuid.uuid4().hex)
+        with open(staged, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(f"{staged}.json", 'w') as f:
+            json.dump({'key': key, 'extra_args': extra_args or {}}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        dir_fd = os.open(self.staging_dir, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        try:
+            self._queue.put(staged, timeout=1)
+        except queue.Full:
+            self._discard(staged)
+            raise UploadQueueFull(f"Upload queue is full ({self._queue.maxsize} pending)")
+        return object_url(self.bucket, key)
+
+    def enqueue_file(self, filepath, key, extra_args=None):
+        """Stage a local file for upload; the caller may delete filepath afterwards."""
+        def write(f):
+            with open(filepath, 'rb') as source:
+                shutil.copyfileobj(source, f, 1024 * 1024)
+        return self._stage(key, write, extra_args)
+
+    def enqueue_fileobj(self, fileobj, key, extra_args=None):
+        """Stage an open file object (e.g. a Werkzeug FileStorage stream) for upload."""
+        return self._stage(key, lambda f: shutil.copyfileobj(fileobj, f, 1024 * 1024), extra_args)
+
+    def _discard(self, staged, sidecar=None):
+        for path in (staged, sidecar or f"{staged}.json"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _claim(self, staged):
+        """Take a staged file for this process; returns the claimed sidecar, or None if it's taken."""
+        claimed = f"{staged}.inflight.{os.getpid()}"
+        try:
+            os.rename(f"{staged}.json", claimed)
+        except FileNotFoundError:
+            return None
+        return claimed
+
+    def _dead_letter(self, staged, claimed, key, reason):
+        with self._lock:
+            self.failed += 1
+        name = os.path.basename(staged)
+        try:
+            os.replace(staged, os.path.join(self.dead_letter_dir, name))
+            os.replace(claimed, os.path.join(self.dead_letter_dir, f"{name}.json"))
+        except OSError as e:
+            logger.error("Error moving %s to the dead-letter directory: %s", staged, e)
+        logger.error("Giving up on upload of %s (%s); moved to %s", key, reason, self.dead_letter_dir)
+
+    def _run(self):
+        while True:
+            staged = self._queue.get()
+            try:
+                self._upload(staged)
+            except Exception as e:
+                logger.error("Unexpected error uploading %s: %s", staged, e)
+            finally:
+                self._queue.task_done()
+
+    def _upload(self, staged):
+        claimed = self._claim(staged)
+        if claimed is None:
+            return  # Claimed or already uploaded by another worker sharing the staging directory
+        with open(claimed) as f:
+            meta = json.load(f)
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                get_s3_client().upload_file(
+                    staged, self.bucket, meta['key'],
+                    ExtraArgs=meta['extra_args'] or None,
+                    Config=self.transfer_config
+                )
+                with self._lock:
+                    self._latencies.append(time.perf_counter() - start)
+                    self.uploaded += 1
+                self._discard(staged, claimed)
+                return
+            except (BotoCoreError, ClientError, S3UploadFailedError, OSError) as e:
+                if _is_permanent(e):
+                    self._dead_letter(staged, claimed, meta['key'], e)
+                    return
+                if attempt == self.max_retries:
+                    break
+                delay = min(60, (2 ** attempt) * 0.5) * (0.5 + random.random())
+                logger.warning("Upload of %s failed (attempt %s): %s; retrying in %.1fs",
+                               meta['key'], attempt + 1, e, delay)
+                time.sleep(delay)
+        self._dead_letter(staged, claimed, meta['key'], f"{self.max_retries + 1} attempts failed")
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            uploaded, failed = self.uploaded, self.failed
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            'queue_depth': self.queue_depth(),
+            'uploaded': uploaded,
+            'failed': failed,
+            'latency_p50': percentile(0.5),
+            'latency_p95': percentile(0.95),
+            'latency_max': latencies[-1] if latencies else None
+        }
+
+    def join(self):
+        """Block until every queued upload has been attempted."""
+        self._queue.join()
+
+
+_uploader = None
+_uploader_lock = threading.Lock()
+
+
+def get_uploader():
+    """Return the process-wide uploader, starting its threads on first use (after fork)."""
+    global _uploader
+    with _uploader_lock:
+        if _uploader is None:
+            _uploader = BackgroundUploader().start()
+        return _uploader
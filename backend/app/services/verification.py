@@ -1,31 +1,48 @@
-import tensorflow as tf
 import numpy as np
 from PIL import Image
 import io
-import os
 import random
-import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from config import Config
+from .blob_store import hash_file
+from .input_buffers import InputBufferPool
+from .model_artifacts import get_artifacts
+from .model_registry import model_registry
+from .storage import storage_service
+import logging
+
+logger = logging.getLogger(__name__)
 
 class VerificationService:
     def __init__(self):
-        self.model = None
-        self.model_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models', 'mosquito_model.h5')
-        self.load_model()
+        self._model = None
+        self._model_loaded = False
         self.class_names = ['mosquito', 'not_mosquito']
-        self.submitted_hashes = set()  # Store hashes of submitted images
+        self._decode_pool = None
+        # Reused float32 input buffers sized for the largest batch submission
+        self.input_pool = InputBufferPool(max(1, Config.MAX_BATCH_SUBMISSIONS), scaling='unit')
         
+    @property
+    def model(self):
+        """The classifier, loaded on first use; None means simple verification."""
+        if not self._model_loaded:
+            self.load_model()
+        return self._model
+
     def load_model(self):
-        """Load the pre-trained model if available."""
+        """Load the pre-trained model if the artifact bundle has one."""
+        # Outside the try: a missing or corrupted bundle must fail loudly
+        artifacts = get_artifacts()
         try:
-            if os.path.exists(self.model_path):
-                self.model = tf.keras.models.load_model(self.model_path)
-                print("Model loaded successfully")
+            if artifacts.has_model('mosquito'):
+                self._model = model_registry.get('mosquito')
+                logger.info("Model loaded successfully")
             else:
-                print(f"Model not found at {self.model_path}. Using simple verification.")
+                logger.warning("No mosquito model in artifacts %s. Using simple verification.", artifacts.version)
         except Exception as e:
-            print(f"Error loading model: {str(e)}")
-            print("Using simple verification.")
+            logger.error("Error loading model: %s. Using simple verification.", e)
+        self._model_loaded = True
 
     def _check_image_content(self, image):
         """Basic image validation"""
@@ -48,73 +65,171 @@ class VerificationService:
         except Exception as e:
             return False, f"Image validation failed: {str(e)}"
 
-    def _calculate_image_hash(self, image_path):
-        """Calculate MD5 hash of image file"""
+    @property
+    def claims(self):
+        """Accepted image contents, shared by every worker (the blob store's claims table)."""
+        return storage_service.blob_store
+
+    def preprocess_image(self, image_path, batch):
+        """Decode an image into the next slot of a pooled input batch."""
         try:
-            with open(image_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+            batch.add(Image.open(image_path))
+            return True
         except Exception as e:
-            print(f"Error calculating image hash: {str(e)}")
-            return None
+            logger.error("Error preprocessing image: %s", e)
+            return False
 
-    def _check_duplicate(self, image_hash):
-        """Check if image has been submitted before"""
-        return image_hash in self.submitted_hashes
+    def verify_image(self, image_path, username):
+        """Verify if the image contains a mosquito.
 
-    def preprocess_image(self, image_path):
-        """Preprocess image for model input."""
+        Like verify_batch, a rejected image is a failed result (code
+        NOT_MOSQUITO), so neither endpoint records it or charges for it, and
+        bytes another submission already claimed are a DUPLICATE_IMAGE.
+        """
         try:
-            img = Image.open(image_path)
-            img = img.resize((224, 224))  # Resize to standard size
-            img_array = np.array(img)
-            img_array = img_array / 255.0  # Normalize
-            img_array = np.expand_dims(img_array, axis=0)
-            return img_array
-        except Exception as e:
-            print(f"Error preprocessing image: {str(e)}")
-            return None
+            image_hash = hash_file(image_path)
+        except OSError as e:
+            logger.error("Error hashing image: %s", e)
+            return {'success': False, 'message': 'Invalid or corrupted image', 'code': 'INVALID_IMAGE', 'coins': 0}
+        if not self.claims.claim([image_hash]):
+            return {'success': False, 'message': 'This image has already been submitted',
+                    'code': 'DUPLICATE_IMAGE', 'coins': 0}
+        result = self._score_image(image_path)
+        if not result['success']:
+            self.claims.unclaim([image_hash])
+        return result
 
-    def verify_image(self, image_path, username):
-        """Verify if the image contains a mosquito."""
+    def _score_image(self, image_path):
         try:
             if self.model:
                 # Use the model for verification
-                img_array = self.preprocess_image(image_path)
-                if img_array is None:
-                    return False, "Error processing image"
-                
-                prediction = self.model.predict(img_array)[0][0]
-                is_valid = prediction > 0.5
+                with self.input_pool.batch() as batch:
+                    if not self.preprocess_image(image_path, batch):
+                        return {'success': False, 'message': 'Invalid or corrupted image',
+                                'code': 'INVALID_IMAGE', 'coins': 0}
+                    prediction = self.model.predict_on_batch(batch.view())[0][0]
+                is_valid = bool(prediction > 0.5)
                 confidence = float(prediction)
-                
-                return {
-                    'success': True,
-                    'is_valid': is_valid,
-                    'confidence': confidence,
-                    'message': f"Image {'verified' if is_valid else 'rejected'} with {confidence:.2%} confidence",
-                    'coins': 10 if is_valid else 0
-                }
+                message = f"Image {'verified' if is_valid else 'rejected'} with {confidence:.2%} confidence"
             else:
                 # Simple verification (random 30% acceptance rate)
                 is_valid = random.random() < 0.3
-                return {
-                    'success': True,
-                    'is_valid': is_valid,
-                    'confidence': 0.7 if is_valid else 0.3,
-                    'message': f"Image {'verified' if is_valid else 'rejected'} (simple verification)",
-                    'coins': 10 if is_valid else 0
-                }
+                confidence = 0.7 if is_valid else 0.3
+                message = f"Image {'verified' if is_valid else 'rejected'} (simple verification)"
+            return {
+                'success': is_valid,
+                'is_valid': is_valid,
+                'confidence': confidence,
+                'message': message,
+                'code': 'VERIFIED' if is_valid else 'NOT_MOSQUITO',
+                'coins': 10 if is_valid else 0
+            }
         except Exception as e:
-            print(f"Error in verify_image: {str(e)}")
+            logger.error("Error in verify_image: %s", e)
             return {
                 'success': False,
                 'message': f"Error verifying image: {str(e)}",
+                'code': 'VERIFICATION_ERROR',
                 'coins': 0
             }
 
+    def _decode_for_model(self, image_path):
+        """Decode one image to 224x224 RGB pixels plus its content hash."""
+        img = Image.open(image_path)
+        img.draft('RGB', (224, 224))  # JPEGs decode at reduced scale
+        img = img.convert('RGB').resize((224, 224))
+        return np.asarray(img), hash_file(image_path)
+
+    def decode_images(self, image_paths):
+        """Decode images in parallel; PIL releases the GIL while decoding.
+
+        Returns one (array, hash) tuple per path, or an Exception for images
+        that could not be decoded.
+        """
+        if self._decode_pool is None:
+            self._decode_pool = ThreadPoolExecutor(max_workers=Config.DECODE_WORKERS, thread_name_prefix='decode')
+        futures = [self._decode_pool.submit(self._decode_for_model, path) for path in image_paths]
+        decoded = []
+        for future in futures:
+            try:
+                decoded.append(future.result())
+            except Exception as e:
+                logger.error("Error decoding image: %s", e)
+                decoded.append(e)
+        return decoded
+
+    def verify_batch(self, image_paths, username):
+        """Verify several images with one forward pass.
+
+        Images are checked against previously accepted submissions and against
+        each other; only the first copy of identical bytes is scored. Returns
+        one result per path, in order, shaped like verify_image's.
+        """
+        decoded = self.decode_images(image_paths)
+        results = [None] * len(image_paths)
+        for index, item in enumerate(decoded):
+            if isinstance(item, Exception):
+                results[index] = {'success': False, 'message': 'Invalid or corrupted image',
+                                  'code': 'INVALID_IMAGE', 'coins': 0}
+        # Claim the hashes up front so a concurrent request can't accept the same image
+        claimed = set(self.claims.claim([item[1] for item in decoded if not isinstance(item, Exception)]))
+        batch, batch_indexes, batch_hashes = [], [], set()
+        for index, item in enumerate(decoded):
+            if results[index] is not None:
+                continue
+            pixels, image_hash = item
+            if image_hash not in claimed or image_hash in batch_hashes:
+                results[index] = {'success': False, 'message': 'This image has already been submitted',
+                                  'code': 'DUPLICATE_IMAGE', 'coins': 0}
+                continue
+            batch_hashes.add(image_hash)
+            batch.append(pixels)
+            batch_indexes.append((index, image_hash))
+
+        if batch:
+            try:
+                if self.model:
+                    with self.input_pool.batch() as inputs:
+                        for pixels in batch:
+                            inputs.add_pixels(pixels)
+                        confidences = self.model.predict_on_batch(inputs.view())[:, 0]
+                    method = 'confidence'
+                else:
+                    # Simple verification (random 30% acceptance rate)
+                    confidences = [0.7 if random.random() < 0.3 else 0.3 for _ in batch]
+                    method = 'simple verification'
+            except Exception as e:
+                logger.error("Error in verify_batch: %s", e)
+                self.claims.unclaim(batch_hashes)
+                for index, _ in batch_indexes:
+                    results[index] = {'success': False, 'message': f"Error verifying image: {str(e)}",
+                                      'code': 'VERIFICATION_ERROR', 'coins': 0}
+                return results
+
+            rejected = []
+            for (index, image_hash), confidence in zip(batch_indexes, confidences):
+                confidence = float(confidence)
+                is_valid = confidence > 0.5
+                if not is_valid:
+                    rejected.append(image_hash)
+                results[index] = {
+                    'success': is_valid,
+                    'is_valid': is_valid,
+                    'confidence': confidence,
+                    'message': f"Image {'verified' if is_valid else 'rejected'} ({method} {confidence:.2%})",
+                    'code': 'VERIFIED' if is_valid else 'NOT_MOSQUITO',
+                    'coins': 10 if is_valid else 0
+                }
+            self.claims.unclaim(rejected)
+
+        return results
+
 # Create a singleton instance
 verification_service = VerificationService()
 
 # Export the verify_image function
 def verify_image(image_path, username):
-    return verification_service.verify_image(image_path, username) 
\ No newline at end of file
+    return verification_service.verify_image(image_path, username)
+
+def verify_batch(image_paths, username):
+    return verification_service.verify_batch(image_paths, username)
@@ -0,0 +1,124 @@
+from bisect import bisect_left, bisect_right, insort
+import heapq
+import threading
+import time
+
+# window name -> (bucket length in seconds, number of buckets)
+WINDOWS = {
+    'daily': (60 * 60, 24),
+    'weekly': (24 * 60 * 60, 7),
+    'monthly': (24 * 60 * 60, 30),
+}
+
+
+class RollingWindow:
+    """Per-user coin totals over the last bucket_count buckets.
+
+    Awards are added to the bucket for their timestamp and to a running total.
+    When the window slides, expired buckets are subtracted from the totals, so
+    no submission history is ever re-scanned. Memory is bounded by the users
+    active inside the window times the bucket count.
+    """
+
+    def __init__(self, bucket_seconds, bucket_count):
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = bucket_count
+        self.buckets = [{} for _ in range(bucket_count)]
+        self.totals = {}
+        self.sorted_totals = []  # Every total in ascending order, for rank lookups
+        self.current = None  # Absolute index of the newest bucket
+
+    def bucket_id(self, now):
+        return int(now // self.bucket_seconds)
+
+    def advance(self, now):
+        bucket_id = self.bucket_id(now)
+        if self.current is not None and bucket_id <= self.current:
+            return
+        if self.current is None or bucket_id - self.current >= self.bucket_count:
+            self.buckets = [{} for _ in range(self.bucket_count)]
+            self.totals = {}
+            self.sorted_totals = []
+        else:
+            for expired in range(self.current + 1, bucket_id + 1):
+                self._expire(expired % self.bucket_count)
+        self.current = bucket_id
+
+    def _set_total(self, user, total):
+        old = self.totals.get(user)
+        if old is not None:
+            del self.sorted_totals[bisect_left(self.sorted_totals, old)]
+        if total:
+            self.totals[user] = total
+            insort(self.sorted_totals, total)
+        else:
+            self.totals.pop(user, None)
+
+    def _expire(self, slot):
+        for user, coins in self.buckets[slot].items():
+            self._set_total(user, self.totals[user] - coins)
+        self.buckets[slot] = {}
+
+    def add(self, user, coins, now):
+        self.advance(now)
+        bucket_id = self.bucket_id(now)
+        if not coins or bucket_id <= self.current - self.bucket_count:
+            return
+        bucket = self.buckets[bucket_id % self.bucket_count]
+        bucket[user] = bucket.get(user, 0) + coins
+        self._set_total(user, self.totals.get(user, 0) + coins)
+
+    def top(self, k):
+        return heapq.nlargest(k, self.totals.items(), key=lambda item: item[1])
+
+    def rank(self, user):
+        coins = self.totals.get(user)
+        if coins is None:
+            return 0
+        return 1 + len(self.sorted_totals) - bisect_right(self.sorted_totals, coins)
+
+
+def active_buckets(name, now=None):
+    """(newest bucket id, oldest bucket id still inside the window) for a window name."""
+    now = time.time() if now is None else now
+    bucket_seconds, bucket_count = WINDOWS[name]
+    newest = int(now // bucket_seconds)
+    return newest, newest - bucket_count + 1
+
+
+class WindowedLeaderboards:
+    """Daily, weekly and monthly leaderboards maintained incrementally."""
+
+    def __init__(self, windows=None):
+        self._lock = threading.Lock()
+        self.windows = {
+            name: RollingWindow(bucket_seconds, bucket_count)
+            for name, (bucket_seconds, bucket_count) in (windows or WINDOWS).items()
+        }
+
+    def record_award(self, user, coins, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            for window in self.windows.values():
+                window.add(user, coins, now)
+
+    def epoch(self, name, now=None):
+        """Index of the newest bucket; changes whenever the window slides."""
+        now = time.time() if now is None else now
+        return self.windows[name].bucket_id(now)
+
+    def top(self, name, k=10, now=None):
+        """Return [(user, coins), ...] for the top k users in the window."""
+        now = time.time() if now is None else now
+        with self._lock:
+            window = self.windows[name]
+            window.advance(now)
+            return window.top(k)
+
+    def rank(self, name, user, now=None):
+        """Return the user's 1-based rank in the window, or 0 if inactive."""
+        now = time.time() if now is None else now
+        with self._lock:
+            window = self.windows[name]
+            window.advance(now)
+            return window.rank(user)
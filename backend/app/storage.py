@@ -1,11 +1,14 @@
+from bisect import bisect_left, insort
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
 from werkzeug.utils import secure_filename
 from config import Config
-import boto3
-from botocore.exceptions import ClientError
 from flask import current_app
+from app.services.uploader import get_s3_client, get_uploader, UploadQueueFull
+from app.services.windowed_leaderboard import WindowedLeaderboards
+from app.services.derivatives import derivative_path, DERIVATIVE_CONTENT_TYPES, MEDIA_CACHE_CONTROL
+from app.services.events import event_bus
 
 class InMemoryStorage:
     def __init__(self):
@@ -14,11 +17,33 @@ class InMemoryStorage:
         self.next_user_id = 1
         self.next_image_id = 1
         self.files = {}
+        self.version = 0  # Bumped on every mutation that can change rankings
+        self.windows = WindowedLeaderboards()  # Daily/weekly/monthly coin totals
+
+        # Secondary indexes, kept in sync by _add_user/_add_image/update_image
+        self.user_ids_by_username = {}
+        self.user_ids_by_email = {}
+        self.image_ids_by_user = {}  # user_id -> [image_id, ...] in creation order
+        self.image_ids_by_status = {}  # status -> {image_id: None} (insertion-ordered set)
+        self.image_ids_by_s3_key = {}  # Object key -> image_id, for direct uploads
+        self.ranking = []  # Sorted (-coins, user_id) keys: the leaderboard order, ties to earlier users
+
+    def _add_user(self, user):
+        self.users[user['id']] = user
+        self.user_ids_by_username[user['username']] = user['id']
+        self.user_ids_by_email[user['email']] = user['id']
+        insort(self.ranking, (-user['coins'], user['id']))
+        self.version += 1
+
+    def _add_image(self, image):
+        self.images[image['id']] = image
+        self.image_ids_by_user.setdefault(image['user_id'], []).append(image['id'])
+        self.image_ids_by_status.setdefault(image['verification_status'], {})[image['id']] = None
 
     def create_user(self, username, email, password):
-        if username in self.users:
+        if username in self.user_ids_by_username:
             return None
-        if email in [user['email'] for user in self.users.values()]:
+        if email in self.user_ids_by_email:
             return None
 
         user = {
@@ -29,15 +54,15 @@ class InMemoryStorage:
             'coins': 0,
             'created_at': datetime.utcnow()
         }
-        self.users[self.next_user_id] = user
+        self._add_user(user)
         self.next_user_id += 1
         return user
 
     def get_user_by_username(self, username):
-        for user in self.users.values():
-            if user['username'] == username:
-                return user
-        return None
+        user_id = self.user_ids_by_username.get(username)
+        if user_id is None:
+            return None
+        return self.users[user_id]
 
     def get_user_by_id(self, user_id):
         return self.users.get(user_id)
@@ -56,37 +81,91 @@ class InMemoryStorage:
             'created_at': datetime.utcnow(),
             'verified_at': None
         }
-        self.images[self.next_image_id] = image
+        self._add_image(image)
         self.next_image_id += 1
         return image
 
     def get_user_images(self, user_id):
-        return [img for img in self.images.values() if img['user_id'] == user_id]
+        return [self.images[image_id] for image_id in self.image_ids_by_user.get(user_id, [])]
+
+    def get_images_by_status(self, status):
+        return [self.images[image_id] for image_id in self.image_ids_by_status.get(status, {})]
 
     def get_image(self, image_id):
         return self.images.get(image_id)
 
+    def get_image_by_s3_key(self, s3_key):
+        image_id = self.image_ids_by_s3_key.get(s3_key)
+        return self.images[image_id] if image_id is not None else None
+
     def update_image(self, image_id, **kwargs):
         if image_id in self.images:
-            self.images[image_id].update(kwargs)
-            return self.images[image_id]
+            image = self.images[image_id]
+            old_status = image['verification_status']
+            old_user_id = image['user_id']
+            old_s3_key = image.get('s3_key')
+            image.update(kwargs)
+
+            # Keep secondary indexes consistent with the updated fields
+            if image['verification_status'] != old_status:
+                self.image_ids_by_status[old_status].pop(image_id, None)
+                self.image_ids_by_status.setdefault(image['verification_status'], {})[image_id] = None
+                event_bus.publish(image['user_id'], 'status', {
+                    'image_id': image_id,
+                    'status': image['verification_status'],
+                    'previous_status': old_status,
+                    'feedback': image['feedback'],
+                    'coins_awarded': image['coins_awarded']
+                })
+            if image.get('s3_key') != old_s3_key:
+                self.image_ids_by_s3_key.pop(old_s3_key, None)
+                if image.get('s3_key') is not None:
+                    self.image_ids_by_s3_key[image['s3_key']] = image_id
+            if image['user_id'] != old_user_id:
+                self.image_ids_by_user[old_user_id].remove(image_id)
+                ids = self.image_ids_by_user.setdefault(image['user_id'], [])
+                ids.append(image_id)
+                ids.sort()
+            return image
         return None
 
     def update_user_coins(self, user_id, coins):
         if user_id in self.users:
+            rank_before = self.get_user_rank(user_id)
+            key = (-self.users[user_id]['coins'], user_id)
+            del self.ranking[bisect_left(self.ranking, key)]
             self.users[user_id]['coins'] += coins
+            insort(self.ranking, (-self.users[user_id]['coins'], user_id))
+            self.version += 1
+            self.windows.record_award(user_id, coins)
+            event_bus.publish(user_id, 'coins', {'awarded': coins, 'balance': self.users[user_id]['coins']})
+            # Only the awarded user is told; others see their new rank on the next fetch
+            rank = self.get_user_rank(user_id)
+            if rank != rank_before:
+                event_bus.publish(user_id, 'rank', {'rank': rank, 'previous_rank': rank_before})
             return self.users[user_id]
         return None
 
+    def get_user_rank(self, user_id):
+        """A user's 1-based leaderboard position, by binary search of the ranking."""
+        return bisect_left(self.ranking, (-self.users[user_id]['coins'], user_id)) + 1
+
     def get_leaderboard(self, limit=100):
-        sorted_users = sorted(
-            self.users.values(),
-            key=lambda x: x['coins'],
-            reverse=True
-        )
-        return sorted_users[:limit]
-
-    def upload_file(self, filepath):
+        return [self.users[user_id] for _, user_id in self.ranking[:limit]]
+
+    def get_window_leaderboard(self, window, limit=100):
+        """Top users by coins earned inside a daily/weekly/monthly window."""
+        return [
+            {**self.users[user_id], 'coins': coins}
+            for user_id, coins in self.windows.top(window, limit)
+            if user_id in self.users
+        ]
+
+    def get_user_ranks(self):
+        """Map every user id to its 1-based leaderboard position."""
+        return {user_id: rank + 1 for rank, (_, user_id) in enumerate(self.ranking)}
+
+    def upload_file(self, filepath, derivatives=None):
         try:
             # For testing, we'll just return a mock URL
             filename = os.path.basename(filepath)
@@ -97,37 +176,39 @@ class InMemoryStorage:
             self.files[mock_url] = {
                 'path': filepath,
                 'timestamp': timestamp,
-                'filename': filename
+                'filename': filename,
+                'derivatives': derivatives or {}
             }
             
             return mock_url
             
         except Exception as e:
-            current_app.logger.error(f"Error uploading file: {str(e)}")
+            current_app.logger.error("Error uploading file: %s", e)
             raise
 
 class S3Storage:
     def __init__(self):
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
-        )
-        self.bucket_name = os.getenv('AWS_BUCKET_NAME')
+        self.s3_client = get_s3_client()
+        self.bucket_name = Config.AWS_BUCKET_NAME
         
-    def upload_file(self, filepath):
+    def upload_file(self, filepath, derivatives=None):
+        """Stage the file, and any derivatives of it, for background upload and return its final URL."""
         try:
             filename = os.path.basename(filepath)
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             s3_key = f"{timestamp}_{filename}"
             
-            self.s3_client.upload_file(filepath, self.bucket_name, s3_key)
-            
-            url = f"https://{self.bucket_name}.s3.amazonaws.com/{s3_key}"
-            return url
+            uploader = get_uploader()
+            for width, paths in (derivatives or {}).items():
+                for ext, path in paths.items():
+                    uploader.enqueue_file(path, derivative_path(s3_key, width, ext), {
+                        'ContentType': DERIVATIVE_CONTENT_TYPES[ext],
+                        'CacheControl': MEDIA_CACHE_CONTROL
+                    })
+            return uploader.enqueue_file(filepath, s3_key)
             
-        except ClientError as e:
-            current_app.logger.error(f"Error uploading to S3: {str(e)}")
+        except (OSError, UploadQueueFull) as e:
+            current_app.logger.error("Error staging upload for S3: %s", e)
             raise
 
 def save_image(file, filename):
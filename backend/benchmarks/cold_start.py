@@ -0,0 +1,66 @@
+"""Measure model cold start: downloaded/h5 loading versus the artifact bundle.
+
+Each mode runs in a fresh subprocess and reports the seconds spent importing
+TensorFlow, building the models, decoding the first predictions (the legacy
+path fetches the class index here) and running the first forward pass. The
+legacy mode uses an empty KERAS_HOME, so it pays the downloads exactly as a
+fresh container does; pass --warm to reuse ~/.keras instead.
+
+Run from the backend directory (after python manage.py prepare-artifacts):
+    python -m benchmarks.cold_start [--warm]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ('legacy', 'artifacts')
+
+
+def run(mode):
+    timings = {}
+    start = time.perf_counter()
+    import numpy as np
+    import tensorflow as tf
+    timings['import'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if mode == 'legacy':
+        mobilenet = tf.keras.applications.MobileNetV2(weights='imagenet', include_top=True)
+        model_path = os.path.join('app', 'models', 'mosquito_model.h5')
+        if os.path.exists(model_path):
+            tf.keras.models.load_model(model_path)
+        decode = tf.keras.applications.mobilenet_v2.decode_predictions
+    else:
+        from app.services.model_artifacts import get_artifacts
+        artifacts = get_artifacts()
+        mobilenet = artifacts.load_model('mobilenet_v2')
+        artifacts.load_model('mosquito')
+        decode = artifacts.decode_predictions
+    timings['models'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decode(np.random.rand(1, 1000).astype(np.float32), top=10)
+    timings['labels'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mobilenet.predict_on_batch(np.zeros((1, 224, 224, 3), dtype=np.float32))
+    timings['first_pass'] = time.perf_counter() - start
+
+    total = sum(timings.values())
+    print(f"{mode:>10} " + ' '.join(f"{seconds:>10.2f}s" for seconds in timings.values()) + f" {total:>10.2f}s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in MODES:
+        run(sys.argv[1])
+    else:
+        warm = '--warm' in sys.argv
+        print(f"{'mode':>10} {'import':>11} {'models':>11} {'labels':>11} {'first pass':>11} {'total':>11}")
+        with tempfile.TemporaryDirectory() as keras_home:
+            for mode in MODES:
+                env = dict(os.environ)
+                if mode == 'legacy' and not warm:
+                    env['KERAS_HOME'] = keras_home
+                subprocess.run([sys.executable, '-m', 'benchmarks.cold_start', mode], env=env, check=True)
@@ -0,0 +1,52 @@
+"""Show that InMemoryStorage lookups stay flat as the user count grows.
+
+Users are inserted through the indexing helper directly so the benchmark
+doesn't spend its time in password hashing.
+
+Run from the backend directory:
+    python -m benchmarks.inmemory_indexes
+"""
+import time
+from datetime import datetime
+from app.storage import InMemoryStorage
+
+SIZES = [1000, 10000, 100000, 1000000]
+LOOKUPS = 100000
+
+
+def populate(storage, count):
+    for i in range(count):
+        storage._add_user({
+            'id': i + 1,
+            'username': f"user{i}",
+            'email': f"user{i}@example.com",
+            'password_hash': '',
+            'coins': 0,
+            'created_at': datetime.utcnow()
+        })
+        if i % 10 == 0:
+            storage.create_image(i + 1, f"https://example.com/{i}.jpg")
+    storage.next_user_id = count + 1
+
+
+def per_op_ns(fn, count):
+    start = time.perf_counter()
+    for i in range(LOOKUPS):
+        fn(i % count)
+    return (time.perf_counter() - start) / LOOKUPS * 1e9
+
+
+if __name__ == "__main__":
+    print(f"{'users':>10} {'by_username':>14} {'email check':>14} {'user_images':>14} {'update_image':>14}")
+    for size in SIZES:
+        storage = InMemoryStorage()
+        populate(storage, size)
+        by_username = per_op_ns(lambda i: storage.get_user_by_username(f"user{i}"), size)
+        email_check = per_op_ns(lambda i: f"user{i}@example.com" in storage.user_ids_by_email, size)
+        user_images = per_op_ns(lambda i: storage.get_user_images(i + 1), size)
+        images = storage.next_image_id - 1
+        update = per_op_ns(
+            lambda i: storage.update_image(i + 1, verification_status='verified' if i % 2 else 'rejected'),
+            images
+        )
+        print(f"{size:>10} {by_username:>12.0f}ns {email_check:>12.0f}ns {user_images:>12.0f}ns {update:>12.0f}ns")
@@ -0,0 +1,66 @@
+"""Compare JSON encoders and response encodings for the profile and leaderboard payloads.
+
+Reports serialization time per response for the standard library encoder
+(what jsonify used before) and the app's FastJSONProvider path, then the
+bytes on the wire for identity, gzip and (if installed) brotli encodings.
+
+Run from the backend directory:
+    python -m benchmarks.json_responses
+"""
+from datetime import datetime, timedelta
+import json
+import time
+from bson import ObjectId
+from config import Config
+from app.services.json_provider import dumps_bytes, _default, orjson
+from app.services.compression import ResponseCompressor, brotli
+
+ITERATIONS = 2000
+
+
+def profile_payload(submissions=200):
+    now = datetime.utcnow()
+    return {
+        'success': True,
+        'user': {'_id': ObjectId(), 'username': 'alice', 'coins': 1250, 'created_at': now},
+        'submissions': [{
+            '_id': ObjectId(),
+            'image_path': f"uploads/ab/cd/{i:064x}.jpg",
+            'verified': i % 3 != 0,
+            'submitted_at': now - timedelta(minutes=i),
+            'thumbnails': {
+                str(width): {ext: f"/media/ab/cd/{i:064x}_w{width}.{ext}" for ext in ('webp', 'jpg')}
+                for width in Config.DERIVATIVE_WIDTHS
+            }
+        } for i in range(submissions)]
+    }
+
+
+def leaderboard_payload(limit=100):
+    return [{'username': f"hunter{i}", 'coins': 10000 - i * 7, 'rank': i + 1} for i in range(limit)]
+
+
+def stdlib_dumps(obj):
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def per_call_us(fn, payload):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn(payload)
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+if __name__ == "__main__":
+    compressor = ResponseCompressor()
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+    print(f"fast encoder: {'orjson' if orjson is not None else 'stdlib fallback'}")
+    print(f"{'payload':>12} {'stdlib':>10} {'fast':>10} {'identity':>10} "
+          + ' '.join(f"{encoding:>10}" for encoding in encodings))
+    for name, payload in (('profile', profile_payload()), ('leaderboard', leaderboard_payload())):
+        stdlib = per_call_us(stdlib_dumps, payload)
+        fast = per_call_us(dumps_bytes, payload)
+        body = dumps_bytes(payload)
+        sizes = [len(compressor.compress(body, encoding)) for encoding in encodings]
+        print(f"{name:>12} {stdlib:>8.0f}us {fast:>8.0f}us {len(body):>9}B "
+              + ' '.join(f"{size:>9}B" for size in sizes))
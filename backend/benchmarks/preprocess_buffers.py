@@ -0,0 +1,76 @@
+"""Compare per-request preprocessing allocations with the pooled input buffers.
+
+The legacy path builds each model input the way verify_image and the batch
+route used to: a float32 copy of the pixels, a scaled copy, expand_dims and
+np.stack for batches. The pooled path resizes into a reused float32 buffer
+and scales it in place. Each mode runs in its own subprocess and reports
+time per image, the largest traced allocation during one request
+(tracemalloc) and the process's peak RSS.
+
+Run from the backend directory:
+    python -m benchmarks.preprocess_buffers
+"""
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+from app.services.input_buffers import InputBufferPool, SCALINGS
+
+ITERATIONS = 200
+BATCH = 4
+MODES = ('legacy', 'pooled')
+
+
+def sample_images(count=BATCH):
+    x = np.linspace(0, 255, 1024, dtype=np.uint8)
+    pixels = np.stack([*np.meshgrid(x, x[::-1]), np.full((1024, 1024), 128, np.uint8)], axis=-1)
+    return [Image.fromarray(np.roll(pixels, i * 64, axis=1)) for i in range(count)]
+
+
+def legacy_batch(images):
+    scale, offset = SCALINGS['mobilenet']
+    inputs = []
+    for image in images:
+        img_array = np.asarray(image.resize((224, 224)), dtype=np.float32)
+        img_array = img_array * scale + offset
+        inputs.append(np.expand_dims(img_array, axis=0))
+    return np.concatenate(inputs)
+
+
+def pooled_batch(pool, images):
+    with pool.batch() as batch:
+        for image in images:
+            batch.add(image)
+        return batch.view().sum()  # Stand-in for the forward pass
+
+
+def run(mode):
+    images = sample_images()
+    pool = InputBufferPool(BATCH)
+    request = (lambda: legacy_batch(images).sum()) if mode == 'legacy' else (lambda: pooled_batch(pool, images))
+    request()  # Warm up (the pool allocates its buffer here)
+
+    tracemalloc.start()
+    request()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        request()
+    per_image = (time.perf_counter() - start) / (ITERATIONS * BATCH) * 1e3
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    buffers = pool.allocated if mode == 'pooled' else '-'
+    print(f"{mode:>8} {per_image:>8.2f}ms {traced_peak / 1024:>10.0f}KiB {rss_kb / 1024:>9.1f}MiB {buffers:>8}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(sys.argv[1])
+    else:
+        print(f"{'mode':>8} {'per image':>10} {'alloc peak':>13} {'peak RSS':>12} {'buffers':>8}")
+        for mode in MODES:
+            subprocess.run([sys.executable, '-m', 'benchmarks.preprocess_buffers', mode], check=True)
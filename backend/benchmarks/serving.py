@@ -0,0 +1,139 @@
+"""Compare the development server (run.py) with gunicorn (gunicorn.conf.py).
+
+Starts each server in turn and drives it with concurrent requests. By default
+each request POSTs a fresh image to /api/submit, so the verification model
+is loaded and used; --path does GETs against a cheap endpoint instead.
+Reports requests/sec and the server process tree's RSS and PSS.
+
+Gunicorn workers each hold their own TensorFlow variables. What they share
+are the read-only model weights the master memory-maps before forking (page
+cache, counted once in PSS). So expect PSS to grow per worker by about the
+model's variables, not by the whole model load.
+
+Run from the backend directory:
+    python -m benchmarks.serving [--seconds 20] [--concurrency 16] [--path /api/leaderboard]
+"""
+import argparse
+import io
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+import numpy as np
+from PIL import Image
+
+PORT = 5055
+
+
+def _process_tree(pid):
+    pids = [pid]
+    children_path = f"/proc/{pid}/task/{pid}/children"
+    if os.path.exists(children_path):
+        with open(children_path) as f:
+            pids.extend(int(child) for child in f.read().split())
+    return pids
+
+
+def _sum_field(pid, filename, field):
+    total_kb = 0
+    for p in _process_tree(pid):
+        try:
+            with open(f"/proc/{p}/{filename}") as f:
+                for line in f:
+                    if line.startswith(field):
+                        total_kb += int(line.split()[1])
+        except (FileNotFoundError, PermissionError):
+            pass
+    return total_kb / 1024
+
+
+def process_tree_rss_mb(pid):
+    """Sum of RSS over the server and its workers; shared pages are counted per process."""
+    return _sum_field(pid, 'status', 'VmRSS:')
+
+
+def process_tree_pss_mb(pid):
+    """Proportional set size: copy-on-write pages shared by workers are split between them."""
+    return _sum_field(pid, 'smaps_rollup', 'Pss:')
+
+
+def wait_ready(url, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return
+        except Exception:
+            time.sleep(1)
+    raise RuntimeError(f"Server at {url} did not become ready")
+
+
+_sequence = itertools.count()
+
+
+def submit_request(url):
+    """A multipart /api/submit request with a unique image and username (no duplicate or quota rejections)."""
+    n = next(_sequence)
+    pixels = np.random.default_rng(n).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    image = io.BytesIO()
+    Image.fromarray(pixels).save(image, 'JPEG')
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="username"\r\n\r\nbench{n}\r\n'
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="{n}.jpg"\r\n'
+        f'Content-Type: image/jpeg\r\n\r\n'
+    ).encode() + image.getvalue() + f'\r\n--{boundary}--\r\n'.encode()
+    return urllib.request.Request(url, data=body, headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+
+def drive(url, seconds, concurrency, submit):
+    counts = [0] * concurrency
+    stop = time.time() + seconds
+
+    def worker(i):
+        while time.time() < stop:
+            try:
+                urllib.request.urlopen(submit_request(url) if submit else url, timeout=30).read()
+                counts[i] += 1
+            except Exception:
+                pass
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / seconds
+
+
+def run(name, command, args):
+    # Unique usernames keep the per-user quota out of the way; lift the per-IP one too
+    env = dict(os.environ, BIND=f"127.0.0.1:{PORT}", MAX_SUBMISSIONS_PER_DAY_PER_IP=str(10 ** 9))
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        submit = args.path is None
+        url = f"http://127.0.0.1:{PORT}{args.path or '/api/submit'}"
+        wait_ready(f"http://127.0.0.1:{PORT}/api/leaderboard")
+        rps = drive(url, args.seconds, args.concurrency, submit)
+        print(f"{name:<12} {rps:>10.1f} req/s  rss={process_tree_rss_mb(server.pid):>8.1f}MB"
+              f"  pss={process_tree_pss_mb(server.pid):>8.1f}MB")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--path', help='GET this path instead of submitting images (e.g. /api/leaderboard)')
+    args = parser.parse_args()
+
+    dev_server = [sys.executable, '-c',
+                  f"from run import app; app.run(host='127.0.0.1', port={PORT}, debug=True)"]
+    run('app.run', dev_server, args)
+    run('gunicorn', [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'], args)
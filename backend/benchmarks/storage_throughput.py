@@ -0,0 +1,44 @@
+"""Compare write/read throughput of the in-memory and SQLite storage backends.
+
+Run from the backend directory:
+    python -m benchmarks.storage_throughput
+"""
+import os
+import tempfile
+import time
+from app.services.storage import StorageService
+from app.services.sqlite_storage import SQLiteStorageService
+
+USERS = 1000
+SUBMISSIONS = 20000
+BATCH_SIZE = 100
+
+
+def make_entries():
+    return [(f"user{i % USERS}", f"uploads/img_{i}.jpg", 10) for i in range(SUBMISSIONS)]
+
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {count / elapsed:>12.0f} ops/s  ({elapsed:.2f}s)")
+
+
+def run(service, name, entries):
+    timed(f"{name} add_submission", len(entries), lambda: [service.add_submission(*e) for e in entries])
+    if hasattr(service, 'add_submissions'):
+        batches = [entries[i:i + BATCH_SIZE] for i in range(0, len(entries), BATCH_SIZE)]
+        timed(f"{name} add_submissions (batch={BATCH_SIZE})", len(entries),
+              lambda: [service.add_submissions(batch) for batch in batches])
+    timed(f"{name} get_leaderboard", 1000, lambda: [service.get_leaderboard(10) for _ in range(1000)])
+    timed(f"{name} get_user_profile", 1000,
+          lambda: [service.get_user_profile(f"user{i % USERS}") for i in range(1000)])
+
+
+if __name__ == "__main__":
+    entries = make_entries()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['UPLOAD_FOLDER'] = tmp
+        run(StorageService(), 'memory', entries)
+        run(SQLiteStorageService(os.path.join(tmp, 'bench.db')), 'sqlite', entries)
@@ -0,0 +1,85 @@
+"""Throughput and tail latency of MobileNetV2 inference across TensorFlow thread budgets.
+
+Simulates a box running several web workers: for each budget, WORKERS fresh
+processes load the model through the shared registry (which applies
+TF_INTRA_OP_THREADS / TF_INTER_OP_THREADS) and serve single-image forward
+passes from REQUEST_THREADS threads each for DURATION seconds. Reports
+aggregate images per second and p50/p99 latency.
+
+Run from the backend directory (after python manage.py prepare-artifacts):
+    python -m benchmarks.thread_budget [workers]
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+DURATION = 20
+REQUEST_THREADS = 4
+
+
+def budgets(workers):
+    cores = os.cpu_count() or 1
+    return [
+        ('tf default', 0, 0),  # Every worker's pools take every core
+        ('per worker', -1, -1),  # thread_budget(): cores / workers
+        ('single', 1, 1),
+        ('2x cores', max(1, 2 * cores // workers), 2),
+    ]
+
+
+def worker(intra, inter, start_at, results):
+    os.environ['TF_INTRA_OP_THREADS'] = str(intra)
+    os.environ['TF_INTER_OP_THREADS'] = str(inter)
+    from app.services.model_registry import model_registry, thread_budget
+    model = model_registry.get('mobilenet_v2')
+    model.predict_on_batch(np.zeros((1, 224, 224, 3), dtype=np.float32))  # Warm up
+    latencies = []
+    lock = threading.Lock()
+
+    def serve():
+        inputs = np.random.uniform(-1, 1, (1, 224, 224, 3)).astype(np.float32)
+        while time.time() < start_at:
+            time.sleep(0.01)
+        while time.time() < start_at + DURATION:
+            started = time.perf_counter()
+            model.predict_on_batch(inputs)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=serve) for _ in range(REQUEST_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put((thread_budget(), latencies))
+
+
+def run(workers, intra, inter):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    start_at = time.time() + 30  # Time for every worker to import TensorFlow and load the model
+    processes = [context.Process(target=worker, args=(intra, inter, start_at, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    latencies, applied = [], None
+    for _ in processes:
+        applied, worker_latencies = results.get()
+        latencies.extend(worker_latencies)
+    for process in processes:
+        process.join()
+    latencies = np.array(latencies) * 1e3
+    return applied, len(latencies) / DURATION, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    print(f"{workers} workers x {REQUEST_THREADS} request threads on {os.cpu_count()} cores")
+    print(f"{'budget':>12} {'intra/inter':>12} {'images/s':>10} {'p50':>10} {'p99':>10}")
+    for name, intra, inter in budgets(workers):
+        os.environ['WEB_WORKERS'] = str(workers)
+        (applied_intra, applied_inter), throughput, p50, p99 = run(workers, intra, inter)
+        print(f"{name:>12} {f'{applied_intra}/{applied_inter}':>12} {throughput:>10.1f} {p50:>8.1f}ms {p99:>8.1f}ms")
@@ -7,7 +7,12 @@ load_dotenv()
 class Config:
     # Flask settings
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
-    DEBUG = True
+    DEBUG = os.getenv('FLASK_DEBUG', 'true').lower() == 'true'
+    
+    # Logging settings
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # 'json' or 'text'
+    LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '0.01'))  # Fraction of requests keeping DEBUG logs
     
     # JWT settings
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key')
@@ -22,21 +27,96 @@ class Config:
     CORS_METHODS = ['GET', 'POST', 'OPTIONS']
     
     # Upload settings
-    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
-    MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # 5MB
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', str(5 * 1024 * 1024)))  # 5MB
+    MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', str(50 * 1000 * 1000)))  # Rejects decompression bombs
+    MAX_IMAGE_HEADER_BYTES = 1024 * 1024  # Give up looking for the JPEG frame header after 1MB
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
     
     # Database settings
     DATABASE_URI = os.getenv('DATABASE_URI', 'sqlite:///mosquito_hunter.db')
+    MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
+    MONGO_DB_NAME = os.getenv('MONGO_DB_NAME', 'mosquito_coin')
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '50'))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '0'))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '2000'))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '3000'))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '10000'))
+    MIGRATE_ON_STARTUP = os.getenv('MIGRATE_ON_STARTUP', 'false').lower() == 'true'
+    LEDGER_CHECKPOINT_INTERVAL = int(os.getenv('LEDGER_CHECKPOINT_INTERVAL', '100'))  # tail entries before re-checkpointing
+    LEDGER_SETTLE_SECONDS = int(os.getenv('LEDGER_SETTLE_SECONDS', '60'))
+    LEDGER_RECONCILE_INTERVAL = int(os.getenv('LEDGER_RECONCILE_INTERVAL', '300'))
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'memory')  # 'memory' or 'sqlite'
+    SQLITE_PATH = os.getenv('SQLITE_PATH', 'mosquito_hunter.db')
     
     # Verification settings
     VERIFICATION_THRESHOLD = 0.7
+    VERIFICATION_MODE = os.getenv('VERIFICATION_MODE', 'full')  # 'full' frame or 'tiled' (frame + salient crops)
+    TILE_SCALES = [float(s) for s in os.getenv('TILE_SCALES', '0.25,0.5').split(',')]  # Crop side / short side
+    MAX_TILES = int(os.getenv('MAX_TILES', '7'))  # Crops per image, on top of the whole frame
+    TILE_BATCH_SIZE = int(os.getenv('TILE_BATCH_SIZE', '4'))  # Crops per forward pass
+    TILE_CONFIDENCE_THRESHOLD = float(os.getenv('TILE_CONFIDENCE_THRESHOLD', '0.3'))  # Stop early at this score
+    SALIENCY_SIZE = 256  # Long side of the copy the saliency pass runs on
+    MODEL_ARTIFACTS_DIR = os.getenv('MODEL_ARTIFACTS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_artifacts'))
+    MODEL_ARTIFACTS_VERSION = os.getenv('MODEL_ARTIFACTS_VERSION', '')  # Pin a bundle; empty = the CURRENT one
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', str(min(4, os.cpu_count() or 1))))  # Same default as gunicorn.conf.py
+    TF_INTRA_OP_THREADS = int(os.getenv('TF_INTRA_OP_THREADS', '-1'))  # -1 = cores / WEB_WORKERS; 0 = TensorFlow default
+    TF_INTER_OP_THREADS = int(os.getenv('TF_INTER_OP_THREADS', '-1'))  # -1 = 1, or 2 with 4+ intra-op threads
     MAX_SUBMISSIONS_PER_DAY = 5
+    MAX_SUBMISSIONS_PER_DAY_PER_IP = int(os.getenv('MAX_SUBMISSIONS_PER_DAY_PER_IP', '50'))
+    MAX_BATCH_SUBMISSIONS = int(os.getenv('MAX_BATCH_SUBMISSIONS', '5'))  # Images per /api/submit/batch request; counts against the quotas
+    # Whole-request cap for /api/submit/batch: every file at its own cap plus room for the form fields
+    MAX_BATCH_CONTENT_LENGTH = MAX_BATCH_SUBMISSIONS * MAX_CONTENT_LENGTH + 64 * 1024
+    DECODE_WORKERS = int(os.getenv('DECODE_WORKERS', '4'))
+    QUOTA_STORE_PATH = os.getenv('QUOTA_STORE_PATH', '')  # SQLite file shared by workers; empty = per-process
+    # Reverse proxies in front of the app whose X-Forwarded-For is trusted (0 = use the socket address)
+    TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
 
     AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
     AWS_BUCKET_NAME = os.environ.get('AWS_BUCKET_NAME')
+    AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL', '')  # Set for S3-compatible stores (MinIO, moto server)
+
+    # Background uploader settings
+    UPLOAD_STAGING_DIR = os.getenv('UPLOAD_STAGING_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'upload_staging'))
+    UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '4'))
+    UPLOAD_QUEUE_SIZE = int(os.getenv('UPLOAD_QUEUE_SIZE', '1000'))
+    UPLOAD_MAX_RETRIES = int(os.getenv('UPLOAD_MAX_RETRIES', '5'))
+    # Staged uploads that failed permanently or ran out of retries are moved here
+    UPLOAD_DEAD_LETTER_DIR = os.getenv('UPLOAD_DEAD_LETTER_DIR', os.path.join(UPLOAD_STAGING_DIR, 'dead'))
+    # Files below the threshold go up in a single PUT. With the default 5MB
+    # MAX_CONTENT_LENGTH every upload does; multipart (S3 parts are at least
+    # 5MB) only pays off if the upload limit is raised past the threshold.
+    MULTIPART_THRESHOLD_MB = int(os.getenv('MULTIPART_THRESHOLD_MB', '8'))
+    MULTIPART_CHUNK_MB = int(os.getenv('MULTIPART_CHUNK_MB', '8'))
+    MULTIPART_CONCURRENCY = int(os.getenv('MULTIPART_CONCURRENCY', '4'))
+
+    # Direct-to-S3 upload settings
+    PRESIGNED_URL_EXPIRES = int(os.getenv('PRESIGNED_URL_EXPIRES', '900'))  # seconds
+    DIRECT_UPLOAD_CONTENT_TYPES = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/gif': 'gif'}
+    VERIFICATION_WORKERS = int(os.getenv('VERIFICATION_WORKERS', '2'))
+
+    # Resized derivatives served to the profile and submission views
+    DERIVATIVE_WIDTHS = [int(w) for w in os.getenv('DERIVATIVE_WIDTHS', '160,480,1080').split(',')]
+    MEDIA_MAX_AGE = int(os.getenv('MEDIA_MAX_AGE', str(365 * 24 * 60 * 60)))  # seconds
+    USE_X_SENDFILE = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'  # Let the front proxy send media files
+
+    # Server-sent events
+    EVENT_BROKER_PATH = os.getenv('EVENT_BROKER_PATH', '')  # SQLite file shared by workers; empty = per-process
+    EVENT_POLL_INTERVAL_MS = int(os.getenv('EVENT_POLL_INTERVAL_MS', '200'))
+    SSE_HEARTBEAT_SECONDS = int(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
+    SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', '3000'))  # Client reconnect delay
+    SSE_BUFFER_SIZE = int(os.getenv('SSE_BUFFER_SIZE', '100'))  # Events queued per connection before it is dropped
+    SSE_REPLAY_SIZE = int(os.getenv('SSE_REPLAY_SIZE', '200'))  # Recent events kept per user (in-process broker)
+    SSE_REPLAY_SECONDS = int(os.getenv('SSE_REPLAY_SECONDS', '600'))  # Event retention (SQLite broker)
+    SSE_TOKEN_SECONDS = int(os.getenv('SSE_TOKEN_SECONDS', '60'))  # Lifetime of the stream token passed in the /events URL
+    # Open streams per process; each holds a request thread under gthread. 0 = no limit (the gevent events server)
+    SSE_MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', '2'))
+
+    # Response compression
+    COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))  # Smaller bodies are sent as-is
+    GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+    BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))  # 0-11; mid levels suit dynamic responses
     
     # Upload folder configuration
-    UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size 
\ No newline at end of file
+    UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads') 
\ No newline at end of file
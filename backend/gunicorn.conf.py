@@ -0,0 +1,80 @@
+"""Gunicorn settings for production serving.
+
+Run from the backend directory:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Send SIGHUP to the master for a graceful reload: the master re-opens the
+current model bundle, new workers import the code and build their models from
+it, old ones finish their in-flight requests first.
+"""
+import multiprocessing
+import os
+import sys
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+
+# TensorFlow isn't fork-safe (its thread pools don't survive fork), so the
+# master never imports the app or TensorFlow. It only verifies the model
+# bundle and memory-maps its weights (numpy only, see on_starting); workers
+# inherit those mappings and build their TensorFlow models from them.
+preload_app = False
+
+workers = int(os.getenv('WEB_WORKERS', str(min(4, multiprocessing.cpu_count()))))
+threads = int(os.getenv('WEB_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Recycle workers to bound slow leaks; jitter avoids restarting all at once
+max_requests = int(os.getenv('MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('MAX_REQUESTS_JITTER', '200'))
+
+timeout = int(os.getenv('WORKER_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+loglevel = os.getenv('LOG_LEVEL', 'info')
+accesslog = '-'
+# The default format logs the full request line; leave query strings (which
+# can carry the /events stream token) out of the access log
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+
+
+def _map_model_weights():
+    from app.services.model_artifacts import get_artifacts
+    artifacts = get_artifacts()
+    artifacts.map_weights()
+    return artifacts
+
+
+def on_starting(server):
+    # Checksums are verified once here instead of in every worker, and the
+    # weights pages are shared by every worker through the page cache
+    artifacts = _map_model_weights()
+    server.log.info("Mapped model artifacts %s", artifacts.version)
+
+
+def on_reload(server):
+    # Workers fork from the master, so drop the app modules it imported (they
+    # would pin old code) and map the bundle CURRENT names now
+    for name in list(sys.modules):
+        if name in ('app', 'config') or name.startswith('app.'):
+            del sys.modules[name]
+    artifacts = _map_model_weights()
+    server.log.info("Re-mapped model artifacts %s", artifacts.version)
+
+
+def post_fork(server, worker):
+    server.log.info("Worker spawned (pid: %s)", worker.pid)
+
+
+def post_worker_init(worker):
+    # Load the models (and apply the TensorFlow thread budget) before the
+    # worker takes requests; a missing or corrupted bundle stops it here.
+    from app.services.model_registry import model_registry
+    model_registry.warm_up()
+
+
+def worker_exit(server, worker):
+    # Commit rewards still waiting in the write-behind buffer before the
+    # worker goes (graceful shutdown or max_requests recycle)
+    from app.database import stop_reward_buffer
+    stop_reward_buffer()
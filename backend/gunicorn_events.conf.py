@@ -0,0 +1,26 @@
+"""Gunicorn settings for the server-sent events stream.
+
+An open /api/images/events stream would hold one of the app's gthread
+request threads for its whole life, so streams are served by a separate
+gunicorn with gevent workers. Route /api/images/events to it at the proxy
+and point both servers at the same EVENT_BROKER_PATH:
+    gunicorn -c gunicorn_events.conf.py wsgi:app
+"""
+import os
+
+bind = os.getenv('EVENTS_BIND', '0.0.0.0:5001')
+
+workers = int(os.getenv('EVENTS_WORKERS', '1'))
+worker_class = 'gevent'
+worker_connections = int(os.getenv('EVENTS_WORKER_CONNECTIONS', '1000'))
+# Idle streams cost a greenlet, not a thread, so don't cap them per process
+raw_env = ['SSE_MAX_STREAMS=0']
+
+timeout = int(os.getenv('WORKER_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+loglevel = os.getenv('LOG_LEVEL', 'info')
+accesslog = '-'
+# Stream tokens travel in the query string; keep them out of the access log
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(f)s" "%(a)s"'
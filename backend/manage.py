@@ -0,0 +1,171 @@
+import argparse
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def migrate(args):
+    from app.database import run_migrations
+    applied = run_migrations()
+    logger.info("Applied %s migrations: %s", len(applied), ', '.join(applied) or 'none pending')
+
+
+def rebuild_leaderboard(args):
+    from app.database import rebuild_leaderboard_stats
+    updated = rebuild_leaderboard_stats()
+    logger.info("Corrected verified_count for %s users", updated)
+
+
+def check_leaderboard(args):
+    from app.database import check_leaderboard_stats
+    mismatches = check_leaderboard_stats()
+    for mismatch in mismatches:
+        logger.warning(
+            "%s (%s): stored=%s expected=%s",
+            mismatch['username'], mismatch['user_id'], mismatch['stored'], mismatch['expected']
+        )
+    logger.info("%s inconsistent users", len(mismatches))
+    return 1 if mismatches else 0
+
+
+def check_query_plans(args):
+    from app.database import check_page_query_plans
+    plans = check_page_query_plans(args.user_id)
+    for name, covered in plans.items():
+        logger.info("%s: %s", name, 'covered' if covered else 'NOT covered')
+    return 0 if all(plans.values()) else 1
+
+
+def reconcile_ledger(args):
+    from app.ledger import reconcile_balances, LedgerReconciler
+    if args.watch:
+        reconciler = LedgerReconciler(args.interval).start()
+        try:
+            reconciler.join()
+        except KeyboardInterrupt:
+            reconciler.stop()
+        return 0
+    drifts = reconcile_balances()
+    for drift in drifts:
+        logger.warning(
+            "%s: coins=%s ledger=%s drift=%s",
+            drift['user_id'], drift['stored_balance'], drift['ledger_balance'], drift['drift']
+        )
+    logger.info("%s users with ledger drift", len(drifts))
+    return 1 if drifts else 0
+
+
+def migrate_uploads(args):
+    from app.services.storage import storage_service
+    from app.services.blob_store import migrate_flat_uploads
+    moved = migrate_flat_uploads(storage_service.blob_store, dry_run=args.dry_run)
+    unique = len(set(moved.values()))
+    if args.dry_run:
+        logger.info("Would move %s files into %s blobs", len(moved), unique)
+        return 0
+    storage_service.rewrite_image_paths(moved)
+    logger.info("Moved %s files into %s blobs (%s duplicates removed)", len(moved), unique, len(moved) - unique)
+
+
+def reverify(args):
+    from app.reverify import reverify_images, write_parquet
+    summary = reverify_images(
+        args.output,
+        batch_size=args.batch_size,
+        readers=args.readers,
+        apply=args.apply,
+        limit=args.limit,
+        restart=args.restart
+    )
+    if args.apply:
+        logger.info("Re-verified %s images in %.0fs, %s verdicts changed",
+                    summary['processed'], summary['seconds'], summary['changed'])
+    else:
+        logger.info("Re-verified %s images in %.0fs", summary['processed'], summary['seconds'])
+    if args.parquet:
+        write_parquet(args.output, args.parquet)
+        logger.info("Wrote %s", args.parquet)
+
+
+def prepare_artifacts(args):
+    from config import Config
+    from app.services.model_artifacts import build_bundle, ModelArtifacts
+    path = build_bundle(
+        args.output or Config.MODEL_ARTIFACTS_DIR,
+        version=args.version,
+        mobilenet_weights=args.mobilenet_weights,
+        class_index=args.class_index,
+        mosquito_model=args.mosquito_model
+    )
+    # Re-open the bundle the way the app does, checksums included
+    artifacts = ModelArtifacts(os.path.dirname(path), os.path.basename(path))
+    logger.info("Prepared model artifacts %s: %s", artifacts.version, ', '.join(artifacts.manifest['files']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mosquito Hunter maintenance commands')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser(
+        'migrate', help='Apply pending database migrations (once per deployment)'
+    ).set_defaults(func=migrate)
+    commands.add_parser(
+        'rebuild-leaderboard', help='Backfill users.verified_count from submissions'
+    ).set_defaults(func=rebuild_leaderboard)
+    commands.add_parser(
+        'check-leaderboard', help='Report users whose verified_count disagrees with submissions'
+    ).set_defaults(func=check_leaderboard)
+
+    plans = commands.add_parser(
+        'check-query-plans', help='Verify the history page queries are served from their indexes'
+    )
+    plans.add_argument('user_id', help='User id to run the sample queries for')
+    plans.set_defaults(func=check_query_plans)
+
+    reconcile = commands.add_parser(
+        'reconcile-ledger', help='Report users whose coins disagree with the transaction ledger'
+    )
+    reconcile.add_argument('--watch', action='store_true', help='Keep reconciling in the background')
+    reconcile.add_argument('--interval', type=int, default=None, help='Seconds between runs with --watch')
+    reconcile.set_defaults(func=reconcile_ledger)
+
+    uploads = commands.add_parser(
+        'migrate-uploads', help='Move the flat uploads/ directory into the content-addressed layout'
+    )
+    uploads.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+    uploads.set_defaults(func=migrate_uploads)
+
+    rescore = commands.add_parser(
+        'reverify', help='Re-score every stored image (MongoDB images and storage submissions) with the current model (resumable)'
+    )
+    rescore.add_argument('--output', default='reverify.jsonl', help='JSONL results file; its .checkpoint sits next to it')
+    rescore.add_argument('--parquet', help='Also convert the results to this Parquet file (needs pyarrow)')
+    rescore.add_argument('--batch-size', type=int, default=64, help='Images per forward pass')
+    rescore.add_argument('--readers', type=int, default=16, help='Threads fetching and decoding images')
+    rescore.add_argument('--limit', type=int, help='Stop after this many images')
+    rescore.add_argument('--apply', action='store_true', help='Write changed verdicts and coin adjustments back')
+    rescore.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start over')
+    rescore.set_defaults(func=reverify)
+
+    artifacts = commands.add_parser(
+        'prepare-artifacts', help='Bundle model weights and the class index for offline startup'
+    )
+    artifacts.add_argument('--output', help='Artifact directory (default: MODEL_ARTIFACTS_DIR)')
+    artifacts.add_argument('--version', help='Bundle version name (default: UTC timestamp)')
+    artifacts.add_argument('--mobilenet-weights', help='Local MobileNetV2 ImageNet .h5 weights instead of downloading')
+    artifacts.add_argument('--class-index', help='Local imagenet_class_index.json instead of downloading')
+    artifacts.add_argument(
+        '--mosquito-model', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'models', 'mosquito_model.h5'),
+        help='Mosquito classifier to include, if it exists'
+    )
+    artifacts.set_defaults(func=prepare_artifacts)
+
+    args = parser.parse_args()
+    from app.log_setup import configure_logging
+    configure_logging()
+    return args.func(args) or 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,11 +1,6 @@
 from app import create_app
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 app = create_app()
@@ -15,5 +10,5 @@ if __name__ == '__main__':
         logger.info("Starting Mosquito Hunter application")
         app.run(host='0.0.0.0', port=5000, debug=True)
     except Exception as e:
-        logger.error(f"Error starting application: {str(e)}")
+        logger.error("Error starting application: %s", e)
         raise 
\ No newline at end of file
@@ -0,0 +1,93 @@
+import io
+import os
+import tempfile
+
+# Module-level singletons read these at import, so set them before any app import
+os.environ.setdefault('UPLOAD_FOLDER', tempfile.mkdtemp(prefix='mosquito-uploads-'))
+os.environ.setdefault('UPLOAD_STAGING_DIR', tempfile.mkdtemp(prefix='mosquito-staging-'))
+os.environ.setdefault('LOG_FORMAT', 'text')
+os.environ.setdefault('FLASK_DEBUG', 'false')
+
+import boto3
+import mongomock
+import numpy as np
+import pytest
+from moto import mock_aws
+from PIL import Image
+
+
+@pytest.fixture
+def app():
+    from app import create_app
+    app = create_app()
+    app.testing = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """Point app.database at an in-memory mongomock client."""
+    from app import database
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(database, '_client', client)
+    return client[database.Config.MONGO_DB_NAME]
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """A moto S3 stand-in with a 'kills' bucket, used as the app's S3 client."""
+    from app.services import uploader
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket='kills')
+        monkeypatch.setattr(uploader, '_client', client)
+        yield client
+
+
+class FakeMobileNet:
+    """Stands in for MobileNetV2: every image scores as a mosquito net."""
+
+    def predict_on_batch(self, batch):
+        predictions = np.zeros((len(batch), 1000), dtype=np.float32)
+        predictions[:, 0] = 0.9
+        return predictions
+
+
+class RejectingModel:
+    """Scores every image as not a mosquito."""
+
+    def predict_on_batch(self, batch):
+        return np.zeros((len(batch), 1000), dtype=np.float32)
+
+
+class FakeArtifacts:
+    def decode_predictions(self, predictions, top=5):
+        return [[('n03794056', 'mosquito_net', float(scores[0]))] for scores in predictions]
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """Replace the bundled models so verification runs without TensorFlow."""
+    from app.services import image_verification
+    monkeypatch.setattr(image_verification, 'get_model', FakeMobileNet)
+    monkeypatch.setattr(image_verification, 'get_artifacts', FakeArtifacts)
+    monkeypatch.setattr(image_verification, 'image_hashes', {})
+
+
+def make_image(size=(320, 240), fmt='JPEG', seed=0):
+    """A textured test image (bright and contrasty enough to pass quality checks)."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(40, 220, size[0], dtype=np.uint8)
+    pixels = np.stack([np.tile(x, (size[1], 1))] * 3, axis=-1)
+    pixels[::8] = rng.integers(0, 255, (pixels[::8].shape), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, fmt)
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,64 @@
+import os
+
+from config import Config
+from app.services.blob_store import BlobStore, migrate_flat_uploads
+from app.services.derivatives import derivative_path, generate_derivatives
+from tests.conftest import make_image
+
+
+def test_identical_bytes_are_stored_once_and_refcounted(tmp_path):
+    store = BlobStore(str(tmp_path))
+    first = store.put(make_image(seed=1), 'JPEG')
+    second = store.put(make_image(seed=1), 'jpg')
+    other = store.put(make_image(seed=2), 'jpg')
+
+    assert first == second != other
+    assert first.endswith('.jpg')
+    assert (store.refcount(first), store.refcount(other)) == (2, 1)
+    assert os.listdir(store.tmp_dir) == []
+
+    assert store.release(first) is False
+    assert os.path.exists(first) and store.refcount(first) == 1
+    assert store.release(first) is True
+    assert not os.path.exists(first) and store.refcount(first) == 0
+    assert os.path.exists(other)
+
+
+def test_last_release_deletes_derivatives_and_claim(tmp_path):
+    store = BlobStore(str(tmp_path))
+    path = store.put(make_image(seed=3), 'jpg')
+    generated = [derivative for formats in generate_derivatives(path, path).values() for derivative in formats.values()]
+    digest = os.path.splitext(os.path.basename(path))[0]
+    assert generated and all(os.path.exists(derivative) for derivative in generated)
+    assert store.claim([digest]) == [digest]
+
+    store.release(path)
+
+    assert not any(os.path.exists(derivative) for derivative in generated)
+    assert os.listdir(os.path.dirname(path)) == []
+    assert store.claim([digest]) == [digest]  # The claim went with the blob
+
+
+def test_migrate_flat_uploads_merges_duplicates(tmp_path):
+    root = str(tmp_path)
+    store = BlobStore(root)
+    image = make_image(seed=4).getvalue()
+    for name, data in (('a.jpg', image), ('b.JPEG', image), ('c.jpg', make_image(seed=5).getvalue())):
+        with open(os.path.join(root, name), 'wb') as f:
+            f.write(data)
+    width = Config.DERIVATIVE_WIDTHS[0]
+    with open(derivative_path(os.path.join(root, 'a.jpg'), width, 'webp'), 'wb') as f:
+        f.write(b'derivative')
+
+    planned = migrate_flat_uploads(store, dry_run=True)
+    assert os.path.exists(os.path.join(root, 'a.jpg'))
+    moved = migrate_flat_uploads(store)
+
+    assert moved == planned
+    a, b, c = (moved[os.path.join(root, name)] for name in ('a.jpg', 'b.JPEG', 'c.jpg'))
+    assert a == b != c
+    assert (store.refcount(a), store.refcount(c)) == (2, 1)
+    assert os.path.exists(derivative_path(a, width, 'webp'))
+    # Only the blob index is left at the top level
+    assert [name for name in os.listdir(root)
+            if os.path.isfile(os.path.join(root, name)) and not name.startswith('blobs.db')] == []
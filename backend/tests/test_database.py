@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo.errors import ConnectionFailure
+
+from app import database
+
+
+def test_rebuild_leaderboard_stats_fixes_only_drifted_users(mongo):
+    alice = mongo.users.insert_one({'username': 'alice', 'verified_count': 0}).inserted_id
+    bob = mongo.users.insert_one({'username': 'bob', 'verified_count': 5}).inserted_id
+    carol = mongo.users.insert_one({'username': 'carol', 'verified_count': 1}).inserted_id
+    mongo.submissions.insert_many([
+        {'user_id': alice, 'verified': True},
+        {'user_id': alice, 'verified': True},
+        {'user_id': alice, 'verified': False},
+        {'user_id': carol, 'verified': True},
+    ])
+
+    assert database.rebuild_leaderboard_stats() == 2  # alice under-counted, bob over-counted
+
+    counts = {user['username']: user['verified_count'] for user in mongo.users.find()}
+    assert counts == {'alice': 2, 'bob': 0, 'carol': 1}
+    assert database.check_leaderboard_stats() == []
+    assert database.rebuild_leaderboard_stats() == 0
+
+
+def test_reward_retry_after_partial_write_credits_once(mongo):
+    mongo.users.insert_one({'_id': 'alice', 'coins': 0})
+    rewards = [database._build_reward('alice', f'/uploads/{n}.jpg', 10, 'kill') for n in range(2)]
+
+    database._write_rewards(rewards)
+    database._write_rewards(rewards)  # A retry of a batch that had already landed
+
+    assert mongo.images.count_documents({}) == 2
+    assert mongo.transactions.count_documents({'user_id': 'alice'}) == 2
+    assert mongo.users.find_one({'_id': 'alice'})['coins'] == 20
+
+
+def test_reward_buffer_dead_letters_poison_reward(mongo, monkeypatch, tmp_path):
+    mongo.users.insert_one({'_id': 'alice', 'coins': 0})
+    write_rewards = database._write_rewards
+
+    def fail_on_poison(rewards, session=None):
+        if any(reward['transaction']['description'] == 'poison' for reward in rewards):
+            raise ValueError('bad document')
+        write_rewards(rewards, session=session)
+
+    monkeypatch.setattr(database, '_write_rewards', fail_on_poison)
+    dead_letters = tmp_path / 'dead.jsonl'
+    buffer = database.RewardWriteBuffer(interval_ms=60000, max_attempts=2, retry_max_ms=0,
+                                        dead_letter_path=str(dead_letters))
+    buffer.add(database._build_reward('alice', '/uploads/good.jpg', 10, 'kill'))
+    buffer.add(database._build_reward('alice', '/uploads/bad.jpg', 10, 'poison'))
+
+    buffer.flush()  # The good reward is split out and committed
+    assert mongo.users.find_one({'_id': 'alice'})['coins'] == 10
+    assert not dead_letters.exists()
+
+    buffer.flush()  # Second failure of the poison reward gives up on it
+    assert dead_letters.read_text().count('\n') == 1
+    assert 'bad.jpg' in dead_letters.read_text()
+    buffer.stop()
+    assert mongo.users.find_one({'_id': 'alice'})['coins'] == 10
+
+
+def test_reward_buffer_gives_up_on_an_unreachable_server(mongo, monkeypatch, tmp_path):
+    def unreachable(rewards, session=None):
+        raise ConnectionFailure('no servers')
+
+    monkeypatch.setattr(database, '_write_rewards', unreachable)
+    dead_letters = tmp_path / 'dead.jsonl'
+    buffer = database.RewardWriteBuffer(interval_ms=60000, max_wait_ms=0, max_pending=2,
+                                        dead_letter_path=str(dead_letters))
+    for n in range(3):
+        buffer.add(database._build_reward('alice', f'/uploads/{n}.jpg', 10, 'kill'))
+    assert dead_letters.read_text().count('\n') == 1  # The third spilled rather than queueing
+
+    buffer.flush()  # Out of waiting time after the first connection failure
+    assert dead_letters.read_text().count('\n') == 3
+    assert buffer._pending == []
+    buffer.stop()
+
+
+def test_verification_moves_user_up_the_leaderboard(mongo):
+    mongo.users.insert_many([
+        {'_id': 'alice', 'username': 'alice', 'coins': 0, 'verified_count': 1},
+        {'_id': 'bob', 'username': 'bob', 'coins': 0, 'verified_count': 0},
+    ])
+    assert [row['username'] for row in database.get_leaderboard()] == ['alice']
+
+    for n in range(2):
+        database.commit_reward('bob', f'/uploads/bob{n}.jpg', 10, 'Mosquito kill verified')
+
+    assert database.get_leaderboard() == [
+        {'username': 'bob', 'submission_count': 2},
+        {'username': 'alice', 'submission_count': 1},
+    ]
+    # bob's submissions were written alongside; alice's count was seeded without any
+    assert [mismatch['username'] for mismatch in database.check_leaderboard_stats()] == ['alice']
+
+
+def test_cursor_round_trips():
+    doc = {'_id': ObjectId(), 'submitted_at': datetime(2024, 5, 1, 12, 30, 15, 123456)}
+
+    assert database.decode_cursor(database.encode_cursor(doc, 'submitted_at')) == (doc['submitted_at'], doc['_id'])
+
+
+def test_pages_split_equal_timestamps_without_gaps_or_repeats(mongo):
+    same_time = datetime(2024, 5, 1, 12, 0)
+    mongo.submissions.insert_many(
+        [{'user_id': 'alice', 'image_path': f'{n}.jpg', 'verified': True, 'submitted_at': same_time}
+         for n in range(5)]
+        + [{'user_id': 'alice', 'image_path': 'newer.jpg', 'verified': True,
+            'submitted_at': same_time + timedelta(seconds=1)},
+           {'user_id': 'bob', 'image_path': 'other.jpg', 'verified': True, 'submitted_at': same_time}]
+    )
+
+    pages, before = [], None
+    while True:
+        page = database.get_user_submissions('alice', limit=2, before=before)
+        if not page:
+            break
+        pages.append([doc['image_path'] for doc in page])
+        before = database.decode_cursor(database.encode_cursor(page[-1], 'submitted_at'))
+
+    assert [len(page) for page in pages] == [2, 2, 2]
+    assert pages[0][0] == 'newer.jpg'
+    assert sorted(path for page in pages for path in page) == sorted(['newer.jpg'] + [f'{n}.jpg' for n in range(5)])
+    # Within one timestamp, pages run newest _id first
+    assert [path for page in pages for path in page][1:] == [f'{n}.jpg' for n in reversed(range(5))]
@@ -0,0 +1,46 @@
+from flask_jwt_extended import create_access_token
+from app.services.events import event_bus
+from app.services.storage import storage_service
+
+
+def auth_header(app, username):
+    with app.app_context():
+        return {'Authorization': f"Bearer {create_access_token(identity=username)}"}
+
+
+def test_stream_url_accepts_only_stream_tokens(app, client):
+    headers = auth_header(app, 'alice')
+
+    with app.app_context():
+        login_token = create_access_token(identity='alice')
+    assert client.get(f'/api/images/events?jwt={login_token}').status_code == 401
+
+    stream_token = client.post('/api/images/events/token', headers=headers).get_json()['token']
+    response = client.get(f'/api/images/events?jwt={stream_token}')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    response.close()
+
+    # A stream token leaked from a URL opens nothing else
+    assert client.post('/api/images/events/token',
+                       headers={'Authorization': f'Bearer {stream_token}'}).status_code == 400
+
+
+def test_submissions_notify_only_the_awarded_user():
+    alice = event_bus.subscribe('events-alice')
+    bob = event_bus.subscribe('events-bob')
+    try:
+        storage_service.add_submissions([('events-bob', 'b.jpg', 10)])
+        bob.get(1)  # Drain bob's own award
+        bob.get(1)
+        storage_service.add_submissions([('events-alice', 'a.jpg', 30)])
+
+        coins = alice.get(1)
+        assert coins['type'] == 'coins'
+        assert '"awarded":30' in coins['data'] and '"balance":30' in coins['data']
+        assert alice.get(1)['type'] == 'rank'
+        # bob was passed but isn't pushed an event
+        assert bob.get(0.05) is None
+    finally:
+        event_bus.unsubscribe(alice)
+        event_bus.unsubscribe(bob)
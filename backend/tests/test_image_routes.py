@@ -0,0 +1,31 @@
+import os
+from app.storage import storage
+from tests.conftest import make_image
+
+
+def test_upload_awards_verified_image(client, mongo, fake_models):
+    response = client.post('/upload', data={'image': (make_image(), 'kill.jpg')},
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body['success'] is True
+    assert body['coins_earned'] == 10
+    assert body['thumbnails']
+
+    # The image and its derivatives were handed to storage together, then released locally
+    uploaded = storage.files[body['image_url']]
+    assert uploaded['derivatives']
+    assert not os.path.exists(uploaded['path'])
+
+    # Reward committed: image, ledger entry and balance
+    assert mongo.images.count_documents({'image_url': body['image_url'], 'coins_awarded': 10}) == 1
+    assert mongo.transactions.count_documents({'user_id': 'test_user', 'amount': 10}) == 1
+
+
+def test_upload_rejects_unsupported_type(client):
+    response = client.post('/upload', data={'image': (make_image(), 'kill.bmp')},
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 400
+    assert response.get_json()['code'] == 'INVALID_TYPE'
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from PIL import Image
+from app.services.image_verification import saliency_boxes
+from app.services.input_buffers import InputBufferPool
+
+
+@pytest.mark.parametrize('size', [(3758, 1877), (1877, 3758), (1001, 333), (4031, 3023), (641, 479)])
+def test_saliency_boxes_stay_inside_odd_aspect_images(size):
+    rng = np.random.default_rng(0)
+    image = Image.fromarray(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8))
+
+    boxes = saliency_boxes(image)
+
+    assert boxes
+    for left, top, right, bottom in boxes:
+        assert 0 <= left < right <= image.width
+        assert 0 <= top < bottom <= image.height
+    # Every box can be cropped straight into a model input
+    with InputBufferPool(len(boxes)).batch() as batch:
+        for box in boxes:
+            batch.add(image, box)
+
+
+def old_mobilenet_preprocess(image):
+    """The removed image_verification.preprocess_image: img_to_array + mobilenet_v2.preprocess_input."""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return np.asarray(image.resize((224, 224)), dtype=np.float32) / 127.5 - 1.0
+
+
+def old_unit_preprocess(image):
+    """The removed VerificationService.preprocess_image: pixels / 255."""
+    return np.array(image.resize((224, 224))) / 255.0
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA', 'L'])
+def test_input_batch_scaling_matches_old_preprocessing(mode):
+    rng = np.random.default_rng(1)
+    image = Image.fromarray(rng.integers(0, 255, (300, 400, 3), dtype=np.uint8)).convert(mode)
+    pool = InputBufferPool(2)
+
+    for _ in range(2):  # The second pass reuses the pooled buffer
+        with pool.batch() as batch:
+            batch.add(image)
+            batch.add(image.resize((224, 224)))
+            np.testing.assert_allclose(batch.view(), [old_mobilenet_preprocess(image)] * 2, rtol=1e-6, atol=1e-6)
+    assert pool.allocated == 1
+
+    rgb = image.convert('RGB')
+    with InputBufferPool(1, scaling='unit').batch() as batch:
+        batch.add(rgb)
+        np.testing.assert_allclose(batch.view()[0], old_unit_preprocess(rgb), rtol=1e-6, atol=1e-6)
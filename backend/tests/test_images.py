@@ -0,0 +1,83 @@
+from flask_jwt_extended import create_access_token
+from config import Config
+from app.routes import image_routes, images
+from tests.conftest import make_image
+
+
+def auth_header(app, username):
+    with app.app_context():
+        return {'Authorization': f"Bearer {create_access_token(identity=username)}"}
+
+
+def test_presign_rejects_non_numeric_size(app, client, s3, monkeypatch):
+    monkeypatch.setattr(Config, 'AWS_BUCKET_NAME', 'kills')
+
+    response = client.post('/api/images/presign', headers=auth_header(app, 'alice'),
+                           json={'content_type': 'image/jpeg', 'size': 'big'})
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid size'}
+
+
+def test_complete_registers_each_object_once(app, client, s3, monkeypatch):
+    monkeypatch.setattr(Config, 'AWS_BUCKET_NAME', 'kills')
+    queued = []
+    monkeypatch.setattr(images, 'queue_verification', queued.append)
+    headers = auth_header(app, 'alice')
+
+    presigned = client.post('/api/images/presign', headers=headers,
+                            json={'content_type': 'image/jpeg', 'size': 1024}).get_json()
+    key = presigned['key']
+    assert key.startswith('users/alice/') and presigned['fields']['key'] == key
+    s3.put_object(Bucket='kills', Key=key, Body=b'\xff\xd8\xff' + b'\0' * 1021, ContentType='image/jpeg')
+
+    first = client.post('/api/images/complete', headers=headers, json={'key': key})
+    retry = client.post('/api/images/complete', headers=headers, json={'key': key})
+
+    assert first.status_code == 201
+    assert retry.status_code == 200
+    assert retry.get_json()['image']['id'] == first.get_json()['image']['id']
+    assert queued == [first.get_json()['image']['id']]
+
+
+def test_complete_rejects_other_users_keys(app, client, s3):
+    response = client.post('/api/images/complete', headers=auth_header(app, 'alice'),
+                           json={'key': 'users/bob/x.jpg'})
+    assert response.status_code == 403
+
+
+class RecordingUploader:
+    def __init__(self):
+        self.keys = []
+
+    def enqueue_fileobj(self, fileobj, key, extra_args=None):
+        self.keys.append(key)
+        return f'https://kills.s3.amazonaws.com/{key}'
+
+    def stats(self):
+        return {'pending': len(self.keys)}
+
+
+def test_uploads_with_the_same_filename_get_distinct_keys(app, client, monkeypatch):
+    uploader = RecordingUploader()
+    monkeypatch.setattr(images, 'get_uploader', lambda: uploader)
+    monkeypatch.setattr(images, 'queue_verification', lambda image_id: None)
+    headers = auth_header(app, 'alice')
+
+    for _ in range(2):
+        response = client.post('/api/images/upload', headers=headers,
+                               data={'image': (make_image(), 'kill.JPG')}, content_type='multipart/form-data')
+        assert response.status_code == 201
+
+    first, second = uploader.keys
+    assert first != second
+    assert first.startswith('users/alice/') and first.endswith('.jpg')
+
+
+def test_uploader_stats_need_a_token(app, client, monkeypatch):
+    monkeypatch.setattr(image_routes, 'get_uploader', RecordingUploader)
+
+    assert client.get('/api/uploader/stats').status_code == 401
+    response = client.get('/api/uploader/stats', headers=auth_header(app, 'alice'))
+    assert response.status_code == 200
+    assert response.get_json()['stats'] == {'pending': 0}
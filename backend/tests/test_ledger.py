@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app import database, ledger
+
+
+def add_entry(mongo, user_id, amount, committed_ago):
+    committed_at = datetime.utcnow() - committed_ago
+    mongo.transactions.insert_one({'user_id': user_id, 'amount': amount, 'committed_at': committed_at})
+
+
+def test_checkpoint_folds_only_settled_entries(mongo):
+    mongo.users.insert_one({'_id': 'alice', 'coins': 35})
+    add_entry(mongo, 'alice', 10, timedelta(hours=2))
+    add_entry(mongo, 'alice', 20, timedelta(hours=1))
+    add_entry(mongo, 'alice', 5, timedelta(seconds=1))
+
+    checkpoint = ledger.checkpoint_balance('alice')
+
+    assert checkpoint['balance'] == 30
+    assert ledger._tail('alice', checkpoint)[0] == 5
+    assert ledger.get_balance('alice') == 35
+    assert ledger.reconcile_balances() == []
+
+
+def test_late_commit_of_an_old_reward_lands_after_the_checkpoint(mongo):
+    mongo.users.insert_one({'_id': 'alice', 'coins': 10})
+    add_entry(mongo, 'alice', 10, timedelta(hours=1))
+    assert ledger.checkpoint_balance('alice')['balance'] == 10
+
+    # Built (and its ObjectId generated) two hours ago, held by write-behind
+    # retries or the dead-letter file, and only committed now
+    reward = database._build_reward('alice', '/uploads/late.jpg', 7, 'kill')
+    reward['transaction']['_id'] = ObjectId.from_datetime(datetime.utcnow() - timedelta(hours=2))
+    database._write_rewards([reward])
+
+    assert ledger.get_balance('alice') == 17
+    assert ledger.audit_balance('alice')['drift'] == 0
+    assert ledger.reconcile_balances() == []
+
+
+def test_reconcile_reports_real_drift(mongo):
+    mongo.users.insert_many([{'_id': 'alice', 'coins': 10}, {'_id': 'bob', 'coins': 99}])
+    add_entry(mongo, 'alice', 10, timedelta(hours=1))
+    add_entry(mongo, 'bob', 40, timedelta(hours=1))
+    ledger.checkpoint_balance('bob')
+    add_entry(mongo, 'bob', 9, timedelta(seconds=1))
+
+    assert ledger.reconcile_balances(batch_size=1) == [
+        {'user_id': 'bob', 'ledger_balance': 49, 'stored_balance': 99, 'drift': 50}
+    ]
+
+
+def test_migration_backfills_commit_order_for_legacy_entries(mongo):
+    old_id = ObjectId.from_datetime(datetime.utcnow() - timedelta(hours=1))
+    mongo.transactions.insert_one({'_id': old_id, 'user_id': 'alice', 'amount': 10})
+    mongo.balance_checkpoints.insert_one({'_id': 'alice', 'balance': 10, 'last_transaction_id': old_id})
+
+    database._migration_0006_ledger_committed_at()
+
+    entry = mongo.transactions.find_one({'_id': old_id})
+    assert entry['committed_at'] == old_id.generation_time.replace(tzinfo=None)
+    assert mongo.balance_checkpoints.find_one({'_id': 'alice'})['last_committed_at'] == entry['committed_at']
+    assert ledger.get_balance('alice') == 10
@@ -0,0 +1,51 @@
+import io
+import time
+import numpy as np
+from PIL import Image
+from config import Config
+from app.services.leaderboard_cache import leaderboard_cache
+from app.services.quota import submission_limiter
+from app.services.verification import verification_service
+from tests.conftest import FakeMobileNet
+
+
+def test_leaderboard_limit_is_clamped(client):
+    leaderboard_cache.clear()
+    for limit in ('0', '-5', '100000'):
+        assert client.get(f'/api/leaderboard?limit={limit}').status_code == 200
+    assert set(leaderboard_cache._snapshots) == {'api:1', 'api:100'}
+
+
+def test_leaderboard_rejects_non_integer_limit(client):
+    response = client.get('/api/leaderboard?limit=ten')
+    assert response.status_code == 400
+    assert response.get_json()['code'] == 'INVALID_LIMIT'
+
+
+def noisy_png(seed):
+    """An incompressible ~3MB PNG, so two of them exceed MAX_CONTENT_LENGTH together."""
+    rng = np.random.default_rng(seed)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 255, (1000, 1000, 3), dtype=np.uint8)).save(buffer, 'PNG')
+    buffer.seek(0)
+    return buffer
+
+
+def test_batch_over_single_request_limit_refunds_rejected_files(client, monkeypatch):
+    monkeypatch.setattr(verification_service, '_model', FakeMobileNet())
+    monkeypatch.setattr(verification_service, '_model_loaded', True)
+    image = noisy_png(1).getvalue()
+    assert 2 * len(image) > Config.MAX_CONTENT_LENGTH
+
+    response = client.post('/api/submit/batch', data={
+        'username': 'batcher',
+        'images': [(io.BytesIO(image), 'a.png'), (io.BytesIO(image), 'b.png')]
+    }, content_type='multipart/form-data', environ_base={'REMOTE_ADDR': '192.0.2.44'})
+
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert [result['success'] for result in body['results']] == [True, False]
+    assert body['results'][1]['code'] == 'DUPLICATE_IMAGE'
+    # The duplicate's charge was given back
+    window = int(time.time() // submission_limiter.window_seconds)
+    assert submission_limiter.store.get('ip:192.0.2.44', window) == 1
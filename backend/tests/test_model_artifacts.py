@@ -0,0 +1,68 @@
+import json
+import os
+import numpy as np
+import pytest
+from app.services.blob_store import hash_file
+from app.services.model_artifacts import ArtifactError, ModelArtifacts, CURRENT, MANIFEST
+
+
+def write_bundle(root, version='v1'):
+    """A minimal bundle (no TensorFlow needed): one model's flat weights and the class index."""
+    path = os.path.join(root, version)
+    os.makedirs(path)
+    tensors = [np.arange(6, dtype=np.float32).reshape(2, 3), np.ones(4, dtype=np.float16)]
+    entries, offset = [], 0
+    with open(os.path.join(path, 'tiny.weights.bin'), 'wb') as f:
+        for tensor in tensors:
+            f.write(tensor.tobytes())
+            entries.append({'dtype': tensor.dtype.str, 'shape': list(tensor.shape), 'offset': offset})
+            offset += tensor.nbytes
+    with open(os.path.join(path, 'tiny.json'), 'w') as f:
+        f.write('{}')
+    with open(os.path.join(path, 'imagenet_class_index.json'), 'w') as f:
+        json.dump({'0': ['n03794056', 'mosquito_net']}, f)
+    files = sorted(os.listdir(path))
+    manifest = {
+        'version': version,
+        'models': {'tiny': {'architecture': 'tiny.json', 'weights': 'tiny.weights.bin', 'tensors': entries}},
+        'class_index': 'imagenet_class_index.json',
+        'files': {name: hash_file(os.path.join(path, name)) for name in files}
+    }
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+    with open(os.path.join(root, CURRENT), 'w') as f:
+        f.write(version)
+    return path, tensors
+
+
+def test_weights_are_read_only_views_of_the_mapped_file(tmp_path):
+    _, tensors = write_bundle(str(tmp_path))
+    artifacts = ModelArtifacts(str(tmp_path))
+
+    weights = artifacts.weights('tiny')
+
+    for weight, expected in zip(weights, tensors):
+        np.testing.assert_array_equal(weight, expected)
+        assert weight.dtype == expected.dtype and not weight.flags.writeable
+    assert artifacts.weights('tiny') is weights  # Mapped once per process
+
+
+def test_checksum_mismatch_rejects_the_bundle(tmp_path):
+    path, _ = write_bundle(str(tmp_path))
+    assert ModelArtifacts(str(tmp_path)).version == 'v1'
+
+    with open(os.path.join(path, 'tiny.weights.bin'), 'r+b') as f:
+        f.write(b'\xff')
+
+    with pytest.raises(ArtifactError, match='Checksum mismatch for model artifact tiny.weights.bin'):
+        ModelArtifacts(str(tmp_path))
+
+
+def test_missing_file_or_pointer_rejects_the_bundle(tmp_path):
+    with pytest.raises(ArtifactError, match='No model artifacts'):
+        ModelArtifacts(str(tmp_path))
+    path, _ = write_bundle(str(tmp_path))
+    os.remove(os.path.join(path, 'imagenet_class_index.json'))
+
+    with pytest.raises(ArtifactError, match='missing'):
+        ModelArtifacts(str(tmp_path))
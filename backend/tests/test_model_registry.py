@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+from config import Config
+from app.services import model_registry
+from app.services.model_registry import ModelRegistry, thread_budget
+
+
+@pytest.mark.parametrize('intra, inter, workers, cores, expected', [
+    (-1, -1, 4, 16, (4, 2)),  # Cores split across workers; a second inter-op thread once intra >= 4
+    (-1, -1, 4, 8, (2, 1)),
+    (-1, -1, 8, 4, (1, 1)),  # Never below one thread
+    (3, 0, 4, 16, (3, 0)),  # Explicit settings win; 0 keeps TensorFlow's default
+])
+def test_thread_budget(monkeypatch, intra, inter, workers, cores, expected):
+    monkeypatch.setattr(Config, 'TF_INTRA_OP_THREADS', intra)
+    monkeypatch.setattr(Config, 'TF_INTER_OP_THREADS', inter)
+
+    assert thread_budget(workers, cores) == expected
+
+
+class SlowArtifacts:
+    manifest = {'models': {'mosquito': {}}}
+
+    def __init__(self):
+        self.loads = []
+
+    def load_model(self, name):
+        self.loads.append(name)
+        time.sleep(0.05)  # Long enough for every thread to pile up on the lock
+        return object()
+
+
+def test_concurrent_first_requests_load_a_model_once(monkeypatch):
+    artifacts = SlowArtifacts()
+    monkeypatch.setattr(model_registry, 'get_artifacts', lambda: artifacts)
+    registry = ModelRegistry()
+    configured = []
+    monkeypatch.setattr(registry, '_configure_threads', lambda: configured.append(True))
+
+    start, models = threading.Barrier(8), []
+
+    def request():
+        start.wait()
+        models.append(registry.get('mosquito'))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert artifacts.loads == ['mosquito']
+    assert len(models) == 8 and all(model is models[0] for model in models)
+    assert configured == [True]
+    assert registry.loaded() == ['mosquito']
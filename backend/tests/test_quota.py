@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from config import Config
+from app.services import quota
+from app.services.verification import verification_service
+from tests.conftest import FakeMobileNet, RejectingModel, make_image
+
+
+def test_quota_ignores_client_supplied_username(app):
+    with app.test_request_context('/api/submit', method='POST', headers={'X-Username': 'victim'},
+                                  environ_base={'REMOTE_ADDR': '203.0.113.7'}):
+        limits, username = quota._quota_limits()
+
+    assert username is None
+    assert [key for key, _ in limits] == ['ip:203.0.113.7']
+
+
+def test_quota_keys_on_forwarded_address_behind_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(Config, 'TRUSTED_PROXY_COUNT', 1)
+    from app import create_app
+    app = create_app()
+    seen = []
+    app.add_url_rule('/whoami', 'whoami', lambda: seen.append(quota._quota_limits()[0]) or '')
+
+    app.test_client().get('/whoami', headers={'X-Forwarded-For': '198.51.100.9'},
+                          environ_base={'REMOTE_ADDR': '10.0.0.2'})
+
+    assert seen == [[('ip:198.51.100.9', Config.MAX_SUBMISSIONS_PER_DAY_PER_IP)]]
+
+
+def test_sixth_submission_by_one_user_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(quota, 'submission_limiter', quota.SlidingWindowLimiter(quota.DAY_SECONDS, quota.MemoryQuotaStore()))
+    monkeypatch.setattr(verification_service, '_model', FakeMobileNet())
+    monkeypatch.setattr(verification_service, '_model_loaded', True)
+
+    statuses = []
+    for n in range(Config.MAX_SUBMISSIONS_PER_DAY + 1):
+        # A new address each time, so only the per-user limit can apply
+        response = client.post('/api/submit', data={
+            'username': 'prolific', 'image': (make_image(seed=100 + n), f'{n}.jpg')
+        }, content_type='multipart/form-data', environ_base={'REMOTE_ADDR': f'192.0.2.{100 + n}'})
+        statuses.append(response.status_code)
+
+    assert statuses == [200] * Config.MAX_SUBMISSIONS_PER_DAY + [429]
+    assert response.get_json()['code'] == 'RATE_LIMITED'
+
+
+@pytest.mark.parametrize('path, field', [('/api/submit', 'image'), ('/api/submit/batch', 'images')])
+def test_rejected_submissions_are_not_charged(client, monkeypatch, path, field):
+    limiter = quota.SlidingWindowLimiter(quota.DAY_SECONDS, quota.MemoryQuotaStore())
+    monkeypatch.setattr(quota, 'submission_limiter', limiter)
+    monkeypatch.setattr(verification_service, '_model', RejectingModel())
+    monkeypatch.setattr(verification_service, '_model_loaded', True)
+
+    response = client.post(path, data={'username': 'unlucky', field: (make_image(seed=7), 'a.jpg')},
+                           content_type='multipart/form-data', environ_base={'REMOTE_ADDR': '192.0.2.80'})
+
+    result = response.get_json() if path == '/api/submit' else response.get_json()['results'][0]
+    assert result['code'] == 'NOT_MOSQUITO'
+    window = int(time.time() // quota.DAY_SECONDS)
+    assert limiter.store.get('ip:192.0.2.80', window) == 0
+    assert limiter.store.get('user:unlucky', window) == 0
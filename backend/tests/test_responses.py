@@ -0,0 +1,63 @@
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from flask import jsonify
+
+from app.services import json_provider
+from app.services.json_provider import dumps_bytes
+from app.services.leaderboard_cache import snapshot_response
+
+PAYLOAD_ID = ObjectId('65f1c0ffee0000000000beef')
+PAYLOAD = {'id': PAYLOAD_ID, 'at': datetime(2024, 5, 1, 12, 30, 15, 250000), 'coins': 10}
+EXPECTED = {'id': '65f1c0ffee0000000000beef', 'at': '2024-05-01T12:30:15.250000', 'coins': 10}
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_json_output_is_the_same_with_or_without_orjson(app, monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(json_provider, 'orjson', None)
+    elif json_provider.orjson is None:
+        pytest.skip('orjson is not installed')
+
+    with app.app_context():
+        body = jsonify(PAYLOAD).get_data()
+
+    assert json.loads(body) == EXPECTED
+    assert json.loads(dumps_bytes(PAYLOAD)) == EXPECTED
+    assert json.loads(app.json.dumps(PAYLOAD)) == EXPECTED
+
+
+@pytest.fixture
+def snapshot_client(app):
+    body = dumps_bytes({'leaderboard': [{'username': f'user{n}', 'coins': n} for n in range(200)]})
+    app.add_url_rule('/snapshot', 'snapshot', lambda: snapshot_response({'body': body, 'etag': 'v42'}))
+    return app.test_client(), body
+
+
+def test_compressed_snapshot_gets_weak_etag_and_revalidates(snapshot_client):
+    client, body = snapshot_client
+
+    response = client.get('/snapshot', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'] == 'W/"v42"'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.get_data()) == body
+
+    revalidated = client.get('/snapshot', headers={'Accept-Encoding': 'gzip', 'If-None-Match': 'W/"v42"'})
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b''
+
+
+def test_uncompressed_snapshot_keeps_strong_etag(snapshot_client):
+    client, body = snapshot_client
+
+    response = client.get('/snapshot', headers={'Accept-Encoding': 'identity'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['ETag'] == '"v42"'
+    assert response.get_data() == body
+    assert client.get('/snapshot', headers={'If-None-Match': '"v42"'}).status_code == 304
@@ -0,0 +1,40 @@
+from app import reverify
+from app.services.storage import StorageService
+from tests.conftest import make_image
+
+
+def save_image(tmp_path, name, seed):
+    path = tmp_path / name
+    path.write_bytes(make_image(seed=seed).getvalue())
+    return str(path)
+
+
+def test_reverify_covers_submissions_and_leaves_pending_images(mongo, tmp_path, monkeypatch):
+    monkeypatch.setenv('UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    service = StorageService()
+    service.add_submission('alice', save_image(tmp_path, 'submitted.jpg', 1), 10)
+    mongo.users.insert_one({'_id': 'bob', 'coins': 0})
+    pending = mongo.images.insert_one({'user_id': 'bob', 'image_url': save_image(tmp_path, 'pending.jpg', 2),
+                                       'verification_status': 'pending', 'coins_awarded': 0}).inserted_id
+    rejected = mongo.images.insert_one({'user_id': 'bob', 'image_url': save_image(tmp_path, 'rejected.jpg', 3),
+                                        'verification_status': 'rejected', 'coins_awarded': 0}).inserted_id
+    sources = [reverify.MongoImageSource(), reverify.SubmissionSource(service)]
+    output = str(tmp_path / 'reverify.jsonl')
+
+    # The model now finds an insect in everything
+    monkeypatch.setattr(reverify, 'classify_batch', lambda batch: [(True, 0.9)] * len(batch))
+    summary = reverify.reverify_images(output, apply=True, sources=sources)
+
+    assert summary['processed'] == 3
+    assert mongo.images.find_one({'_id': rejected})['verification_status'] == 'verified'
+    assert mongo.images.find_one({'_id': pending})['verification_status'] == 'pending'
+    assert mongo.users.find_one({'_id': 'bob'})['coins'] == 10
+
+    # ...and now in nothing: the storage submission is revoked as well
+    monkeypatch.setattr(reverify, 'classify_batch', lambda batch: [(False, 0.1)] * len(batch))
+    reverify.reverify_images(output, apply=True, restart=True, sources=sources)
+
+    profile = service.get_user_profile('alice')
+    assert profile['balance'] == 0 and profile['totalKills'] == 0
+    assert profile['submissions'][0]['coins'] == 0
+    assert mongo.images.find_one({'_id': pending})['verification_status'] == 'pending'
@@ -0,0 +1,76 @@
+import threading
+from config import Config
+from app.services.sqlite_storage import SQLiteStorageService
+from app.services.storage import create_storage_service
+
+
+def _version_in_thread(store):
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(store.version))
+    thread.start()
+    thread.join()
+    return seen[0]
+
+
+def test_version_is_shared_across_threads_and_processes(tmp_path):
+    path = str(tmp_path / 'store.db')
+    store, other_worker = SQLiteStorageService(path), SQLiteStorageService(path)
+    before = store.version
+    assert _version_in_thread(store) == before
+
+    # A commit from another worker's connection moves every reader's version
+    other_worker.add_submission('alice', 'a.jpg', 10)
+    assert store.version == before + 1
+    assert _version_in_thread(store) == before + 1
+
+    # Reads that don't create a user leave it alone
+    store.get_user_profile('alice')
+    assert store.version == before + 1
+
+
+def test_reverification_adjusts_submission_and_user(tmp_path):
+    store = SQLiteStorageService(str(tmp_path / 'store.db'))
+    first, second = store.add_submissions([('alice', 'a.jpg', 10), ('alice', 'b.jpg', 10)])
+    before = store.version
+
+    assert [s['id'] for s in store.iter_submissions(first['id'])] == [second['id']]
+    store.apply_reverification([{'image_id': second['id'], 'user_id': 'alice', 'status': 'rejected',
+                                 'coins': 0, 'delta': -10}])
+
+    profile = store.get_user_profile('alice')
+    assert (profile['balance'], profile['totalKills']) == (10, 1)
+    assert [s['coins'] for s in profile['submissions']] == [10, 0]
+    assert store.version > before
+
+
+def test_tied_users_get_sequential_ranks_in_leaderboard_order(tmp_path):
+    store = SQLiteStorageService(str(tmp_path / 'store.db'))
+    store.add_submissions([('carol', 'c.jpg', 10), ('alice', 'a.jpg', 10), ('bob', 'b.jpg', 10), ('dave', 'd.jpg', 20)])
+
+    leaderboard = store.get_leaderboard()
+    assert [row['username'] for row in leaderboard] == ['dave', 'alice', 'bob', 'carol']
+    assert [store.get_user_profile(row['username'])['rank'] for row in leaderboard] == [1, 2, 3, 4]
+
+
+def test_profile_of_unknown_user_is_empty_and_writes_nothing(tmp_path):
+    store = SQLiteStorageService(str(tmp_path / 'store.db'))
+    store.add_submission('alice', 'a.jpg', 10)
+    before = store.version
+
+    profile = store.get_user_profile('nobody')
+
+    assert (profile['balance'], profile['totalKills'], profile['submissions']) == (0, 0, [])
+    assert profile['rank'] == 2
+    assert store.version == before
+    assert [row['username'] for row in store.get_leaderboard()] == ['alice']
+
+
+def test_backend_and_path_come_from_config(monkeypatch, tmp_path):
+    path = str(tmp_path / 'configured.db')
+    monkeypatch.setattr(Config, 'STORAGE_BACKEND', 'sqlite')
+    monkeypatch.setattr(Config, 'SQLITE_PATH', path)
+
+    store = create_storage_service()
+
+    assert isinstance(store, SQLiteStorageService)
+    assert store.db_path == path
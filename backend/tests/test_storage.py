@@ -0,0 +1,46 @@
+import random
+
+from app.services.events import event_bus
+from app.storage import InMemoryStorage
+
+
+def test_ranks_follow_coins_with_ties_to_earlier_users(monkeypatch):
+    published = []
+    monkeypatch.setattr(event_bus, 'publish', lambda user_id, kind, data: published.append((user_id, kind, data)))
+    store = InMemoryStorage()
+    users = [store.create_user(f'user{n}', f'user{n}@example.com', 'pw') for n in range(20)]
+    rng = random.Random(0)
+    for _ in range(200):
+        store.update_user_coins(rng.choice(users)['id'], rng.choice([-5, 1, 5, 10]))
+
+    expected = sorted(store.users.values(), key=lambda user: user['coins'], reverse=True)
+    assert store.get_leaderboard(limit=None) == expected
+    assert store.get_user_ranks() == {user['id']: rank + 1 for rank, user in enumerate(expected)}
+    assert all(store.get_user_rank(user['id']) == rank + 1 for rank, user in enumerate(expected))
+
+    last = expected[-1]['id']
+    store.update_user_coins(last, expected[0]['coins'] - expected[-1]['coins'] + 1)
+    assert store.get_user_rank(last) == 1
+    assert published[-1] == (last, 'rank', {'rank': 1, 'previous_rank': len(users)})
+
+
+def test_image_indexes_follow_status_owner_and_key_changes(monkeypatch):
+    monkeypatch.setattr(event_bus, 'publish', lambda *args: None)
+    store = InMemoryStorage()
+    alice = store.create_user('alice', 'alice@example.com', 'pw')['id']
+    bob = store.create_user('bob', 'bob@example.com', 'pw')['id']
+    first, second, third = (store.create_image(alice, f'https://bucket/{n}.jpg')['id'] for n in range(3))
+    store.update_image(first, s3_key='users/alice/1.jpg')
+
+    store.update_image(second, verification_status='verified')
+    store.update_image(first, user_id=bob, s3_key='users/bob/1.jpg')
+    store.update_image(third, user_id=bob)
+    store.update_image(first, user_id=alice)
+
+    assert [image['id'] for image in store.get_images_by_status('pending')] == [first, third]
+    assert [image['id'] for image in store.get_images_by_status('verified')] == [second]
+    assert [image['id'] for image in store.get_user_images(alice)] == [first, second]
+    assert [image['id'] for image in store.get_user_images(bob)] == [third]
+    assert store.get_image_by_s3_key('users/alice/1.jpg') is None
+    assert store.get_image_by_s3_key('users/bob/1.jpg')['id'] == first
+    assert store.update_image(999, verification_status='verified') is None
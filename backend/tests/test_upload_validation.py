@@ -0,0 +1,23 @@
+import io
+import pytest
+from tests.conftest import make_image
+
+
+@pytest.mark.parametrize('data, code', [
+    (b'\xff\xd8', 'INVALID_TYPE'),  # Ends inside the signature
+    (make_image().getvalue()[:20], 'INVALID_IMAGE'),  # JPEG cut off before its frame header
+])
+def test_submit_rejects_files_that_end_before_header_is_validated(client, data, code):
+    response = client.post('/api/submit', data={'username': 'alice', 'image': (io.BytesIO(data), 'kill.jpg')},
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 400
+    assert response.get_json()['code'] == code
+
+
+def test_submit_still_reports_missing_file(client):
+    response = client.post('/api/submit', data={'username': 'alice', 'image': (io.BytesIO(b''), '')},
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 400
+    assert response.get_json()['code'] == 'NO_FILE'
@@ -0,0 +1,51 @@
+import io
+import os
+from app.services.uploader import BackgroundUploader
+
+
+def stage(staging_dir, key, data=b'jpeg bytes'):
+    """Stage a file the way a crashed worker would leave it: staged, but never queued."""
+    staged = BackgroundUploader(bucket='kills', staging_dir=str(staging_dir), workers=1)
+    staged._queue.put = lambda *args, **kwargs: None
+    staged.enqueue_fileobj(io.BytesIO(data), key)
+
+
+def test_shared_staging_dir_uploads_each_file_once(s3, tmp_path, monkeypatch):
+    stage(tmp_path, 'kills/a.jpg')
+    uploads = []
+    upload_file = s3.upload_file
+    monkeypatch.setattr(s3, 'upload_file', lambda *args, **kwargs: uploads.append(args[2]) or upload_file(*args, **kwargs))
+
+    # Two workers sharing the directory both re-queue the leftover on start
+    workers = [BackgroundUploader(bucket='kills', staging_dir=str(tmp_path), workers=1) for _ in range(2)]
+    for worker in workers:
+        worker._recover()
+    for worker in workers:
+        worker._upload(worker._queue.get_nowait())
+
+    assert uploads == ['kills/a.jpg']
+    assert s3.get_object(Bucket='kills', Key='kills/a.jpg')['Body'].read() == b'jpeg bytes'
+    assert [name for name in os.listdir(tmp_path) if name != 'dead'] == []
+    assert os.listdir(tmp_path / 'dead') == []
+
+
+def test_stale_claim_from_dead_worker_is_recovered(s3, tmp_path):
+    stage(tmp_path, 'kills/b.jpg')
+    sidecar = next(name for name in os.listdir(tmp_path) if name.endswith('.json'))
+    # Claimed by a worker that died mid-upload
+    os.rename(tmp_path / sidecar, tmp_path / sidecar.replace('.json', '.inflight.999999999'))
+
+    BackgroundUploader(bucket='kills', staging_dir=str(tmp_path), workers=1).start().join()
+
+    assert s3.get_object(Bucket='kills', Key='kills/b.jpg')['Body'].read() == b'jpeg bytes'
+
+
+def test_permanent_failure_is_dead_lettered(s3, tmp_path):
+    stage(tmp_path, 'kills/c.jpg')
+
+    uploader = BackgroundUploader(bucket='missing-bucket', staging_dir=str(tmp_path), workers=1)
+    uploader.start().join()
+
+    assert uploader.stats()['failed'] == 1
+    assert [name for name in os.listdir(tmp_path) if name != 'dead'] == []
+    assert len(os.listdir(tmp_path / 'dead')) == 2
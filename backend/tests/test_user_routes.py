@@ -0,0 +1,32 @@
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from app.routes import user_routes
+
+
+def make_client(monkeypatch, calls):
+    monkeypatch.setattr(user_routes, 'get_user_transactions',
+                        lambda user, limit, before: calls.append(limit) or [])
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key-that-is-long-enough'
+    JWTManager(app)
+    app.register_blueprint(user_routes.user_bp)
+    with app.app_context():
+        token = create_access_token(identity='alice')
+    return app.test_client(), {'Authorization': f'Bearer {token}'}
+
+
+def test_transactions_limit_is_clamped(monkeypatch):
+    calls = []
+    client, headers = make_client(monkeypatch, calls)
+
+    for limit in ('0', '-3', '1000'):
+        assert client.get(f'/api/transactions?limit={limit}', headers=headers).status_code == 200
+    assert calls == [1, 1, 100]
+
+
+def test_transactions_rejects_non_integer_limit(monkeypatch):
+    client, headers = make_client(monkeypatch, [])
+
+    response = client.get('/api/transactions?limit=ten', headers=headers)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid limit'}
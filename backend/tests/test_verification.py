@@ -0,0 +1,38 @@
+import pytest
+
+from app.services import storage
+from app.services.blob_store import BlobStore
+from app.services.verification import VerificationService
+from tests.conftest import FakeMobileNet, RejectingModel, make_image
+
+
+@pytest.fixture
+def blob_store(monkeypatch, tmp_path):
+    store = BlobStore(str(tmp_path))
+    monkeypatch.setattr(storage.storage_service, 'blob_store', store)
+    return store
+
+
+def worker(model):
+    """A VerificationService as another gunicorn worker would have it."""
+    service = VerificationService()
+    service._model, service._model_loaded = model, True
+    return service
+
+
+def test_duplicates_are_caught_across_workers_and_endpoints(blob_store):
+    first = blob_store.put(make_image(seed=1), 'jpg')
+    again = blob_store.put(make_image(seed=1), 'jpg')
+
+    assert worker(FakeMobileNet()).verify_image(first, 'alice')['success']
+    other = worker(FakeMobileNet())
+    assert other.verify_image(again, 'bob')['code'] == 'DUPLICATE_IMAGE'
+    assert other.verify_batch([again], 'bob')[0]['code'] == 'DUPLICATE_IMAGE'
+
+
+def test_rejected_images_can_be_submitted_again(blob_store):
+    path = blob_store.put(make_image(seed=2), 'jpg')
+
+    assert worker(RejectingModel()).verify_batch([path], 'alice')[0]['code'] == 'NOT_MOSQUITO'
+    assert worker(RejectingModel()).verify_image(path, 'alice')['code'] == 'NOT_MOSQUITO'
+    assert worker(FakeMobileNet()).verify_image(path, 'alice')['success']
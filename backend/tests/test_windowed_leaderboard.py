@@ -0,0 +1,42 @@
+import random
+from app.services.sqlite_storage import SQLiteStorageService
+from app.services.windowed_leaderboard import RollingWindow
+
+
+def test_rank_matches_totals_as_the_window_slides():
+    window = RollingWindow(bucket_seconds=10, bucket_count=3)
+    rng = random.Random(1)
+    for step in range(500):
+        window.add(f"user{rng.randrange(20)}", rng.randrange(1, 5), now=step)
+        for user, coins in window.totals.items():
+            assert window.rank(user) == 1 + sum(1 for total in window.totals.values() if total > coins)
+    assert sorted(window.totals.values()) == window.sorted_totals
+
+
+def test_sqlite_windows_are_shared_and_survive_restarts(tmp_path):
+    path = str(tmp_path / 'store.db')
+    worker = SQLiteStorageService(path)
+    worker.add_submissions([('alice', 'a.jpg', 10), ('bob', 'b.jpg', 10), ('bob', 'c.jpg', 10)])
+
+    restarted = SQLiteStorageService(path)
+    assert restarted.get_window_leaderboard('daily') == [
+        {'id': 1, 'username': 'bob', 'coins': 20},
+        {'id': 2, 'username': 'alice', 'coins': 10},
+    ]
+    assert restarted.get_window_rank('weekly', 'alice') == 2
+    assert restarted.get_window_rank('monthly', 'carol') == 0
+
+
+def test_api_leaderboard_serves_windows(client):
+    from app.services.storage import storage_service
+    storage_service.add_submission('window-user', 'w.jpg', 10)
+
+    response = client.get('/api/leaderboard?window=weekly&limit=100')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['window'] == 'weekly'
+    assert {'username': 'window-user', 'coins': 10} in [
+        {'username': entry['username'], 'coins': entry['coins']} for entry in body['leaderboard']
+    ]
+
+    assert client.get('/api/leaderboard?window=yearly').status_code == 400
@@ -0,0 +1,12 @@
+"""WSGI entry point for production servers (see gunicorn.conf.py).
+
+Importing this module builds the app; the verification models load on first
+use, or up front in each gunicorn worker's post_worker_init.
+"""
+import os
+
+os.environ.setdefault('FLASK_DEBUG', 'false')
+
+from app import create_app
+
+app = create_app()